@@ -1,6 +1,7 @@
 from datetime import datetime
 
 from api.command import Command
+from core.data_fetchers import SerializedResourceCapacity
 from core.models import CapacityChange, Resource
 
 
@@ -114,3 +115,103 @@ class DeleteCapacityChange(Command, CapacityCommandHelpers):
             if previous_avail and previous_avail.quantity == next_avail.quantity:
                 result.append(next_avail)
         return result
+
+
+class BulkUpdateCapacities(Command):
+    """sets many capacity changes at once, across any number of resources:
+    all of them if every one is valid, or none of them. changes is a list of
+    dicts like those posted to api/capacities/."""
+
+    def changes(self):
+        return self.input_data.get("changes")
+
+    def _check_if_valid(self):
+        changes = self.changes()
+        if not isinstance(changes, list) or not changes:
+            self.add_error("changes", "A list of capacity changes is required")
+            return False
+
+        self.parsed = []
+        for index, data in enumerate(changes):
+            try:
+                self.parsed.append(
+                    (
+                        int(data["resource"]),
+                        datetime.strptime(data["start_date"], "%Y-%m-%d").date(),
+                        int(data["quantity"]),
+                        bool(data["accept_drft"]),
+                    )
+                )
+            except (KeyError, TypeError, ValueError):
+                self.add_error(
+                    f"changes.{index}",
+                    "Needs a resource, a start_date (YYYY-MM-DD), a quantity and accept_drft",
+                )
+        if self.has_errors():
+            return False
+
+        self.resources = Resource.objects.select_related("location").in_bulk(
+            {change[0] for change in self.parsed}
+        )
+        if len(self.resources) < len({change[0] for change in self.parsed}):
+            self.add_error("resource", "No such resource")
+            return False
+        if not self._can_administer_resources():
+            return self.unauthorized()
+
+        today = {}
+        for index, (resource_id, start_date, quantity, _) in enumerate(self.parsed):
+            resource = self.resources[resource_id]
+            if resource.location_id not in today:
+                today[resource.location_id] = datetime.now(resource.tz()).date()
+            if start_date < today[resource.location_id]:
+                self.add_error(
+                    f"changes.{index}", "The start date must not be in the past"
+                )
+            if quantity < 0:
+                self.add_error(f"changes.{index}", "The quantity must not be negative")
+
+        return not self.has_errors()
+
+    def _can_administer_resources(self):
+        user = self.issuing_user
+        if not (user and user.is_authenticated):
+            return False
+        administered = set(user.house_admin.values_list("pk", flat=True))
+        # backers can change their own rooms, which is rare enough to check
+        # one resource at a time
+        return all(
+            resource.location_id in administered
+            or user_can_administer_a_resource(user, resource)
+            for resource in self.resources.values()
+        )
+
+    def _execute_on_valid(self):
+        unchanged, combined = CapacityChange.objects.set_many(self.parsed)
+        for resource_id, start_date in unchanged:
+            self.add_warning(
+                "Oops",
+                f"{self.resources[resource_id].name} from {start_date} is not a "
+                "change from the previous capacity",
+            )
+        for resource_id, start_date in combined:
+            self.add_warning(
+                "FYI",
+                f"The capacity change of {self.resources[resource_id].name} on "
+                f"{start_date} was the same as the one before it, so they were "
+                "combined.",
+            )
+
+        changes = {resource_id: [] for resource_id in self.resources}
+        for change in CapacityChange.objects.filter(resource__in=self.resources):
+            changes[change.resource_id].append(change)
+        self.result_data = {
+            "capacities": [
+                SerializedResourceCapacity(
+                    resource,
+                    datetime.now(resource.tz()).date(),
+                    changes[resource_id],
+                ).as_dict()
+                for resource_id, resource in sorted(self.resources.items())
+            ]
+        }
@@ -1,9 +1,11 @@
+import json
 from datetime import date
 
 from django.test import TestCase
 
-from api.commands.capacities import DeleteCapacityChange
+from api.commands.capacities import BulkUpdateCapacities, DeleteCapacityChange
 from core.factories import ResourceFactory, UserFactory
+from core.libs.query_budget import QueryRecorder
 from core.models import CapacityChange
 
 
@@ -76,3 +78,113 @@ class DeleteCapacityChangeTestCase(TestCase):
         )
         self.command = DeleteCapacityChange(self.user, capacity=capacity)
         self.expect_deleted_capacities([capacity.pk], remaining=2)
+
+
+class BulkUpdateCapacitiesTestCase(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.resource = ResourceFactory()
+        self.location = self.resource.location
+        self.location.house_admins.add(self.user)
+
+    def change(self, start_date, quantity, resource=None, accept_drft=False):
+        return {
+            "resource": (resource or self.resource).id,
+            "start_date": start_date,
+            "quantity": quantity,
+            "accept_drft": accept_drft,
+        }
+
+    def timeline(self, resource=None):
+        return list(
+            CapacityChange.objects.filter(resource=resource or self.resource)
+            .order_by("start_date")
+            .values_list("start_date", "quantity")
+        )
+
+    def test_sets_changes_across_resources(self):
+        other = ResourceFactory(location=self.location, name="other")
+        CapacityChange.objects.create(
+            start_date=date(4016, 1, 1), resource=self.resource, quantity=1
+        )
+        command = BulkUpdateCapacities(
+            self.user,
+            changes=[
+                self.change("4016-01-01", 2),
+                self.change("4016-02-01", 3),
+                self.change("4016-01-01", 4, resource=other),
+            ],
+        )
+        self.assertTrue(command.execute())
+        self.assertEqual(
+            self.timeline(), [(date(4016, 1, 1), 2), (date(4016, 2, 1), 3)]
+        )
+        self.assertEqual(self.timeline(other), [(date(4016, 1, 1), 4)])
+        capacities = command.result().serialize()["data"]["capacities"]
+        self.assertEqual(
+            [c["resourceId"] for c in capacities], [self.resource.id, other.id]
+        )
+        self.assertEqual(
+            [c["quantity"] for c in capacities[0]["upcomingCapacities"]], [2, 3]
+        )
+
+    def test_repeated_capacities_are_merged(self):
+        for day, quantity in [(1, 2), (10, 3), (20, 2)]:
+            CapacityChange.objects.create(
+                start_date=date(4016, 1, day), resource=self.resource, quantity=quantity
+            )
+        command = BulkUpdateCapacities(
+            self.user,
+            changes=[self.change("4016-01-05", 2), self.change("4016-01-10", 2)],
+        )
+        self.assertTrue(command.execute())
+        # the 10th now repeats the 1st, and so does the 20th
+        self.assertEqual(self.timeline(), [(date(4016, 1, 1), 2)])
+        warnings = command.result().serialize()["warnings"]
+        self.assertEqual(len(warnings["Oops"]), 2)
+        self.assertEqual(len(warnings["FYI"]), 1)
+
+    def test_nothing_is_set_if_any_change_is_invalid(self):
+        command = BulkUpdateCapacities(
+            self.user,
+            changes=[self.change("4016-01-01", 2), self.change("1016-01-01", 2)],
+        )
+        self.assertFalse(command.execute())
+        self.assertEqual(
+            command.result().serialize(),
+            {"errors": {"changes.1": ["The start date must not be in the past"]}},
+        )
+        self.assertFalse(CapacityChange.objects.exists())
+
+    def test_non_house_admin_cannot_set_changes(self):
+        command = BulkUpdateCapacities(
+            UserFactory(username="samwise"), changes=[self.change("4016-01-01", 2)]
+        )
+        self.assertFalse(command.execute())
+        self.assertIn("auth", command.result().serialize()["errors"])
+        self.assertFalse(CapacityChange.objects.exists())
+
+    def test_endpoint_queries_do_not_grow_with_resources(self):
+        self.client.force_login(self.user)
+
+        def post(rooms):
+            resources = [
+                ResourceFactory(location=self.location, name=f"room {n}")
+                for n in range(rooms)
+            ]
+            changes = [
+                self.change(f"4016-0{month}-01", month, resource=resource)
+                for resource in resources
+                for month in range(1, 4)
+            ]
+            with QueryRecorder() as recorder:
+                response = self.client.post(
+                    "/api/capacities/bulk/",
+                    json.dumps({"changes": changes}),
+                    content_type="application/json",
+                )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()["data"]["capacities"]), rooms)
+            return recorder.count
+
+        self.assertEqual(post(2), post(20))
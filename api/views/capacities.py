@@ -7,8 +7,9 @@ from api.command import CommandResult
 from api.commands import capacities as commands_capacities
 from api.utils.http import JSONResponse
 from core.data_fetchers import SerializedResourceCapacity
-from core.models import CapacityChange, Resource
+from core.models import AvailabilityVersion, CapacityChange, Resource
 from core.serializers import CapacityChangeSerializer
+from core.views.view_helpers import availability_condition
 
 
 @csrf_exempt
@@ -38,6 +39,30 @@ def capacities(request):
 
 
 @csrf_exempt
+def capacities_bulk(request):
+    """sets many capacity changes, for any number of resources, at once. takes
+    {"changes": [...]}, a list of what capacities() takes, and returns the
+    capacities of every resource changed."""
+    if request.method != "POST":
+        return HttpResponseNotFound("404 not found")
+    data = JSONParser().parse(request)
+    command = commands_capacities.BulkUpdateCapacities(
+        request.user, changes=data.get("changes") if isinstance(data, dict) else None
+    )
+    command.execute()
+    return JSONResponse(
+        command.result().serialize(), status=command.result().http_status()
+    )
+
+
+def capacity_availability_versions(request, capacity_id):
+    return AvailabilityVersion.objects.filter(
+        location__resources__capacity_changes=capacity_id
+    )
+
+
+@csrf_exempt
+@availability_condition(capacity_availability_versions)
 def capacity_detail(request, capacity_id):
     try:
         capacity = CapacityChange.objects.get(pk=capacity_id)
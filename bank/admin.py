@@ -8,6 +8,7 @@ class EntryReadOnlyInline(admin.TabularInline):
     extra = 0
     readonly_fields = ("valid", "amount", "transaction")
     can_delete = False
+    ordering = ("-transaction__date",)
 
 
 class EntryInline(admin.TabularInline):
@@ -27,13 +28,11 @@ class AccountAdmin(admin.ModelAdmin):
     raw_id_fields = ("owners", "admins")
     list_filter = ("type", "owners")
     list_display = ("__str__", "balance", "account_owners", "account_admins", "type")
+    readonly_fields = ("balance",)
     inlines = [
         EntryReadOnlyInline,
     ]
 
-    def balance(self, obj):
-        return obj.get_balance()
-
     def account_owners(self, obj):
         return ", ".join([f"{a.first_name} {a.last_name}" for a in obj.owners.all()])
 
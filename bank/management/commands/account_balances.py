@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bank.models import Account
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute account balances from the sum of their valid entries, or "
+        "with --verify just check them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Report accounts with wrong balances without fixing them.",
+        )
+
+    def handle(self, *args, **options):
+        checked = 0
+        stale = []
+        batch = []
+        for account in Account.objects.order_by("pk").iterator(chunk_size=BATCH_SIZE):
+            batch.append(account)
+            if len(batch) == BATCH_SIZE:
+                stale += self.check_batch(batch, options["verify"])
+                checked += len(batch)
+                batch = []
+        if batch:
+            stale += self.check_batch(batch, options["verify"])
+            checked += len(batch)
+
+        if options["verify"]:
+            for account_id, balance, computed in stale:
+                self.stdout.write(
+                    f"Account {account_id} has balance {balance}, "
+                    f"its entries sum to {computed}"
+                )
+            if stale:
+                raise CommandError(
+                    f"{len(stale)} of {checked} accounts have wrong balances"
+                )
+            self.stdout.write(self.style.SUCCESS(f"All {checked} accounts are correct"))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"Updated {len(stale)} of {checked} accounts")
+            )
+
+    def check_batch(self, accounts, verify):
+        balances = {account.pk: account.balance for account in accounts}
+        stale = Account.objects.stale_balances(accounts)
+        if stale and not verify:
+            Account.objects.bulk_update(stale, ["balance"])
+        return [
+            (account.pk, balances[account.pk], account.balance) for account in stale
+        ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.7 on 2026-10-18 01:58
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_balances(apps, schema_editor):
+    Account = apps.get_model("bank", "Account")
+    Entry = apps.get_model("bank", "Entry")
+
+    balances = dict(
+        Entry.objects.filter(valid=True)
+        .values("account")
+        .annotate(total=Sum("amount"))
+        .order_by()
+        .values_list("account", "total")
+    )
+    accounts = []
+    for account in Account.objects.filter(pk__in=balances):
+        account.balance = balances[account.pk]
+        accounts.append(account)
+    Account.objects.bulk_update(accounts, ["balance"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bank", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="account",
+            name="balance",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bank", "0002_account_balance"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="entry",
+            options={"verbose_name_plural": "Entries"},
+        ),
+    ]
@@ -1,10 +1,20 @@
 import logging
 
 from django.contrib.auth.models import User
-from django.db import models
-from django.db.models import Sum
+from django.db import models, transaction
+from django.db.models import (
+    Case,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+    Window,
+)
 from django.db.models.functions import Coalesce
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_delete, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 
@@ -35,6 +45,41 @@ class Currency(models.Model):
             )
 
 
+STATEMENT_PAGE_SIZE = 50
+
+
+class AccountManager(models.Manager):
+    def lock(self, account_ids):
+        """Locks the accounts until the end of the transaction, always in the
+        same order so that concurrent postings cannot deadlock."""
+        return list(
+            self.select_for_update().filter(pk__in=set(account_ids)).order_by("pk")
+        )
+
+    def computed_balances(self, account_ids):
+        """Returns a dict of account id: the sum of its valid entries, with one
+        aggregate query."""
+        sums = dict(
+            Entry.objects.filter(account__in=account_ids, valid=True)
+            .values("account")
+            .annotate(total=Sum("amount"))
+            .order_by()
+            .values_list("account", "total")
+        )
+        return {account_id: sums.get(account_id, 0) for account_id in account_ids}
+
+    def stale_balances(self, accounts):
+        """Returns the accounts (of the given list) whose balance differs from
+        the sum of their valid entries, with the correct balance set."""
+        computed = self.computed_balances([account.pk for account in accounts])
+        stale = []
+        for account in accounts:
+            if account.balance != computed[account.pk]:
+                account.balance = computed[account.pk]
+                stale.append(account)
+        return stale
+
+
 class Account(models.Model):
     CREDIT = "credit"
     DEBIT = "debit"
@@ -68,6 +113,10 @@ class Account(models.Model):
         default=CREDIT,
         help_text="A credit (expense, asset) account always has a balance > 0. A debit (revenue, liability) account always has a balance < 0. #helpfulnothelpful.",
     )
+    # the sum of the valid entries, kept up to date by Entry.objects.set_valid()
+    balance = models.IntegerField(default=0, editable=False)
+
+    objects = AccountManager()
 
     def __str__(self):
         return self.name + f" ({self.currency})"
@@ -79,10 +128,54 @@ class Account(models.Model):
         return self.type == Account.DEBIT
 
     def get_balance(self):
-        # sum all valid entries for this account
-        return self.entries.filter(valid=True).aggregate(
-            total_amount=Coalesce(Sum("amount"), 0)
-        )["total_amount"]
+        # the running balance, as of when this account was loaded.
+        return self.balance
+
+    def statement(self, before=None, limit=STATEMENT_PAGE_SIZE):
+        """Returns a page of the account's entries, newest first, and the
+        cursor of the next (older) page, or None if this is the last. A
+        cursor is a (transaction date, entry id) pair; entries come before
+        `before`, or from the newest if it is None.
+
+        Each entry has its running_balance, the balance of the account after
+        it, computed by a window function in the same query, and its
+        counterparty, the other account of its transaction (None while it is
+        invalid), loaded with one more query for the page."""
+        entries = (
+            self.entries.annotate(
+                running_balance=Window(
+                    Sum(Case(When(valid=True, then="amount"), default=Value(0))),
+                    order_by=[F("transaction__date").asc(), F("pk").asc()],
+                ),
+                counterparty_id=Subquery(
+                    Entry.objects.filter(transaction=OuterRef("transaction"))
+                    .exclude(pk=OuterRef("pk"))
+                    .values("account")[:1]
+                ),
+            )
+            .select_related("transaction")
+            .order_by("-transaction__date", "-pk")
+        )
+        if before is not None:
+            # newer entries don't change the running balance of older ones,
+            # so they can be left out before the window is computed
+            date, pk = before
+            entries = entries.filter(
+                Q(transaction__date__lt=date) | Q(transaction__date=date, pk__lt=pk)
+            )
+        page = list(entries[: limit + 1])
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = (page[-1].transaction.date, page[-1].pk)
+        counterparties = Account.objects.select_related("currency").in_bulk(
+            {entry.counterparty_id for entry in page if entry.valid}
+        )
+        for entry in page:
+            entry.counterparty = (
+                counterparties.get(entry.counterparty_id) if entry.valid else None
+            )
+        return page, next_cursor
 
     def balance_at_entry(self, entry):
         # return the balance of the account after the entry was recorded
@@ -104,6 +197,77 @@ class SystemAccounts(models.Model):
     debit = models.OneToOneField(Account, related_name="+", on_delete=models.CASCADE)
 
 
+class PostingException(Exception):
+    pass
+
+
+class TransactionManager(models.Manager):
+    def post(self, transfers, approver=None):
+        """Records each transfer, a (reason, amount, from_account, to_account)
+        tuple, as a valid transaction of two entries: all of them or, if any
+        is refused, none of them. Raises PostingException for a transfer
+        that is not positive, is within one account or between currencies,
+        or would take an account past its balance limit.
+
+        Transfers are checked in order against the balances the earlier ones
+        leave behind, with the accounts locked in pk order for the whole
+        posting, and written with a fixed number of queries however many
+        there are. Returns the new transactions, and sets the new balance on
+        the given account objects."""
+        transfers = list(transfers)
+        ids = [a.pk for t in transfers for a in t[2:]]
+        with transaction.atomic():
+            accounts = {account.pk: account for account in Account.objects.lock(ids)}
+            balances = {pk: account.balance for pk, account in accounts.items()}
+            date = timezone.now()
+            transactions = []
+            entries = []
+            for reason, amount, from_account, to_account in transfers:
+                from_account = accounts[from_account.pk]
+                to_account = accounts[to_account.pk]
+                if not amount > 0:
+                    raise PostingException(
+                        f"Transfer amounts must be positive, not {amount}"
+                    )
+                if from_account == to_account:
+                    raise PostingException(
+                        f"Transfer from account {from_account.pk} to itself"
+                    )
+                if from_account.currency_id != to_account.currency_id:
+                    raise PostingException(
+                        "Transaction entries must be between accounts of the same currency"
+                    )
+                for account, change in ((from_account, -amount), (to_account, amount)):
+                    balances[account.pk] += change
+                    if account.is_debit() and balances[account.pk] > 0:
+                        raise PostingException(
+                            "Error: insufficient balance for transaction. Debit account %d must retain a balance less than 0."
+                            % account.pk
+                        )
+                    if account.is_credit() and balances[account.pk] < 0:
+                        raise PostingException(
+                            "Error: insufficient balance for transaction. Credit account %d must retain a balance greater than 0."
+                            % account.pk
+                        )
+                    entries.append(Entry(account=account, amount=change, valid=True))
+                transactions.append(
+                    Transaction(reason=reason, approver=approver, date=date, valid=True)
+                )
+
+            self.bulk_create(transactions)
+            for i, entry in enumerate(entries):
+                entry.transaction = transactions[i // 2]
+            Entry.objects.bulk_create(entries)
+            for pk, account in accounts.items():
+                account.balance = balances[pk]
+            Account.objects.bulk_update(accounts.values(), ["balance"])
+
+        for t in transfers:
+            for account in t[2:]:
+                account.balance = balances[account.pk]
+        return transactions
+
+
 class Transaction(models.Model):
     reason = models.CharField(max_length=200)
     created = models.DateTimeField(auto_now_add=True)
@@ -118,6 +282,8 @@ class Transaction(models.Model):
     )
     valid = models.BooleanField(default=False)
 
+    objects = TransactionManager()
+
     def __str__(self):
         return f"Transaction {self.pk}"
 
@@ -153,7 +319,7 @@ class Transaction(models.Model):
             self.valid = True
             # call update instead of save() so we don't end up in an infinite
             # loop of save()'s calling each other.
-            Entry.objects.filter(transaction=self).update(valid=True)
+            Entry.objects.set_valid(Entry.objects.filter(transaction=self), True)
 
         super().save(*args, **kwargs)
 
@@ -165,6 +331,23 @@ class Transaction(models.Model):
         return resp["amount__sum"]
 
 
+class EntryManager(models.Manager):
+    def set_valid(self, entries, valid):
+        """Marks the entries (a queryset) valid or invalid, moving the amounts
+        of those that change into or out of their accounts' balances."""
+        with transaction.atomic():
+            Account.objects.lock(entries.values_list("account", flat=True))
+            changing = entries.exclude(valid=valid)
+            deltas = {}
+            for account_id, amount in changing.values_list("account", "amount"):
+                deltas[account_id] = deltas.get(account_id, 0) + amount
+            for account_id, amount in deltas.items():
+                Account.objects.filter(pk=account_id).update(
+                    balance=F("balance") + (amount if valid else -amount)
+                )
+            changing.update(valid=valid)
+
+
 class Entry(models.Model):
     account = models.ForeignKey(
         Account, related_name="entries", on_delete=models.CASCADE
@@ -178,27 +361,37 @@ class Entry(models.Model):
     # avoid a temporary invalid state.
     valid = models.BooleanField(default=False)
 
+    objects = EntryManager()
+
     class Meta:
         verbose_name_plural = "Entries"
-        ordering = ["-transaction__date"]
 
     def __str__(self):
         return "Entry: account %s for %d" % (self.account, self.amount)
 
     def save(self, *args, **kwargs):
-        # save the entry first so that we can validate any changes (since we're
-        # pulling them from the DB)
-        super().save(*args, **kwargs)
-        # if self.transaction:
-        entries = self.transaction.entries.all()
-        balance = sum([e.amount for e in entries])
-        if balance == 0:
-            Entry.objects.filter(transaction=self.transaction).update(valid=True)
-        else:
-            Entry.objects.filter(transaction=self.transaction).update(valid=False)
-        self.transaction.save()
+        with transaction.atomic():
+            siblings = Entry.objects.filter(transaction=self.transaction)
+            Account.objects.lock(
+                [self.account_id, *siblings.values_list("account", flat=True)]
+            )
+            if self.pk:
+                # take the old amount out of the balance while it changes
+                Entry.objects.set_valid(Entry.objects.filter(pk=self.pk), False)
+            self.valid = False
+            # save the entry first so that we can validate any changes (since
+            # we're pulling them from the DB)
+            super().save(*args, **kwargs)
+            balance = sum([e.amount for e in siblings])
+            Entry.objects.set_valid(siblings, balance == 0)
+            self.valid = balance == 0
+            self.transaction.save()
+        self.account.refresh_from_db(fields=["balance"])
 
     def with_account(self):
+        # set for every entry of Account.statement(), without a query each
+        if hasattr(self, "counterparty"):
+            return self.counterparty
         if self.valid:
             # what account was this transaction _from_?
             other_entry = self.transaction.entries.exclude(id=self.id).first()
@@ -210,13 +403,19 @@ class Entry(models.Model):
             return None
 
     def balance_at(self):
+        # set for every entry of Account.statement(), without a query each
+        if hasattr(self, "running_balance"):
+            return self.running_balance
         return self.account.balance_at_entry(self)
 
 
 @receiver(pre_save, sender=Entry)
 def entry_pre_save(sender, instance, **kwargs):
-    # enforce hard balance limits for debit and credit accounts.
-    current_balance = instance.account.get_balance()
+    # enforce hard balance limits for debit and credit accounts. Entry.save()
+    # has locked the account, so its balance can't change under us.
+    current_balance = Account.objects.values_list("balance", flat=True).get(
+        pk=instance.account_id
+    )
     if instance.account.is_debit() and (current_balance + instance.amount > 0):
         raise Exception(
             "Error: insufficient balance for transaction. Debit account %d must retain a balance less than 0."
@@ -229,6 +428,14 @@ def entry_pre_save(sender, instance, **kwargs):
         )
 
 
+@receiver(pre_delete, sender=Entry)
+def entry_pre_delete(sender, instance, **kwargs):
+    # take the entry out of its account's balance as stored, since set_valid()
+    # may have changed valid under an instance that is already loaded. runs
+    # inside the delete's transaction, so the account stays locked.
+    Entry.objects.set_valid(Entry.objects.filter(pk=instance.pk), False)
+
+
 """ check that transaction entries sum to 0
     that the spending user will have an allowable balance after the transaction is completed.
     that the correct permissions are in place for both accounts
@@ -1,8 +1,13 @@
 from django.urls import re_path
 
-from bank.views import AccountDetail, AccountList
+from bank.views import AccountDetail, AccountList, AccountStatement
 
 urlpatterns = [
     re_path(r"^(?P<account_id>\d+)/$", AccountDetail.as_view(), name="account_detail"),
+    re_path(
+        r"^(?P<account_id>\d+)/statement/$",
+        AccountStatement.as_view(),
+        name="account_statement",
+    ),
     re_path(r"^list/$", AccountList.as_view(), name="account_list"),
 ]
@@ -1,8 +1,14 @@
+import datetime
 import logging
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseRedirect
+from django.http import (
+    Http404,
+    HttpResponseBadRequest,
+    HttpResponseRedirect,
+    JsonResponse,
+)
 from django.shortcuts import redirect, render
 from django.utils.decorators import method_decorator
 from django.views.generic import View
@@ -13,36 +19,60 @@ logger = logging.getLogger(__name__)
 
 
 def create_transaction(reason, amount, from_account, to_account):
-    t = models.Transaction.objects.create(reason=reason)
-    e1 = models.Entry.objects.create(
-        account=from_account, amount=(amount) * (-1), transaction=t
-    )
-    e2 = models.Entry.objects.create(account=to_account, amount=(amount), transaction=t)
-
     try:
-        assert t.valid
+        models.Transaction.objects.post([(reason, amount, from_account, to_account)])
         return True
-    except Exception:
+    except models.PostingException:
         logger.error(
-            "transaction was invalid. please check transaction ids %d and %d"
-            % (e1.id, e2.id)
+            "transaction from account %d to account %d was refused"
+            % (from_account.id, to_account.id)
         )
         return False
 
 
+def format_cursor(cursor):
+    if cursor is None:
+        return None
+    date, pk = cursor
+    return f"{date.isoformat()}_{pk}"
+
+
+def parse_cursor(value):
+    """Parses a statement cursor from format_cursor(). Raises ValueError if
+    it is not one."""
+    date, pk = value.rsplit("_", 1)
+    return datetime.datetime.fromisoformat(date), int(pk)
+
+
+def _account_for(request, account_id):
+    account = models.Account.objects.select_related("currency").get(id=account_id)
+    # ensure user has permissions
+    assert request.user in account.owners.all() or request.user in account.admins.all()
+    return account
+
+
 # Create your views here.
 class AccountDetail(View):
     template_name = "accounts_detail.html"
 
     def get(self, request, account_id):
         try:
-            account = models.Account.objects.get(id=account_id)
-            # ensure user has permissions
-            assert (
-                request.user in account.owners.all()
-                or request.user in account.admins.all()
+            account = _account_for(request, account_id)
+            try:
+                before = parse_cursor(request.GET["before"])
+            except (KeyError, ValueError):
+                before = None
+            entries, next_cursor = account.statement(before=before)
+            return render(
+                request,
+                self.template_name,
+                {
+                    "account": account,
+                    "entries": entries,
+                    "is_first_page": before is None,
+                    "next_cursor": format_cursor(next_cursor),
+                },
             )
-            return render(request, self.template_name, {"account": account})
         except Exception:
             messages.info(
                 request,
@@ -51,6 +81,57 @@ class AccountDetail(View):
             return HttpResponseRedirect("/404")
 
 
+class AccountStatement(View):
+    """The account's entries as JSON, a page at a time: pass the `next`
+    cursor of one page as `before` to get the next."""
+
+    def get(self, request, account_id):
+        try:
+            account = _account_for(request, account_id)
+        except Exception:
+            raise Http404(
+                "The account does not exist or you are not authorized."
+            ) from None
+        before = None
+        if "before" in request.GET:
+            try:
+                before = parse_cursor(request.GET["before"])
+            except ValueError:
+                return HttpResponseBadRequest("Invalid cursor")
+        try:
+            limit = min(int(request.GET.get("limit", models.STATEMENT_PAGE_SIZE)), 500)
+        except ValueError:
+            return HttpResponseBadRequest("Invalid limit")
+        if limit < 1:
+            return HttpResponseBadRequest("Invalid limit")
+
+        entries, next_cursor = account.statement(before=before, limit=limit)
+        return JsonResponse(
+            {
+                "account": account.id,
+                "currency": account.currency.name,
+                "balance": account.balance,
+                "entries": [
+                    {
+                        "id": entry.id,
+                        "date": entry.transaction.date,
+                        "reason": entry.transaction.reason,
+                        "amount": entry.amount,
+                        "valid": entry.valid,
+                        "balance": entry.running_balance,
+                        "with_account": entry.counterparty
+                        and {
+                            "id": entry.counterparty.id,
+                            "name": entry.counterparty.name,
+                        },
+                    }
+                    for entry in entries
+                ],
+                "next": format_cursor(next_cursor),
+            }
+        )
+
+
 class AccountList(View):
     template_name = "accounts_list.html"
     form_class = forms.TransactionForm
@@ -379,3 +379,16 @@ class FeeAdmin(admin.ModelAdmin): ...
 
 @admin.register(models.LocationFee)
 class LocationFeeAdmin(admin.ModelAdmin): ...
+
+
+@admin.register(models.OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        "created",
+        "__str__",
+        "domain",
+        "status",
+        "attempts",
+        "next_attempt",
+    )
+    list_filter = ("status", "domain")
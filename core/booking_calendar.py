@@ -3,6 +3,8 @@ from datetime import date, timedelta
 
 from django.utils.html import conditional_escape as esc
 
+from core.libs.dates import group_range_objects_by_day
+
 
 class GuestCalendar(HTMLCalendar):
     def __init__(self, uses, year, month, location):
@@ -11,6 +13,7 @@ class GuestCalendar(HTMLCalendar):
         super().__init__()
         self.uses = self.group_by_day(uses)
         self.location = location
+        self.full_days = location.full_days(*self.month_range())
 
     def formatday(self, day, weekday):
         if day != 0:
@@ -21,9 +24,7 @@ class GuestCalendar(HTMLCalendar):
             if day in self.uses:
                 body = ["<ul>"]
                 num_today = len(self.uses[day])
-                this_date = date(self.year, self.month, day)
-                any_capacity = self.location.rooms_free(this_date, tomorrow)
-                if not any_capacity:
+                if date(self.year, self.month, day) in self.full_days:
                     cssclass += " full-today"
                 for use in self.uses[day]:
                     body.append('<li id="res%d-cal-item">' % use.booking.id)
@@ -51,29 +52,23 @@ class GuestCalendar(HTMLCalendar):
             return self.day_cell(cssclass, day)
         return self.day_cell("noday", "&nbsp;")
 
-    def group_by_day(self, uses):
-        """create a dictionary of day: items key-value pairs, where items is
-        a list of all uses that intersect this day."""
-
+    def month_range(self):
+        """returns the first and last day of the month being displayed."""
         next_month = (self.month + 1) % 12
         if next_month == 0:
             next_month = 12
         next_months_year = self.year + 1 if next_month < self.month else self.year
-        days = (
-            date(next_months_year, next_month, 1) - date(self.year, self.month, 1)
-        ).days
+        first = date(self.year, self.month, 1)
+        return first, date(next_months_year, next_month, 1) - timedelta(days=1)
+
+    def group_by_day(self, uses):
+        """create a dictionary of day: items key-value pairs, where items is
+        a list of all uses that intersect this day."""
 
-        guests_by_day = {}
-        for day in range(1, days + 1):
-            today_uses = []
-            the_day = date(self.year, self.month, day)
-            for u in uses:
-                # only check that u.depart is strictly greater than the_day,
-                # since people don't need a bed on the day they leave.
-                if u.arrive <= the_day and u.depart > the_day:
-                    today_uses.append(u)
-            if len(today_uses) > 0:
-                guests_by_day[day] = today_uses
+        # people don't need a bed on the day they leave, so a use covers
+        # arrive <= day < depart.
+        by_date = group_range_objects_by_day(uses, *self.month_range())
+        guests_by_day = {the_day.day: day_uses for the_day, day_uses in by_date.items()}
         return guests_by_day
 
     def day_cell(self, cssclass, body):
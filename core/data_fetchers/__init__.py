@@ -1,3 +1,7 @@
+from .location_availability import LocationAvailability as LocationAvailability
+from .occupancy_report import OccupancyReportData as OccupancyReportData
+from .occupancy_report import RoomOccupancyData as RoomOccupancyData
+from .payment_report import PaymentReportData as PaymentReportData
 from .resource_capacity import ResourceCapacity as ResourceCapacity
 from .resource_capacity import (
     SerializedNullResourceCapacity as SerializedNullResourceCapacity,
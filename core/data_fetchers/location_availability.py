@@ -0,0 +1,60 @@
+from core.models import CapacityChange, DailyOccupancy
+
+
+class LocationAvailability:
+    """Daily availability (capacity minus confirmed usage) of every resource
+    at a location, for each day between start and end inclusive.
+
+    Capacity changes and daily bed usage for the resources are loaded in two
+    queries, however many resources there are. When resources are given,
+    location isn't used, and they may be at more than one location.
+    """
+
+    def __init__(self, location, start, end, resources=None):
+        self.location = location
+        self.start = start
+        self.end = end
+        if resources is None:
+            resources = location.resources.all()
+        self.resources = list(resources)
+        self._availabilities = None
+
+    @classmethod
+    def for_request(cls, request, location, start, end):
+        """Returns the availability of the location between start and end,
+        computed at most once per request."""
+        # unwrap REST framework requests so both kinds share the same cache
+        request = getattr(request, "_request", request)
+        if not hasattr(request, "_location_availabilities"):
+            request._location_availabilities = {}
+        key = (location.pk, start, end)
+        if key not in request._location_availabilities:
+            request._location_availabilities[key] = cls(location, start, end)
+        return request._location_availabilities[key]
+
+    def daily_availabilities(self, resource):
+        """Returns a list [(day, quantity), ...] for the resource."""
+        return self.as_matrix()[resource.pk]
+
+    def as_matrix(self):
+        """Returns a dict of resource id: [(day, quantity), ...]."""
+        if self._availabilities is None:
+            self._availabilities = self._compute()
+        return self._availabilities
+
+    def _compute(self):
+        resource_ids = [resource.pk for resource in self.resources]
+
+        timelines = CapacityChange.objects.timelines(resource_ids)
+
+        used = DailyOccupancy.objects.used_between(resource_ids, self.start, self.end)
+
+        result = {}
+        for resource_id in resource_ids:
+            capacities = timelines[resource_id].daily_quantities(self.start, self.end)
+            resource_used = used.get(resource_id, {})
+            result[resource_id] = [
+                (day, quantity - resource_used.get(day, 0))
+                for day, quantity in capacities
+            ]
+        return result
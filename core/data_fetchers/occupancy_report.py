@@ -0,0 +1,130 @@
+import datetime
+
+from django.db.models import F, Prefetch, prefetch_related_objects
+from django.utils import timezone
+
+from core.models import BillLineItem, Payment, Resource, Use
+
+
+class OccupancyReportData:
+    """Loads everything the monthly occupancy report needs for a location:
+    the confirmed uses intersecting the month with their bookings, bills,
+    line items (and fees) and payments, the payments made during the month
+    with the same, and the rooms with their capacity changes.
+
+    The number of queries is fixed, however many bookings there are.
+    """
+
+    def __init__(self, location, start, end):
+        self.location = location
+        self.start = start
+        self.end = end
+
+    def uses(self):
+        return list(
+            Use.objects.filter(location=self.location)
+            .filter(status="confirmed")
+            .exclude(depart__lt=self.start)
+            .exclude(arrive__gt=self.end)
+            .select_related("resource", "user", "location", "booking__bill")
+            .prefetch_related(
+                Prefetch("booking__bill__line_items", queryset=self._line_items_qs()),
+                "booking__bill__payments",
+            )
+        )
+
+    def payments(self):
+        return list(
+            Payment.objects.booking_payments_by_location(self.location)
+            .filter(payment_date__gte=self.start)
+            .filter(payment_date__lte=self.end)
+            .select_related("bill__bookingbill__booking__use")
+            .prefetch_related(
+                Prefetch("bill__line_items", queryset=self._line_items_qs())
+            )
+        )
+
+    def rooms(self):
+        return list(
+            Resource.objects.filter(location=self.location).prefetch_related(
+                "capacity_changes"
+            )
+        )
+
+    def _line_items_qs(self):
+        return BillLineItem.objects.select_related("fee")
+
+
+class RoomOccupancyData:
+    """Loads the confirmed uses (with bookings, bills, line items and
+    payments) and the booking payments of some rooms for a whole year, so that
+    monthly figures for every room can be worked out in memory.
+    """
+
+    def __init__(self, rooms, year):
+        self.rooms = list(rooms)
+        self.start = datetime.date(year, 1, 1)
+        self.end = datetime.date(year + 1, 1, 1)
+        self._uses = None
+        self._payments = None
+
+    def uses(self, room, start, end):
+        """The room's confirmed uses intersecting start..end."""
+        if self._uses is None:
+            self._uses = self._load_uses()
+        return [
+            use
+            for use in self._uses.get(room.pk, [])
+            if not (use.depart < start or use.arrive > end)
+        ]
+
+    def payments(self, room, start, end):
+        """Payments for bookings of the room made between start and end."""
+        if self._payments is None:
+            self._payments = self._load_payments()
+        start, end = _midnight(start), _midnight(end)
+        return [
+            payment
+            for payment in self._payments.get(room.pk, [])
+            if start <= payment.payment_date <= end
+        ]
+
+    def _load_uses(self):
+        prefetch_related_objects(self.rooms, "capacity_changes")
+        uses = {}
+        for use in (
+            Use.objects.filter(resource__in=self.rooms)
+            .filter(status="confirmed")
+            .exclude(depart__lt=self.start)
+            .exclude(arrive__gt=self.end)
+            .select_related("resource", "booking__bill")
+            .prefetch_related(
+                Prefetch(
+                    "booking__bill__line_items",
+                    queryset=BillLineItem.objects.select_related("fee"),
+                ),
+                "booking__bill__payments",
+            )
+        ):
+            uses.setdefault(use.resource_id, []).append(use)
+        return uses
+
+    def _load_payments(self):
+        payments = {}
+        for payment in (
+            Payment.objects.filter(
+                bill__bookingbill__booking__use__resource__in=self.rooms,
+                payment_date__gte=_midnight(self.start),
+                payment_date__lte=_midnight(self.end),
+            )
+            .annotate(room_id=F("bill__bookingbill__booking__use__resource"))
+            .only("paid_amount", "payment_date")
+        ):
+            payments.setdefault(payment.room_id, []).append(payment)
+        return payments
+
+
+def _midnight(day):
+    # the start of day in the default timezone, which is how the ORM compares
+    # a date against a datetime field.
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time()))
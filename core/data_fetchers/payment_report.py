@@ -0,0 +1,39 @@
+from django.db.models import Prefetch
+
+from core.models import BillLineItem, LocationFee, Payment, allocate_payment_fees
+
+
+class PaymentReportData:
+    """Loads the booking payments made at a location between start and end,
+    with their users, bookings and bills' line items (and fees), and splits
+    each into house and non-house fees.
+
+    The number of queries is fixed, however many payments there are.
+    """
+
+    def __init__(self, location, start, end):
+        self.location = location
+        self.start = start
+        self.end = end
+
+    def payments(self):
+        """Returns the payments, most recent first."""
+        return allocate_payment_fees(
+            Payment.objects.booking_payments_by_location(self.location)
+            .filter(payment_date__gte=self.start, payment_date__lte=self.end)
+            .order_by("-payment_date")
+            .select_related("user", "bill__bookingbill__booking__use__location")
+            .prefetch_related(
+                Prefetch(
+                    "bill__line_items",
+                    queryset=BillLineItem.objects.select_related("fee"),
+                )
+            )
+        )
+
+    def non_house_fee_percent(self):
+        """Returns the total percentage of the fees not paid by the house."""
+        location_fees = LocationFee.objects.filter(
+            location=self.location, fee__paid_by_house=False
+        ).select_related("fee")
+        return sum(location_fee.fee.percentage * 100 for location_fee in location_fees)
@@ -1,16 +1,23 @@
+from core.libs.dates import as_date
 from core.models import CapacityChange
 from core.serializers import CapacityChangeSerializer
 
 
 class ResourceCapacity:
-    def __init__(self, resource, date):
+    def __init__(self, resource, date, changes=None):
+        # changes, if given, are all the resource's capacity changes, already
+        # loaded, so that nothing more is queried.
         self.resource = resource
         self.date = date
+        self.changes = changes
 
     def resource_id(self):
         return self.resource.id
 
     def current_capacity(self):
+        if self.changes is not None:
+            past = [c for c in self.changes if c.start_date <= as_date(self.date)]
+            return max(past, key=lambda c: c.start_date, default=None)
         return (
             self.base_scope()
             .filter(start_date__lte=self.date)
@@ -19,6 +26,11 @@ class ResourceCapacity:
         )
 
     def upcoming_capacities(self):
+        if self.changes is not None:
+            return sorted(
+                (c for c in self.changes if c.start_date > as_date(self.date)),
+                key=lambda c: c.start_date,
+            )
         return list(
             self.base_scope().filter(start_date__gt=self.date).order_by("start_date")
         )
@@ -33,8 +45,8 @@ class SerializedNullResourceCapacity:
 
 
 class SerializedResourceCapacity:
-    def __init__(self, resource, date):
-        self.resource_capacity = ResourceCapacity(resource, date)
+    def __init__(self, resource, date, changes=None):
+        self.resource_capacity = ResourceCapacity(resource, date, changes)
 
     def current_capacity(self):
         record = self.resource_capacity.current_capacity()
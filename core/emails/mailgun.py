@@ -1,4 +1,7 @@
+import contextvars
+import json
 import logging
+from contextlib import contextmanager
 
 import httpx
 from django.conf import settings
@@ -6,6 +9,34 @@ from django.http import HttpResponse
 
 logger = logging.getLogger(__name__)
 
+# mailgun accepts at most this many recipients per message
+BATCH_SIZE = 1000
+
+_client = contextvars.ContextVar("mailgun_client", default=None)
+
+
+@contextmanager
+def mailgun_session():
+    """Sends everything mailed within the block over one pooled HTTP client,
+    instead of opening a new connection per message. Nested sessions share
+    the outermost client."""
+    if _client.get() is not None:
+        yield _client.get()
+        return
+    with httpx.Client() as client:
+        token = _client.set(client)
+        try:
+            yield client
+        finally:
+            _client.reset(token)
+
+
+def _post(url, **kwargs):
+    client = _client.get()
+    if client is None:
+        return httpx.post(url, **kwargs)
+    return client.post(url, **kwargs)
+
 
 def mailgun_send(mailgun_data, files_dict=None):
     logger.debug(f"Mailgun send: {mailgun_data}")
@@ -23,8 +54,8 @@ def mailgun_send(mailgun_data, files_dict=None):
         logger.debug("mailgun_send: o:testmode={}".format(mailgun_data["o:testmode"]))
 
     try:
-        resp = httpx.post(
-            f"https://api.mailgun.net/v2/{settings.LIST_DOMAIN}/messages",
+        resp = _post(
+            f"{settings.MAILGUN_API_URL}/{settings.LIST_DOMAIN}/messages",
             auth=("api", settings.MAILGUN_API_KEY),
             data=mailgun_data,
             files=files_dict,
@@ -34,8 +65,50 @@ def mailgun_send(mailgun_data, files_dict=None):
             logger.debug("Mailgun POST returned %d" % resp.status_code)
         return HttpResponse(status=resp.status_code)
 
-    except httpx.ConnectionError:
+    except httpx.HTTPError as e:
+        # connection failures and timeouts; the response says which
         logger.error(
-            'Connection error. Email "{}" aborted.'.format(mailgun_data["subject"])
+            'Connection error. Email "{}" aborted: {!r}'.format(
+                mailgun_data.get("subject"), e
+            )
         )
-        return HttpResponse(status=500)
+        return HttpResponse(f"{type(e).__name__}: {e}", status=500)
+
+
+def mailgun_send_batch(mailgun_data, recipient_variables):
+    """Sends the same message to many recipients, one API call per BATCH_SIZE
+    of them, and returns the response to each call.
+
+    recipient_variables maps each recipient's address to a dict of values
+    that mailgun substitutes for %recipient.<key>% in the message, so each
+    copy can be personalised. Recipients only see their own address.
+    """
+    addresses = list(recipient_variables)
+    responses = []
+    with mailgun_session():
+        for i in range(0, len(addresses), BATCH_SIZE):
+            batch = addresses[i : i + BATCH_SIZE]
+            batch_data = dict(mailgun_data)
+            batch_data["to"] = batch
+            batch_data["recipient-variables"] = json.dumps(
+                {address: recipient_variables[address] for address in batch}
+            )
+            responses.append(mailgun_send(batch_data))
+    return responses
+
+
+def mailgun_queue(mailgun_data, files_dict=None, idempotency_key=None):
+    """Puts the message in the outbox for the send_queued_email command to
+    send, so the caller doesn't wait on mailgun, and returns a 202 response.
+    Give an idempotency_key to make sure a message is only ever queued once.
+
+    Messages with attachments are sent straight away, since uploaded files
+    don't outlive the request.
+    """
+    if files_dict:
+        return mailgun_send(mailgun_data, files_dict)
+
+    from core.models import OutboundEmail
+
+    OutboundEmail.objects.queue(mailgun_data, idempotency_key=idempotency_key)
+    return HttpResponse(status=202)
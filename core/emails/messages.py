@@ -4,14 +4,16 @@ import logging
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.sites.models import Site
+from django.core.paginator import Paginator
 from django.http import HttpResponse
-from django.template import Context, Template, TemplateDoesNotExist
+from django.template import Context, TemplateDoesNotExist
 from django.template.loader import get_template
 from django.urls import reverse
 from django.utils import timezone, translation
 from django.views.decorators.csrf import csrf_exempt
 
-from core.emails.mailgun import mailgun_send
+from core.emails.mailgun import mailgun_queue, mailgun_send
+from core.libs.template_cache import location_email_templates
 from core.models import (
     LocationEmailTemplate,
     Use,
@@ -48,7 +50,7 @@ def send_from_location_address(
     }
     if html_content:
         mailgun_data["html"] = html_content
-    return mailgun_send(mailgun_data)
+    return mailgun_queue(mailgun_data)
 
 
 def render_templates(context, location, email_key, language="en-us"):
@@ -56,16 +58,22 @@ def render_templates(context, location, email_key, language="en-us"):
     translation.activate(language)
     template_override = LocationEmailTemplate.objects.filter(
         location=location, key=email_key
-    )
+    ).first()
     text_content = None
     html_content = None
 
-    if template_override and template_override.count() > 0:
-        t = template_override[0]
+    if template_override:
+        t = template_override
+        # compiled once per version of the override, not once per email
+        cache_key = (location.pk, email_key, t.updated)
         if t.text_body:
-            text_content = Template(t.text_body).render(Context(context))
+            text_content = location_email_templates.get(
+                (*cache_key, "text"), t.text_body
+            ).render(Context(context))
         if t.html_body:
-            html_content = Template(t.html_body).render(Context(context))
+            html_content = location_email_templates.get(
+                (*cache_key, "html"), t.html_body
+            ).render(Context(context))
     else:
         try:
             text_content = get_template(f"emails/{email_key}.txt").render(context)
@@ -78,6 +86,26 @@ def render_templates(context, location, email_key, language="en-us"):
     return (text_content, html_content)
 
 
+def location_context(location):
+    """The part of a guest email's context that is the same for every guest
+    at the location, so it can be built once for a whole batch of emails."""
+    domain = Site.objects.get_current().domain
+    return {
+        "location": location,
+        "current_email": f"current@{location.slug}.mail.embassynetwork.com",
+        "site_url": "https://"
+        + domain
+        + reverse("location_detail", args=(location.slug,)),
+        "events_url": "https://"
+        + domain
+        + reverse("gather_upcoming_events", args=(location.slug,)),
+        "new_booking_url": "https://"
+        + domain
+        + reverse("location_stay", args=(location.slug,)),
+        "residents": location.residents(),
+    }
+
+
 ############################################
 #            BOOKING EMAILS            #
 ############################################
@@ -202,14 +230,18 @@ def updated_booking_notify(booking):
         "subject": subject,
         "text": text_content,
     }
-    return mailgun_send(mailgun_data)
+    return mailgun_queue(mailgun_data)
 
 
-def goodbye_email(use):
-    """Send guest a departure email"""
+def goodbye_email(use, shared=None, idempotency_key=None):
+    """Send guest a departure email. shared is the location_context() of
+    the use's location, if the caller already has it. Give an
+    idempotency_key to send it only once."""
     # this is split out by location because each location has a timezone that affects the value of 'today'
     domain = Site.objects.get_current().domain
     location = use.location
+    if shared is None:
+        shared = location_context(location)
 
     c = {
         "first_name": use.user.first_name,
@@ -223,9 +255,7 @@ def goodbye_email(use):
                 use.booking.id,
             ),
         ),
-        "new_booking_url": "https://"
-        + domain
-        + reverse("location_stay", args=(location.slug,)),
+        "new_booking_url": shared["new_booking_url"],
     }
     text_content, html_content = render_templates(
         c, location, LocationEmailTemplate.DEPARTURE
@@ -241,18 +271,21 @@ def goodbye_email(use):
     if html_content:
         mailgun_data["html"] = html_content
 
-    return mailgun_send(mailgun_data)
+    return mailgun_queue(mailgun_data, idempotency_key=idempotency_key)
 
 
-def guest_welcome(use):
-    """Send guest a welcome email"""
+def guest_welcome(use, shared=None, idempotency_key=None):
+    """Send guest a welcome email. shared is the location_context() of the
+    use's location, if the caller already has it. Give an idempotency_key
+    to send it only once."""
     # this is split out by location because each location has a timezone that affects the value of 'today'
     domain = Site.objects.get_current().domain
     location = use.location
+    if shared is None:
+        shared = location_context(location)
     intersecting_uses = Use.objects.filter(arrive__gte=use.arrive).filter(
         depart__lte=use.depart
     )
-    residents = location.residents()
     intersecting_events = (
         Event.objects.filter(location=location)
         .filter(start__gte=use.arrive)
@@ -261,17 +294,10 @@ def guest_welcome(use):
     day_of_week = weekday_number_to_name[use.arrive.weekday()]
 
     c = {
+        **shared,
         "first_name": use.user.first_name,
         "day_of_week": day_of_week,
-        "location": use.location,
         "use": use,
-        "current_email": f"current@{location.slug}.mail.embassynetwork.com",
-        "site_url": "https://"
-        + domain
-        + reverse("location_detail", args=(location.slug,)),
-        "events_url": "https://"
-        + domain
-        + reverse("gather_upcoming_events", args=(location.slug,)),
         "profile_url": "https://"
         + domain
         + reverse("user_detail", args=(use.user.username,)),
@@ -286,7 +312,6 @@ def guest_welcome(use):
         ),
         "intersecting_bookings": intersecting_uses,
         "intersecting_events": intersecting_events,
-        "residents": residents,
     }
     text_content, html_content = render_templates(
         c, location, LocationEmailTemplate.WELCOME
@@ -301,7 +326,7 @@ def guest_welcome(use):
     if html_content:
         mailgun_data["html"] = html_content
 
-    return mailgun_send(mailgun_data)
+    return mailgun_queue(mailgun_data, idempotency_key=idempotency_key)
 
 
 ############################################
@@ -312,16 +337,12 @@ def guest_welcome(use):
 def guests_residents_daily_update(location):
     # this is split out by location because each location has a timezone that affects the value of 'today'
     today = timezone.localtime(timezone.now())
-    arriving_today = (
-        Use.objects.filter(location=location)
-        .filter(arrive=today)
-        .filter(status="confirmed")
-    )
-    departing_today = (
-        Use.objects.filter(location=location)
-        .filter(depart=today)
-        .filter(status="confirmed")
+    # the templates show each guest's name, room and profile
+    uses = Use.objects.filter(location=location).select_related(
+        "user__profile", "resource"
     )
+    arriving_today = uses.filter(arrive=today).filter(status="confirmed")
+    departing_today = uses.filter(depart=today).filter(status="confirmed")
     events_today = published_events_today_local(location=location)
 
     if not arriving_today and not departing_today and not events_today:
@@ -373,31 +394,29 @@ def guests_residents_daily_update(location):
     if html_content:
         mailgun_data["html"] = html_content
 
-    return mailgun_send(mailgun_data)
+    return mailgun_queue(
+        mailgun_data,
+        idempotency_key=f"guests_residents_daily_update:{location.pk}:{today.date()}",
+    )
 
 
 def admin_daily_update(location):
     # this is split out by location because each location has a timezone that affects the value of 'today'
     today = timezone.localtime(timezone.now()).date()
-    arriving_today = (
-        Use.objects.filter(location=location)
-        .filter(arrive=today)
-        .filter(status="confirmed")
-    )
-    maybe_arriving_today = (
-        Use.objects.filter(location=location)
-        .filter(arrive=today)
-        .filter(status="approved")
-    )
-    pending_now = Use.objects.filter(location=location).filter(status="pending")
-    approved_now = Use.objects.filter(location=location).filter(status="approved")
-    departing_today = (
-        Use.objects.filter(location=location)
-        .filter(depart=today)
-        .filter(status="confirmed")
+    # the templates show each guest's name, room and profile
+    uses = Use.objects.filter(location=location).select_related(
+        "user__profile", "resource"
     )
+    arriving_today = uses.filter(arrive=today).filter(status="confirmed")
+    maybe_arriving_today = uses.filter(arrive=today).filter(status="approved")
+    pending_now = uses.filter(status="pending")
+    approved_now = uses.filter(status="approved")
+    departing_today = uses.filter(depart=today).filter(status="confirmed")
     events_today = published_events_today_local(location=location)
     pending_or_feedback = events_pending(location=location)
+    # the database works out who still owes money; only the most recent
+    # handful are listed in the email
+    owing = Paginator(Use.objects.confirmed_but_unpaid(location=location), 20).page(1)
 
     if (
         not arriving_today
@@ -434,6 +453,7 @@ def admin_daily_update(location):
         "events_today": events_today,
         "events_pending": pending_or_feedback["pending"],
         "events_feedback": pending_or_feedback["feedback"],
+        "owing": owing,
     }
     text_content, html_content = render_templates(
         c, location, LocationEmailTemplate.ADMIN_DAILY
@@ -448,7 +468,9 @@ def admin_daily_update(location):
     if html_content:
         mailgun_data["html"] = html_content
 
-    return mailgun_send(mailgun_data)
+    return mailgun_queue(
+        mailgun_data, idempotency_key=f"admin_daily_update:{location.pk}:{today}"
+    )
 
 
 ############################################
@@ -571,7 +593,7 @@ def current(request, location_slug):
         # to be common these days
         "h:Reply-To": list_address,
     }
-    return mailgun_send(mailgun_data, attachments)
+    return mailgun_queue(mailgun_data, attachments)
 
 
 @csrf_exempt
@@ -797,7 +819,7 @@ def stay(request, location_slug):
         # to be common these days
         "h:Reply-To": from_address,
     }
-    return mailgun_send(mailgun_data, attachments)
+    return mailgun_queue(mailgun_data, attachments)
 
 
 # XXX TODO there is a lot of duplication in these email endpoints. should be
@@ -903,7 +925,7 @@ def residents(request, location_slug):
         # to be common these days
         "h:Reply-To": list_address,
     }
-    return mailgun_send(mailgun_data, attachments)
+    return mailgun_queue(mailgun_data, attachments)
 
 
 @csrf_exempt
@@ -0,0 +1,202 @@
+"""
+Exports of a location's bookings, uses, payments, bill line items and bank
+entries over a date range.
+
+Rows are read with values_list() and iterator() in chunks, so memory use
+stays flat however long the range is, and rows can be written to a
+streaming response as soon as they are read.
+"""
+
+import datetime
+from decimal import Decimal
+from itertools import islice
+
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from bank.models import Entry
+from core.models import (
+    Backing,
+    BillLineItem,
+    Booking,
+    HouseAccount,
+    Payment,
+    Use,
+    allocate_payment_fees,
+)
+
+CHUNK_SIZE = 2000
+CENTS = Decimal("0.01")
+
+
+def _midnight(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time()))
+
+
+class Export:
+    """A dataset that can be exported: the rows of queryset(location, start,
+    end), one column per (header, lookup) pair in columns."""
+
+    def __init__(self, columns, queryset):
+        self.columns = columns
+        self.queryset = queryset
+
+    def headers(self):
+        return [header for header, _ in self.columns]
+
+    def rows(self, location, start, end, chunk_size=CHUNK_SIZE):
+        lookups = [lookup for _, lookup in self.columns]
+        return (
+            self.queryset(location, start, end)
+            .order_by("pk")
+            .values_list(*lookups)
+            .iterator(chunk_size=chunk_size)
+        )
+
+
+class PaymentExport(Export):
+    """Payments, with each one's split between the house and the fees added
+    as extra columns."""
+
+    fee_columns = ["to_house", "house_fees", "non_house_fees"]
+
+    def headers(self):
+        return super().headers() + self.fee_columns
+
+    def rows(self, location, start, end, chunk_size=CHUNK_SIZE):
+        # the fee split needs each bill's line items, so they are loaded for a
+        # chunk of rows at a time
+        rows = super().rows(location, start, end, chunk_size=chunk_size)
+        while chunk := list(islice(rows, chunk_size)):
+            payments = allocate_payment_fees(
+                Payment.objects.filter(pk__in=[row[0] for row in chunk])
+                .select_related("bill")
+                .prefetch_related(
+                    Prefetch(
+                        "bill__line_items",
+                        queryset=BillLineItem.objects.select_related("fee"),
+                    )
+                )
+            )
+            fees = {
+                payment.pk: tuple(
+                    amount.quantize(CENTS)
+                    for amount in (payment.to_house(), *payment.fee_allocation())
+                )
+                for payment in payments
+            }
+            for row in chunk:
+                yield row + fees[row[0]]
+
+
+def bookings_in_range(location, start, end):
+    return Booking.objects.filter(
+        use__location=location, use__depart__gte=start, use__arrive__lte=end
+    )
+
+
+def uses_in_range(location, start, end):
+    return Use.objects.filter(location=location, depart__gte=start, arrive__lte=end)
+
+
+def payments_in_range(location, start, end):
+    return Payment.objects.filter(
+        bill__bookingbill__booking__use__location=location,
+        payment_date__gte=_midnight(start),
+        payment_date__lt=_midnight(end + datetime.timedelta(1)),
+    )
+
+
+def line_items_in_range(location, start, end):
+    # line items of the bookings whose stay intersects the range
+    return BillLineItem.objects.filter(
+        bill__bookingbill__booking__use__location=location,
+        bill__bookingbill__booking__use__depart__gte=start,
+        bill__bookingbill__booking__use__arrive__lte=end,
+    )
+
+
+def entries_in_range(location, start, end):
+    # entries on the location's house accounts and its rooms' backings
+    house_accounts = HouseAccount.objects.filter(location=location).values("account")
+    backings = Backing.objects.filter(resource__location=location)
+    return Entry.objects.filter(
+        Q(account__in=house_accounts)
+        | Q(account__in=backings.values("money_account"))
+        | Q(account__in=backings.values("drft_account")),
+        transaction__date__gte=_midnight(start),
+        transaction__date__lt=_midnight(end + datetime.timedelta(1)),
+    )
+
+
+EXPORTS = {
+    "bookings": Export(
+        [
+            ("id", "id"),
+            ("created", "created"),
+            ("status", "use__status"),
+            ("user", "use__user__username"),
+            ("email", "use__user__email"),
+            ("room", "use__resource__name"),
+            ("arrive", "use__arrive"),
+            ("depart", "use__depart"),
+            ("rate", "rate"),
+            ("bill", "bill_id"),
+        ],
+        bookings_in_range,
+    ),
+    "uses": Export(
+        [
+            ("id", "id"),
+            ("created", "created"),
+            ("status", "status"),
+            ("user", "user__username"),
+            ("room", "resource__name"),
+            ("arrive", "arrive"),
+            ("depart", "depart"),
+            ("accounted_by", "accounted_by"),
+            ("booking", "booking__id"),
+        ],
+        uses_in_range,
+    ),
+    "payments": PaymentExport(
+        [
+            ("id", "id"),
+            ("payment_date", "payment_date"),
+            ("user", "user__username"),
+            ("bill", "bill_id"),
+            ("booking", "bill__bookingbill__booking__id"),
+            ("paid_amount", "paid_amount"),
+            ("payment_service", "payment_service"),
+            ("payment_method", "payment_method"),
+            ("transaction_id", "transaction_id"),
+        ],
+        payments_in_range,
+    ),
+    "line_items": Export(
+        [
+            ("id", "id"),
+            ("bill", "bill_id"),
+            ("booking", "bill__bookingbill__booking__id"),
+            ("description", "description"),
+            ("amount", "amount"),
+            ("fee", "fee__description"),
+            ("paid_by_house", "paid_by_house"),
+            ("custom", "custom"),
+        ],
+        line_items_in_range,
+    ),
+    "entries": Export(
+        [
+            ("id", "id"),
+            ("date", "transaction__date"),
+            ("transaction", "transaction_id"),
+            ("reason", "transaction__reason"),
+            ("account", "account__name"),
+            ("currency", "account__currency__name"),
+            ("amount", "amount"),
+            ("valid", "valid"),
+        ],
+        entries_in_range,
+    ),
+}
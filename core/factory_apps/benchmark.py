@@ -0,0 +1,165 @@
+"""
+Generates a realistic data set for performance work: several locations with
+a few years of bookings, bills, payments and events behind them, so that the
+reports and calendars have something to chew on.
+
+The rich objects come from the other factories; the high volume ones
+(bookings and their bills) are still created through the models so that the
+bills, bill totals and daily occupancy are maintained just as in production.
+"""
+
+import datetime
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db.models import Max
+from django.test import override_settings
+from faker import Faker
+
+from core.models import Booking, CapacityChange, Use
+from gather.models import Event, EventAdminGroup
+
+from .events import EventFactory
+from .location import LocationFactory, ResourceFactory
+from .payment import PaymentFactory, UseFactory
+from .user import UserFactory
+
+SLUG_PREFIX = "bench"
+FAST_HASHER = "django.contrib.auth.hashers.MD5PasswordHasher"
+
+
+class BenchmarkData:
+    def __init__(
+        self,
+        locations=3,
+        rooms=5,
+        capacity_changes=3,
+        years=2,
+        users=200,
+        events=20,
+        paid=0.8,
+        seed=1,
+        media_root=None,
+    ):
+        self.locations = locations
+        self.rooms = rooms
+        self.capacity_changes = capacity_changes
+        self.years = years
+        self.users = users
+        self.events = events
+        # the share of confirmed bookings that are paid
+        self.paid = paid
+        self.seed = seed
+        # where the generated images are written, if not MEDIA_ROOT
+        self.media_root = media_root
+        self.random = random.Random(seed)
+        self.end = datetime.date.today() + datetime.timedelta(days=90)
+        self.start = self.end - datetime.timedelta(days=365 * years)
+        self.counts = {}
+
+    def generate(self):
+        """Creates the data and returns a dict of how many of each kind of
+        object were created."""
+        Faker.seed(self.seed)
+        first_new_user = (User.objects.aggregate(pk=Max("pk"))["pk"] or 0) + 1
+        # the factories give every user they make a password, and hashing
+        # each one properly would take most of the time
+        overrides = {"PASSWORD_HASHERS": [FAST_HASHER]}
+        if self.media_root:
+            overrides["MEDIA_ROOT"] = self.media_root
+        with override_settings(**overrides):
+            guests = self.make_users()
+            for n in range(self.locations):
+                location = LocationFactory(
+                    slug=f"{SLUG_PREFIX}-{n}", name=f"Benchmark House {n}"
+                )
+                location.house_admins.add(guests[n % len(guests)])
+                for r in range(self.rooms):
+                    room = ResourceFactory(location=location, name=f"Room {n}.{r}")
+                    self.make_capacity_changes(room)
+                    self.make_bookings(room, guests)
+                self.make_events(location, guests)
+        # as with the other factories, everyone's password is 'password'
+        User.objects.filter(pk__gte=first_new_user).update(
+            password=make_password("password")
+        )
+        return self.counts
+
+    def count(self, kind, n=1):
+        self.counts[kind] = self.counts.get(kind, 0) + n
+
+    def make_users(self):
+        users = [UserFactory(username=f"{SLUG_PREFIX}{n}") for n in range(self.users)]
+        self.count("users", len(users))
+        return users
+
+    def make_capacity_changes(self, room):
+        days = (self.end - self.start).days
+        for _ in range(self.capacity_changes):
+            CapacityChange.objects.create(
+                resource=room,
+                start_date=self.start
+                + datetime.timedelta(days=self.random.randrange(days)),
+                quantity=self.random.randint(1, 4),
+            )
+        # make sure the room can be booked from the start
+        CapacityChange.objects.update_or_create(
+            resource=room, start_date=self.start, defaults={"quantity": 2}
+        )
+        self.count("capacity_changes", self.capacity_changes + 1)
+
+    def make_bookings(self, room, guests):
+        """Back to back stays of a few nights each, over the whole period."""
+        arrive = self.start + datetime.timedelta(days=self.random.randint(0, 7))
+        while arrive < self.end:
+            depart = arrive + datetime.timedelta(days=self.random.randint(1, 10))
+            status = self.random.choices(
+                [Use.CONFIRMED, Use.APPROVED, Use.PENDING, Use.CANCELED],
+                weights=[14, 2, 2, 2],
+            )[0]
+            use = UseFactory(
+                location=room.location,
+                resource=room,
+                user=self.random.choice(guests),
+                arrive=arrive,
+                depart=depart,
+                status=status,
+            )
+            booking = Booking.objects.create(use=use, rate=room.default_rate)
+            booking.generate_bill()
+            self.count("bookings")
+            if status == Use.CONFIRMED and self.random.random() < self.paid:
+                PaymentFactory(
+                    bill=booking.bill,
+                    user=use.user,
+                    paid_amount=booking.bill.total_owed(),
+                    payment_date=datetime.datetime.combine(
+                        arrive, datetime.time(12), tzinfo=datetime.UTC
+                    ),
+                )
+                self.count("payments")
+            arrive = depart + datetime.timedelta(days=self.random.randint(0, 5))
+
+    def make_events(self, location, guests):
+        # the location factory has already made the location's admin group
+        admin = EventAdminGroup.objects.get(location=location)
+        admin.users.add(guests[0])
+        days = (self.end - self.start).days
+        for _ in range(self.events):
+            start = datetime.datetime.combine(
+                self.start + datetime.timedelta(days=self.random.randrange(days)),
+                datetime.time(self.random.randint(9, 20)),
+                tzinfo=datetime.UTC,
+            )
+            event = EventFactory(
+                location=location,
+                admin=admin,
+                creator=self.random.choice(guests),
+                start=start,
+                end=start + datetime.timedelta(hours=2),
+                attendees=self.random.sample(guests, min(len(guests), 10)),
+            )
+            # saving an event sends it back for review, so publish it after
+            Event.objects.filter(pk=event.pk).update(status=Event.LIVE)
+        self.count("events", self.events)
@@ -1,5 +1,7 @@
 import datetime
 
+from django.utils import timezone
+
 
 def dates_within(start, end):
     result = []
@@ -10,5 +12,55 @@ def dates_within(start, end):
     return result
 
 
+def as_date(value):
+    """Returns the date of a datetime (in the default timezone if it is aware),
+    or the value unchanged if it is already a date."""
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = timezone.make_naive(value, timezone.get_default_timezone())
+        return value.date()
+    return value
+
+
 def count_range_objects_on_day(objects, day):
     return sum(object.arrive <= day and object.depart > day for object in objects)
+
+
+def daily_range_counts(objects, start, end):
+    """Returns a list with the number of objects whose arrive <= day < depart
+    for each day between start and end inclusive.
+
+    Each object adds +1 on its first day in the window and -1 on the day it
+    leaves it, so one pass over the objects plus a running sum over the days
+    gives every count.
+    """
+    days = (end - start).days + 1
+    if days <= 0:
+        return []
+    deltas = [0] * (days + 1)
+    for object in objects:
+        first = max((object.arrive - start).days, 0)
+        last = min((object.depart - start).days, days)
+        if first < last:
+            deltas[first] += 1
+            deltas[last] -= 1
+
+    result = []
+    running = 0
+    for delta in deltas[:days]:
+        running += delta
+        result.append(running)
+    return result
+
+
+def group_range_objects_by_day(objects, start, end):
+    """Returns a dict of day: [objects] for each day between start and end
+    inclusive that at least one object (arrive <= day < depart) covers."""
+    days = (end - start).days + 1
+    result = {}
+    for object in objects:
+        first = max((object.arrive - start).days, 0)
+        last = min((object.depart - start).days, days)
+        for i in range(first, last):
+            result.setdefault(start + datetime.timedelta(days=i), []).append(object)
+    return result
@@ -0,0 +1,158 @@
+"""
+Counts the database queries (and the time spent in them) made while a block
+runs, and spots N+1 patterns: the same query shape run over and over with
+different parameters, typically from a loop over objects.
+
+QueryRecorder works whether or not DEBUG is on, since it hooks into the
+connections with execute_wrapper rather than reading connection.queries.
+The QueryBudgetMiddleware uses it on every request, and tests pin query
+counts with assert_max_queries.
+"""
+
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Returns the shape of a query: the sql with literals and parameters
+    replaced by ?, and IN lists of any length collapsed to (...)."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _LIST.sub("(...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+class QueryRecorder:
+    """Records every query run on any database connection of the current
+    thread inside a `with QueryRecorder() as recorder:` block."""
+
+    def __init__(self):
+        self.queries = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def seconds(self):
+        return sum(seconds for _, seconds in self.queries)
+
+    def repeated(self, threshold):
+        """Returns [(shape, count), ...] for every query shape run at least
+        threshold times, most repeated first."""
+        shapes = Counter(normalize_sql(sql) for sql, _ in self.queries)
+        return [
+            (shape, count)
+            for shape, count in shapes.most_common()
+            if count >= threshold
+        ]
+
+    def report(self, threshold=2):
+        lines = [f"{self.count} queries in {self.seconds * 1000:.1f}ms"]
+        lines += [f"  {count}x {shape}" for shape, count in self.repeated(threshold)]
+        return "\n".join(lines)
+
+
+UNRESOLVED = "<unresolved>"
+
+
+class EndpointStats:
+    """The worst request seen so far for each endpoint, by query count. At
+    most max_endpoints are kept; once full, a new endpoint replaces the one
+    with the fewest queries if it made more."""
+
+    def __init__(self, max_endpoints=200):
+        self.max_endpoints = max_endpoints
+        self.recorded = 0
+        self._worst = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, recorder, repeated=None):
+        """Records a request and returns how many have been recorded."""
+        with self._lock:
+            self.recorded += 1
+            worst = self._worst.get(endpoint)
+            if worst is None and len(self._worst) >= self.max_endpoints:
+                least = min(self._worst.values(), key=lambda stat: stat["queries"])
+                if recorder.count <= least["queries"]:
+                    return self.recorded
+                del self._worst[least["endpoint"]]
+            if worst is None or recorder.count > worst["queries"]:
+                self._worst[endpoint] = {
+                    "endpoint": endpoint,
+                    "queries": recorder.count,
+                    "seconds": recorder.seconds,
+                    "repeated": repeated or [],
+                }
+            return self.recorded
+
+    def worst(self, n=10):
+        """Returns the n endpoints with the most queries in one request."""
+        with self._lock:
+            stats = sorted(
+                self._worst.values(), key=lambda stat: stat["queries"], reverse=True
+            )
+        return stats[:n]
+
+    def report(self, n=10):
+        lines = [f"worst endpoints after {self.recorded} requests:"]
+        lines += [
+            f"  {stat['queries']} queries in {stat['seconds'] * 1000:.1f}ms "
+            f"{stat['endpoint']}"
+            for stat in self.worst(n)
+        ]
+        return "\n".join(lines)
+
+    def clear(self):
+        with self._lock:
+            self.recorded = 0
+            self._worst.clear()
+
+
+worst_endpoints = EndpointStats()
+
+
+@contextmanager
+def assert_max_queries(max_queries, repeat_threshold=None):
+    """Fails if the block runs more than max_queries queries, or with
+    repeat_threshold, if any query shape is run that many times or more.
+    The failure lists the repeated queries, which are usually the culprit."""
+    with QueryRecorder() as recorder:
+        yield recorder
+    if recorder.count > max_queries:
+        raise AssertionError(
+            f"Expected at most {max_queries} queries, got {recorder.report()}"
+        )
+    if repeat_threshold is not None and recorder.repeated(repeat_threshold):
+        raise AssertionError(
+            f"Queries repeated {repeat_threshold} or more times: {recorder.report()}"
+        )
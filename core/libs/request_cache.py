@@ -0,0 +1,48 @@
+"""
+A cache that only lives for the duration of a request (or any other scope
+opened with request_cache_scope), so values computed once can be reused by
+everything that runs during that request without going stale across them.
+
+Outside of a scope nothing is cached and values are always computed.
+"""
+
+import contextvars
+from contextlib import contextmanager
+
+_cache = contextvars.ContextVar("request_cache", default=None)
+
+
+@contextmanager
+def request_cache_scope():
+    token = _cache.set({})
+    try:
+        yield
+    finally:
+        _cache.reset(token)
+
+
+def get_cached(key, compute):
+    cache = _cache.get()
+    if cache is None:
+        return compute()
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+
+def set_cached(key, value):
+    cache = _cache.get()
+    if cache is not None:
+        cache[key] = value
+    return value
+
+
+def is_cached(key):
+    cache = _cache.get()
+    return cache is not None and key in cache
+
+
+def invalidate(key):
+    cache = _cache.get()
+    if cache is not None:
+        cache.pop(key, None)
@@ -0,0 +1,35 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+
+class Echo:
+    """A file-like object whose write() hands back what it is given, so that
+    csv.writer can produce one line at a time for a streaming response."""
+
+    def write(self, value):
+        return value
+
+
+def streaming_csv_response(rows, filename):
+    """Returns a StreamingHttpResponse that writes each row of the rows
+    iterable as it is produced, rather than building the file in memory."""
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in rows), content_type="text/csv"
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def streaming_ndjson_response(objects, filename):
+    """Returns a StreamingHttpResponse that writes each object of the objects
+    iterable as a line of JSON (newline-delimited JSON) as it is produced."""
+    encoder = DjangoJSONEncoder()
+    response = StreamingHttpResponse(
+        (encoder.encode(obj) + "\n" for obj in objects),
+        content_type="application/x-ndjson",
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,56 @@
+"""
+An LRU cache of compiled django templates, for templates whose source lives
+in the database rather than on disk (templates on disk are already cached
+by django's cached loader).
+
+Entries are keyed by whatever identifies a version of the source, such as
+(location id, email key, updated timestamp), so editing a template makes a
+new entry rather than serving a stale one; the old entry just ages out.
+The cache is shared between threads, since scheduled tasks render emails
+for several locations at once.
+"""
+
+import threading
+from collections import OrderedDict
+
+from django.template import Template
+
+
+class TemplateCache:
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, source):
+        """Returns the compiled template for key, compiling source if it
+        isn't cached yet."""
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                self.hits += 1
+                return template
+            self.misses += 1
+        # compile outside the lock; at worst two threads both compile it
+        template = Template(source)
+        with self._lock:
+            self._templates[key] = template
+            self._templates.move_to_end(key)
+            while len(self._templates) > self.maxsize:
+                self._templates.popitem(last=False)
+        return template
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._templates)
+
+
+location_email_templates = TemplateCache(maxsize=256)
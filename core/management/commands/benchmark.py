@@ -0,0 +1,212 @@
+import datetime
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.shortcuts import reverse
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from core.libs.query_budget import QueryRecorder
+from core.management.commands.run_daily_tasks import LOCATION_TASKS
+from core.models import Booking, Location, Payment, Resource, Use
+from gather.models import Event
+
+GRAPHQL_QUERY = """
+query ($slug: String!, $arrive: DateTime!, $depart: DateTime!) {
+  allLocations(slug: $slug) {
+    edges {
+      node {
+        name
+        resources(hasFutureCapacity: true) {
+          name
+          availabilities(arrive: $arrive, depart: $depart) { date quantity }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the busiest pages, APIs and tasks against the current database "
+        "and write the results as JSON. Make some data first with "
+        "generate_benchmark_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--location",
+            help="Slug of the location to benchmark (default the first one)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="How many timed runs of each benchmark (default 5)",
+        )
+        parser.add_argument(
+            "--label", default="", help="Saved with the results, e.g. a commit"
+        )
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="File to write the JSON results to (default stdout)",
+        )
+
+    def handle(self, *args, **options):
+        if options["location"]:
+            location = Location.objects.filter(slug=options["location"]).first()
+        else:
+            location = Location.objects.order_by("pk").first()
+        if location is None:
+            raise CommandError("No location to benchmark")
+        admin = location.house_admins.order_by("pk").first()
+        if admin is None:
+            raise CommandError(f"{location.slug} has no house admin to log in as")
+
+        self.location = location
+        self.today = datetime.date.today()
+        # localhost is always an allowed host, unlike the test client's default
+        self.anonymous = Client(HTTP_HOST="localhost")
+        self.admin = Client(HTTP_HOST="localhost")
+        self.admin.force_login(admin)
+
+        results = {}
+        for name, benchmark in self.benchmarks():
+            results[name] = self.run(benchmark, options["repeat"])
+            self.stderr.write(
+                "{:<16} {:>9.1f}ms {:>5} queries".format(
+                    name, results[name]["median"] * 1000, results[name]["queries"]
+                )
+            )
+
+        report = {
+            "label": options["label"],
+            "created": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "location": location.slug,
+            "rows": {
+                "locations": Location.objects.count(),
+                "resources": Resource.objects.count(),
+                "uses": Use.objects.count(),
+                "bookings": Booking.objects.count(),
+                "payments": Payment.objects.count(),
+                "events": Event.objects.count(),
+            },
+            "results": results,
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"] == "-":
+            self.stdout.write(output)
+        else:
+            with open(options["output"], "w") as f:
+                f.write(output)
+            self.stdout.write(
+                self.style.SUCCESS(f"Wrote benchmark results to {options['output']}")
+            )
+
+    def run(self, benchmark, repeat):
+        """Runs the benchmark once to warm up and then repeat times, and
+        returns its timings and the number of queries of the last run."""
+        benchmark()
+        timings = []
+        for _ in range(repeat):
+            with QueryRecorder() as recorder:
+                start = time.perf_counter()
+                benchmark()
+                timings.append(time.perf_counter() - start)
+        return {
+            "runs": repeat,
+            "min": min(timings),
+            "median": statistics.median(timings),
+            "max": max(timings),
+            "queries": recorder.count,
+            "query_seconds": recorder.seconds,
+        }
+
+    def benchmarks(self):
+        slug = self.location.slug
+        month = {"month": self.today.month, "year": self.today.year}
+        arrive = self.today + datetime.timedelta(days=7)
+        depart = arrive + datetime.timedelta(days=5)
+        return [
+            ("stay", self.page(self.anonymous, reverse("location_stay", args=(slug,)))),
+            (
+                "room_api",
+                self.page(
+                    self.anonymous,
+                    reverse("json_room_list", args=(slug,)),
+                    {"arrive": arrive.isoformat(), "depart": depart.isoformat()},
+                ),
+            ),
+            (
+                "calendar",
+                self.page(
+                    self.admin, reverse("location_calendar", args=(slug,)), month
+                ),
+            ),
+            (
+                "occupancy",
+                self.page(
+                    self.admin, reverse("location_occupancy", args=(slug,)), month
+                ),
+            ),
+            (
+                "payments",
+                self.page(
+                    self.admin,
+                    reverse(
+                        "location_payments",
+                        args=(slug, self.today.year, self.today.month),
+                    ),
+                ),
+            ),
+            (
+                "booking_list",
+                self.page(self.admin, reverse("booking_manage_list", args=(slug,))),
+            ),
+            ("graphql", self.graphql(arrive, depart)),
+            ("daily_tasks", self.daily_tasks),
+        ]
+
+    def page(self, client, url, params=None):
+        def get():
+            response = client.get(url, params)
+            if response.status_code != 200:
+                raise CommandError(f"{url} returned {response.status_code}")
+
+        return get
+
+    def graphql(self, arrive, depart):
+        body = json.dumps(
+            {
+                "query": GRAPHQL_QUERY,
+                "variables": {
+                    "slug": self.location.slug,
+                    "arrive": f"{arrive.isoformat()}T00:00:00",
+                    "depart": f"{depart.isoformat()}T00:00:00",
+                },
+            }
+        )
+
+        def post():
+            response = self.anonymous.post(
+                "/graphql", body, content_type="application/json"
+            )
+            if response.status_code != 200 or "errors" in response.json():
+                raise CommandError(f"graphql returned {response.content[:500]}")
+
+        return post
+
+    def daily_tasks(self):
+        # without an api key nothing is sent to mailgun, and whatever the
+        # tasks queue or change is rolled back
+        with override_settings(MAILGUN_API_KEY=None), transaction.atomic():
+            for _, task in LOCATION_TASKS:
+                task(self.location)
+            transaction.set_rollback(True)
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import BILL_TOTALS, Bill
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = "Backfill the cached totals on bills, or with --verify just check them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Report bills with wrong cached totals without fixing them.",
+        )
+
+    def handle(self, *args, **options):
+        checked = 0
+        stale = []
+        batch = []
+        for bill in Bill.objects.order_by("pk").iterator(chunk_size=BATCH_SIZE):
+            batch.append(bill)
+            if len(batch) == BATCH_SIZE:
+                stale += self.check_batch(batch, options["verify"])
+                checked += len(batch)
+                batch = []
+        if batch:
+            stale += self.check_batch(batch, options["verify"])
+            checked += len(batch)
+
+        if options["verify"]:
+            for bill_id in stale:
+                self.stdout.write(f"Bill {bill_id} has stale totals")
+            if stale:
+                raise CommandError(f"{len(stale)} of {checked} bills have stale totals")
+            self.stdout.write(self.style.SUCCESS(f"All {checked} bills are correct"))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"Updated {len(stale)} of {checked} bills")
+            )
+
+    def check_batch(self, bills, verify):
+        stale = Bill.objects.stale_totals(bills)
+        if stale and not verify:
+            Bill.objects.bulk_update(stale, BILL_TOTALS)
+        return [bill.pk for bill in stale]
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.factory_apps.benchmark import BenchmarkData
+
+
+class Command(BaseCommand):
+    help = "Generate a large, realistic data set to run the benchmarks against."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--locations", type=int, default=3)
+        parser.add_argument("--rooms", type=int, default=5, help="Per location")
+        parser.add_argument("--capacity-changes", type=int, default=3, help="Per room")
+        parser.add_argument(
+            "--years", type=int, default=2, help="How many years of bookings"
+        )
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--events", type=int, default=20, help="Per location")
+        parser.add_argument(
+            "--paid",
+            type=float,
+            default=0.8,
+            help="Share of confirmed bookings that have been paid (default 0.8)",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--media-root",
+            help="Write the generated images here instead of MEDIA_ROOT",
+        )
+
+    def handle(self, *args, **options):
+        data = BenchmarkData(
+            locations=options["locations"],
+            rooms=options["rooms"],
+            capacity_changes=options["capacity_changes"],
+            years=options["years"],
+            users=options["users"],
+            events=options["events"],
+            paid=options["paid"],
+            seed=options["seed"],
+            media_root=options["media_root"],
+        )
+        with transaction.atomic():
+            counts = data.generate()
+        summary = ", ".join(f"{count} {kind}" for kind, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Generated {summary}"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import DailyOccupancy, Location, Resource
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily occupancy table from approved and confirmed uses."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--location", help="Only rebuild the resources of this location slug."
+        )
+
+    def handle(self, *args, **options):
+        resources = None
+        if options["location"]:
+            try:
+                location = Location.objects.get(slug=options["location"])
+            except Location.DoesNotExist:
+                raise CommandError(f"No location '{options['location']}'") from None
+            resources = Resource.objects.filter(location=location)
+        rows = DailyOccupancy.objects.rebuild(resources)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} days of occupancy"))
@@ -1,21 +1,58 @@
 import datetime
+import time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
+from core.emails.mailgun import mailgun_session
+from core.emails.messages import admin_daily_update, guests_residents_daily_update
+from core.libs.task_runner import TaskRunner, summarize
+from core.models import Location
 from gather import tasks as gather_tasks
 
 from ... import tasks
 
+# tasks run once for each location
+LOCATION_TASKS = [
+    ("guests_residents_daily_update", guests_residents_daily_update),
+    ("admin_daily_update", admin_daily_update),
+    ("guest_welcome", tasks.guest_welcome_emails),
+    ("departure_email", tasks.departure_emails),
+    ("events_today_reminder", gather_tasks.location_events_today_reminder),
+]
+SUNDAY_LOCATION_TASKS = [
+    ("weekly_upcoming_events", gather_tasks.location_weekly_upcoming_events),
+]
+
 
 class Command(BaseCommand):
     help = "Run daily scheduled tasks from Heroku Scheduler, or similar."
 
-    def handle(self, *args, **kwargs):
-        tasks.send_guests_residents_daily_update()
-        tasks.send_admin_daily_update()
-        tasks.send_guest_welcome()
-        tasks.send_departure_email()
-        tasks.slack_embassysf_daily()
-        gather_tasks.events_today_reminder()
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="How many tasks to run at once (default 8)",
+        )
+
+    def handle(self, *args, **options):
+        location_tasks = list(LOCATION_TASKS)
         if datetime.date.today().weekday() == 6:  # sunday
-            gather_tasks.weekly_upcoming_events()
+            location_tasks += SUNDAY_LOCATION_TASKS
+
+        runner = TaskRunner(max_workers=options["workers"])
+        runner.add("slack_embassysf_daily", tasks.slack_embassysf_daily)
+        for location in Location.objects.all():
+            for name, task in location_tasks:
+                runner.add(f"{name} {location.slug}", task, location)
+
+        start = time.perf_counter()
+        # all the emails go out over the same connections
+        with mailgun_session():
+            results = runner.run()
+        self.stdout.write(summarize(results, time.perf_counter() - start))
+
+        failed = [result for result in results if not result.ok]
+        if failed:
+            raise CommandError(f"{len(failed)} of {len(results)} daily tasks failed")
+        self.stdout.write(self.style.SUCCESS("Daily tasks done"))
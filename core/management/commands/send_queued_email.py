@@ -0,0 +1,82 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.emails.mailgun import mailgun_session
+from core.models import OutboundEmail
+
+
+class Command(BaseCommand):
+    help = "Send the email waiting in the outbox through mailgun."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="How many messages to claim at a time (default 100)",
+        )
+        parser.add_argument(
+            "--rate",
+            type=int,
+            default=100,
+            help="Most messages to send per sending domain per minute (default 100)",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the outbox instead of stopping once it is empty.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=10,
+            help="Seconds to wait between polls with --loop (default 10)",
+        )
+
+    def handle(self, *args, **options):
+        totals = {"sent": 0, "retrying": 0, "failed": 0, "deferred": 0}
+        with mailgun_session():
+            while True:
+                emails = OutboundEmail.objects.claim(options["batch_size"])
+                for key, count in self.send_batch(emails, options["rate"]).items():
+                    totals[key] += count
+                if len(emails) < options["batch_size"]:
+                    if not options["loop"]:
+                        break
+                    time.sleep(options["sleep"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Sent {sent}, {retrying} to retry, {failed} failed, "
+                "{deferred} deferred by the rate limit".format(**totals)
+            )
+        )
+
+    def send_batch(self, emails, rate):
+        counts = {"sent": 0, "retrying": 0, "failed": 0, "deferred": 0}
+        now = timezone.now()
+        sent = OutboundEmail.objects.sent_per_domain(
+            now - datetime.timedelta(minutes=1)
+        )
+        deferred = []
+        for email in emails:
+            if sent.get(email.domain, 0) >= rate:
+                deferred.append(email.pk)
+                continue
+            if email.send():
+                sent[email.domain] = sent.get(email.domain, 0) + 1
+                counts["sent"] += 1
+            elif email.status == OutboundEmail.FAILED:
+                counts["failed"] += 1
+            else:
+                counts["retrying"] += 1
+        if deferred:
+            # try again once the domain's minute is up
+            OutboundEmail.objects.filter(pk__in=deferred).update(
+                next_attempt=now + datetime.timedelta(minutes=1)
+            )
+            counts["deferred"] = len(deferred)
+        return counts
@@ -0,0 +1,61 @@
+import logging
+import os
+
+from django.conf import settings
+
+from core.libs.query_budget import UNRESOLVED, QueryRecorder, worst_endpoints
+from core.libs.request_cache import request_cache_scope
+
+logger = logging.getLogger(__name__)
+
+
+class RequestCacheMiddleware:
+    """Opens a request cache scope around every request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with request_cache_scope():
+            return self.get_response(request)
+
+
+class QueryBudgetMiddleware:
+    """Counts the queries each request makes and the time spent in them, and
+    logs a warning for requests over QUERY_BUDGET queries or that repeat one
+    query shape at least QUERY_REPEAT_THRESHOLD times (likely an N+1).
+
+    The worst request of each endpoint is kept in
+    core.libs.query_budget.worst_endpoints; requests that don't resolve to a
+    view are all kept under one UNRESOLVED entry. Each process logs the table
+    every QUERY_REPORT_EVERY requests. With QUERY_SERVER_TIMING on, or for
+    staff, the counts are also sent in a Server-Timing header.
+
+    Queries run while a streaming response is consumed aren't counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        endpoint = match.view_name if match else UNRESOLVED
+        repeated = recorder.repeated(settings.QUERY_REPEAT_THRESHOLD)
+        recorded = worst_endpoints.record(endpoint, recorder, repeated)
+        if recorder.count > settings.QUERY_BUDGET or repeated:
+            logger.warning(f"{request.method} {endpoint}: {recorder.report()}")
+        if settings.QUERY_REPORT_EVERY and recorded % settings.QUERY_REPORT_EVERY == 0:
+            logger.info(f"pid {os.getpid()} {worst_endpoints.report()}")
+
+        user = getattr(request, "user", None)
+        if settings.QUERY_SERVER_TIMING or (user is not None and user.is_staff):
+            timing = (
+                f'db;dur={recorder.seconds * 1000:.1f};desc="{recorder.count} queries"'
+            )
+            if response.has_header("Server-Timing"):
+                timing = f"{response['Server-Timing']}, {timing}"
+            response["Server-Timing"] = timing
+        return response
@@ -0,0 +1,68 @@
+# Generated by Django 5.0.7 on 2026-10-18 01:22
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_daily_occupancy(apps, schema_editor):
+    Use = apps.get_model("core", "Use")
+    DailyOccupancy = apps.get_model("core", "DailyOccupancy")
+
+    # the beds taken on each day of each resource, from arrive up to but not
+    # including depart
+    counts = {}
+    for use in Use.objects.filter(
+        status__in=["approved", "confirmed"], resource__isnull=False
+    ).only("resource", "arrive", "depart"):
+        day = use.arrive
+        while day < use.depart:
+            key = (use.resource_id, day)
+            counts[key] = counts.get(key, 0) + 1
+            day += datetime.timedelta(days=1)
+
+    DailyOccupancy.objects.bulk_create(
+        [
+            DailyOccupancy(resource_id=resource_id, day=day, quantity=count)
+            for (resource_id, day), count in counts.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0007_userprofile_contract_terms_accepted"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyOccupancy",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("quantity", models.IntegerField(default=0)),
+                (
+                    "resource",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_occupancy",
+                        to="core.resource",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("resource", "day")},
+            },
+        ),
+        migrations.RunPython(fill_daily_occupancy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.0.7 on 2026-10-18 01:28
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Q, Sum
+
+
+def fill_bill_totals(apps, schema_editor):
+    Bill = apps.get_model("core", "Bill")
+    BillLineItem = apps.get_model("core", "BillLineItem")
+    Payment = apps.get_model("core", "Payment")
+
+    fee = Q(fee__isnull=False)
+    house = Q(paid_by_house=True)
+    items = {
+        row["bill"]: row
+        for row in BillLineItem.objects.filter(bill__isnull=False)
+        .values("bill")
+        .annotate(
+            bill_amount=Sum("amount", filter=~(fee & house)),
+            subtotal=Sum("amount", filter=~fee),
+            house_fees=Sum("amount", filter=fee & house),
+            non_house_fees=Sum("amount", filter=fee & ~house),
+        )
+        .order_by()
+    }
+    paid = dict(
+        Payment.objects.filter(bill__isnull=False)
+        .values("bill")
+        .annotate(total=Sum("paid_amount"))
+        .order_by()
+        .values_list("bill", "total")
+    )
+
+    bills = []
+    for bill in Bill.objects.filter(pk__in=set(items) | set(paid)):
+        row = items.get(bill.pk, {})
+        bill.cached_amount = row.get("bill_amount") or Decimal(0)
+        bill.cached_subtotal = row.get("subtotal") or Decimal(0)
+        bill.cached_house_fees = row.get("house_fees") or Decimal(0)
+        bill.cached_non_house_fees = row.get("non_house_fees") or Decimal(0)
+        bill.cached_total_paid = paid.get(bill.pk) or Decimal(0)
+        bill.cached_total_owed = bill.cached_amount - bill.cached_total_paid
+        bills.append(bill)
+    Bill.objects.bulk_update(
+        bills,
+        [
+            "cached_amount",
+            "cached_subtotal",
+            "cached_house_fees",
+            "cached_non_house_fees",
+            "cached_total_paid",
+            "cached_total_owed",
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0008_dailyoccupancy"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bill",
+            name="cached_amount",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name="bill",
+            name="cached_house_fees",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name="bill",
+            name="cached_non_house_fees",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name="bill",
+            name="cached_subtotal",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name="bill",
+            name="cached_total_owed",
+            field=models.DecimalField(
+                db_index=True, decimal_places=2, default=0, max_digits=12
+            ),
+        ),
+        migrations.AddField(
+            model_name="bill",
+            name="cached_total_paid",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(fill_bill_totals, migrations.RunPython.noop),
+    ]
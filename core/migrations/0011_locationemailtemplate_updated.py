@@ -0,0 +1,17 @@
+# Generated by Django 5.0.7 on 2026-10-18 01:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0010_outboundemail"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="locationemailtemplate",
+            name="updated",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
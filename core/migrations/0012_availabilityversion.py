@@ -0,0 +1,38 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_versions(apps, schema_editor):
+    Location = apps.get_model("core", "Location")
+    AvailabilityVersion = apps.get_model("core", "AvailabilityVersion")
+    AvailabilityVersion.objects.bulk_create(
+        [AvailabilityVersion(location=location) for location in Location.objects.all()]
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0011_locationemailtemplate_updated"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AvailabilityVersion",
+            fields=[
+                (
+                    "location",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="availability_version",
+                        serialize=False,
+                        to="core.location",
+                    ),
+                ),
+                ("version", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
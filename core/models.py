@@ -2,15 +2,32 @@ import datetime
 import logging
 import os
 import uuid
+from bisect import bisect_right
+from contextlib import contextmanager, nullcontext
 from decimal import Decimal
+from email.utils import parseaddr
 
 import django.dispatch
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.flatpages.models import FlatPage
-from django.db import models
-from django.db.models import Q
-from django.db.models.signals import m2m_changed, pre_save
+from django.db import models, transaction
+from django.db.models import (
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
 from django.urls import reverse
 from django.utils import timezone
@@ -19,7 +36,8 @@ from imagekit.models import ImageSpecField, ProcessedImageField
 from imagekit.processors import ResizeToFill
 
 from bank.models import Account, Currency, Transaction
-from core.libs.dates import count_range_objects_on_day, dates_within
+from core.libs import request_cache
+from core.libs.dates import as_date, daily_range_counts, dates_within
 
 logger = logging.getLogger(__name__)
 
@@ -45,6 +63,21 @@ LOCATION_MEMBER = "members"
 LOCATION_LINK = "link"
 
 
+RESIDENT_INDEXES_CACHE_KEY = ("resident_indexes",)
+
+
+class ResidentIndex:
+    """The current residents of a location, as a list of users and a set of
+    their ids for quick membership tests."""
+
+    def __init__(self, users):
+        self.users = list(users)
+        self.ids = frozenset(user.pk for user in self.users)
+
+    def __contains__(self, user):
+        return getattr(user, "pk", None) in self.ids
+
+
 class Location(models.Model):
     name = models.CharField(max_length=200)
     slug = models.CharField(
@@ -168,8 +201,10 @@ class Location(models.Model):
 
     def rooms_with_future_capacity(self):
         future_capacity = []
-        for room in Resource.objects.filter(location=self).prefetch_related(
-            "capacity_changes"
+        for room in (
+            Resource.objects.filter(location=self)
+            .select_related("location")
+            .prefetch_related("capacity_changes")
         ):
             if room.has_future_capacity():
                 future_capacity.append(room)
@@ -177,8 +212,10 @@ class Location(models.Model):
 
     def rooms_with_future_drft_capacity(self):
         future_capacity = []
-        for room in Resource.objects.filter(location=self).prefetch_related(
-            "capacity_changes"
+        for room in (
+            Resource.objects.filter(location=self)
+            .select_related("location")
+            .prefetch_related("capacity_changes")
         ):
             if room.has_future_capacity() and room.has_future_drft_capacity():
                 future_capacity.append(room)
@@ -209,17 +246,37 @@ class Location(models.Model):
         return available_beds
 
     def rooms_free(self, arrive, depart):
-        available = list(self.resources.all())
-        for room in self.get_rooms():
-            the_day = arrive
-            while the_day < depart:
-                # if there is any day the room isn't available, then the room
-                # isn't free the whole time
-                if not room.available_on(the_day):
-                    available.remove(room)
-                    break
-                the_day = the_day + datetime.timedelta(1)
-        return available
+        """Returns the rooms with a free bed on every night from arrive up to
+        (but not including) depart."""
+        from core.data_fetchers import LocationAvailability
+
+        rooms = list(self.resources.all())
+        arrive, depart = as_date(arrive), as_date(depart)
+        if depart <= arrive:
+            return rooms
+        availability = LocationAvailability(
+            self, arrive, depart - datetime.timedelta(1), resources=rooms
+        )
+        return [
+            room
+            for room in rooms
+            if all(
+                quantity > 0 for _, quantity in availability.daily_availabilities(room)
+            )
+        ]
+
+    def full_days(self, start, end):
+        """Returns the set of days from start to end inclusive on which no
+        room has a free bed."""
+        from core.data_fetchers import LocationAvailability
+
+        start, end = as_date(start), as_date(end)
+        matrix = LocationAvailability(self, start, end).as_matrix()
+        return {
+            day
+            for i, day in enumerate(dates_within(start, end))
+            if not any(daily[i][1] > 0 for daily in matrix.values())
+        }
 
     def has_capacity(self, arrive=None, depart=None):
         if not arrive:
@@ -310,12 +367,21 @@ class Location(models.Model):
         else:
             return None
 
+    def resident_index(self):
+        """the current residents, loaded in one query and reused for the
+        rest of the request."""
+        # all locations share one cache entry so that a change to any backing
+        # can drop them together
+        indexes = request_cache.get_cached(RESIDENT_INDEXES_CACHE_KEY, dict)
+        if self.pk not in indexes:
+            indexes[self.pk] = ResidentIndex(Backing.objects.current_backers(self))
+        return indexes[self.pk]
+
     def residents(self):
-        all_residents = []
-        for resource in self.resources.all():
-            for resident in resource.backers():
-                all_residents.append(resident)
-        return all_residents
+        return self.resident_index().users
+
+    def is_resident(self, user):
+        return user in self.resident_index()
 
 
 class LocationNotUniqueException(Exception):
@@ -392,13 +458,11 @@ class Resource(models.Model):
     def __str__(self):
         return self.name
 
+    def capacity_timeline(self):
+        return CapacityChange.objects.timeline(self)
+
     def quantity_between(self, start, end):
-        total = 0
-        the_day = start
-        while the_day < end:
-            total += self.capacity_on(the_day)
-            the_day += datetime.timedelta(1)
-        return total
+        return self.capacity_timeline().quantity_between(start, end)
 
     def confirmed_uses_between(self, start, end):
         return self.use_set.confirmed_between_dates(start, end)
@@ -413,7 +477,7 @@ class Resource(models.Model):
         # SOME 'future' capacity.
         avails = self.capacity_changes.all()
         if accept_drft:
-            avails = avails.filter(accept_drft=True)
+            avails = [a for a in avails if a.accept_drft]
         # do sort outside database so prefetch_related works
         avails = sorted(list(avails), key=lambda obj: obj.start_date, reverse=True)
         for a in avails:
@@ -437,15 +501,13 @@ class Resource(models.Model):
         capacities = self.capacity_on(this_day)
         if not capacities:
             return False
-        uses_on_this_day = Use.objects.confirmed_approved_on_date(
-            this_day, self.location, resource=self
-        )
-        return len(uses_on_this_day) < capacities
+        used = DailyOccupancy.objects.used_between([self], this_day, this_day)
+        return used.get(self.pk, {}).get(as_date(this_day), 0) < capacities
 
     def drftable_between(self, start, end):
         # note this just checks if the resource has drftable capacity, not
         # whether it has _availability_. (ie, it migt be drftable but booked).
-        return all(self.drftable_on(day) for day in dates_within(start, end))
+        return self.capacity_timeline().drft_between(start, end)
 
     def available_between(self, start, end):
         # note this just checks if the resource has drftable capacity, not
@@ -459,38 +521,7 @@ class Resource(models.Model):
             end datetime
         Returns a list [(day, quantity), ...]
         """
-
-        def capacities_between(start, end):
-            """
-            Returns all the capacity change objects that affect the time period
-            described, in chronological order. This includes the immediately before or on
-            the start date, and any others through to and including the end date.
-            """
-            capacities = self.capacity_changes.exclude(start_date__gt=end).order_by(
-                "-start_date"
-            )
-            capacities_between = []
-            for a in capacities:
-                # since we already filtered out capacities ahead of our date
-                # range, we just need to go backwards until the first avail that
-                # starts on or before our start date, and then break.
-                if a.start_date > start:
-                    capacities_between.append(a)
-                else:
-                    capacities_between.append(a)
-                    break
-            capacities_between.reverse()
-            return capacities_between
-
-        capacities = capacities_between(start, end)
-        quantity = 0
-        result = []
-        for day in dates_within(start, end):
-            if capacities and capacities[0].start_date <= day:
-                quantity = capacities.pop(0).quantity
-            result.append((day, quantity))
-
-        return result
+        return self.capacity_timeline().daily_quantities(start, end)
 
     def daily_availabilities_within(self, start, end):
         """
@@ -501,29 +532,13 @@ class Resource(models.Model):
         Returns a list [(day, quantity), ...]
         Quantity = capacity - confirmed usage
         """
-        daily_capacities = self.daily_capacities_within(start, end)
-        uses = self.confirmed_uses_between(start, end)
-
-        result = []
-        for daily_capacity in daily_capacities:
-            day = daily_capacity[0]
-            use_quantity = count_range_objects_on_day(uses, day)
-            result_quantity = daily_capacity[1] - use_quantity
-            result.append((day, result_quantity))
+        from core.data_fetchers import LocationAvailability
 
-        return result
+        availability = LocationAvailability(self.location, start, end, resources=[self])
+        return availability.daily_availabilities(self)
 
     def max_daily_capacities_between(self, start, end):
-        max_quantity = 0
-        avails = self.capacity_changes.exclude(start_date__gt=end).order_by(
-            "-start_date"
-        )
-        for a in avails:
-            if a.quantity > max_quantity:
-                max_quantity = a.quantity
-            if a.start_date <= start:
-                break
-        return max_quantity
+        return self.capacity_timeline().max_quantity_between(start, end)
 
     def tz(self):
         assert (
@@ -662,29 +677,97 @@ class UseManager(models.Manager):
         return list(confirmed_bookings)
 
     def confirmed_but_unpaid(self, location):
-        confirmed_this_location = (
-            super()
-            .get_queryset()
-            .filter(location=location, status="confirmed")
-            .order_by("-arrive")
+        # confirmed uses whose booking still has money owed on it, filtered on
+        # the bill's cached total owed.
+        return (
+            self.filter(
+                location=location,
+                status="confirmed",
+                booking__bill__cached_total_owed__gt=0,
+            )
+            .annotate(amount_owed=F("booking__bill__cached_total_owed"))
+            .order_by("-arrive", "-id")
             .select_related("booking", "booking__bill", "resource", "user")
-            # this makes is is_paid() efficient
-            .prefetch_related(
-                "booking__bill__line_items",
-                "booking__bill__line_items__fee",
-                "booking__bill__payments",
+        )
+
+
+BILL_TOTALS = (
+    "cached_amount",
+    "cached_subtotal",
+    "cached_house_fees",
+    "cached_non_house_fees",
+    "cached_total_paid",
+    "cached_total_owed",
+)
+
+
+class BillManager(models.Manager):
+    def owing(self):
+        # bills with money still owed on them, from the cached totals.
+        return self.get_queryset().filter(cached_total_owed__gt=0)
+
+    def computed_totals(self, bill_ids):
+        """Returns a dict of bill id: {total name: value} for the given bills,
+        computed from their line items and payments with two aggregate
+        queries."""
+        zero = Value(Decimal(0), output_field=models.DecimalField())
+        fee = Q(fee__isnull=False)
+        house = Q(paid_by_house=True)
+        items = {
+            row["bill"]: row
+            for row in BillLineItem.objects.filter(bill__in=bill_ids)
+            .values("bill")
+            .annotate(
+                bill_amount=Coalesce(Sum("amount", filter=~(fee & house)), zero),
+                subtotal=Coalesce(Sum("amount", filter=~fee), zero),
+                house_fees=Coalesce(Sum("amount", filter=fee & house), zero),
+                non_house_fees=Coalesce(Sum("amount", filter=fee & ~house), zero),
             )
+            .order_by()
+        }
+        paid = dict(
+            Payment.objects.filter(bill__in=bill_ids)
+            .values("bill")
+            .annotate(total=Coalesce(Sum("paid_amount"), zero))
+            .order_by()
+            .values_list("bill", "total")
         )
-        unpaid_this_location = []
-        for use in confirmed_this_location:
-            try:
-                # use try-except in case the use doesn't have a booking
-                # XXX FIXME. this is a horrible hack.
-                if not use.booking.bill.is_paid():
-                    unpaid_this_location.append(use.booking)
-            except Exception:
-                pass
-        return unpaid_this_location
+        totals = {}
+        for bill_id in bill_ids:
+            row = items.get(bill_id, {})
+            amount = row.get("bill_amount", Decimal(0))
+            total_paid = paid.get(bill_id, Decimal(0))
+            totals[bill_id] = {
+                "cached_amount": amount,
+                "cached_subtotal": row.get("subtotal", Decimal(0)),
+                "cached_house_fees": row.get("house_fees", Decimal(0)),
+                "cached_non_house_fees": row.get("non_house_fees", Decimal(0)),
+                "cached_total_paid": total_paid,
+                "cached_total_owed": amount - total_paid,
+            }
+        return totals
+
+    def update_totals(self, bill_ids):
+        # recompute the cached totals of the given bills. written with
+        # update() so that generated_on is left alone and no save signals
+        # fire.
+        computed = self.computed_totals(bill_ids)
+        for bill_id, totals in computed.items():
+            self.get_queryset().filter(pk=bill_id).update(**totals)
+        return computed
+
+    def stale_totals(self, bills):
+        """Returns the bills (of the given list) whose cached totals differ
+        from their line items and payments, with the correct totals set."""
+        computed = self.computed_totals([bill.pk for bill in bills])
+        stale = []
+        for bill in bills:
+            totals = computed[bill.pk]
+            if any(getattr(bill, name) != totals[name] for name in BILL_TOTALS):
+                for name, value in totals.items():
+                    setattr(bill, name, value)
+                stale.append(bill)
+        return stale
 
 
 class Bill(models.Model):
@@ -692,14 +775,46 @@ class Bill(models.Model):
     from Booking, BillLineItem and Payment. Each bill can have many
     bookings, bill line items and many payments. Line items can be accessed
     with the related name bill.line_items, and payments can be accessed with
-    the related name bill.payments."""
+    the related name bill.payments.
+
+    the cached_* columns hold the totals of the line items and payments, kept
+    up to date by update_totals() whenever either changes, so bills can be
+    filtered and sorted by them in the database."""
 
     generated_on = models.DateTimeField(auto_now=True)
     comment = models.TextField(blank=True, null=True)
+    cached_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cached_subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cached_house_fees = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cached_non_house_fees = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0
+    )
+    cached_total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cached_total_owed = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, db_index=True
+    )
+
+    objects = BillManager()
 
     def __str__(self):
         return "Bill %d" % self.id
 
+    def update_totals(self):
+        totals = Bill.objects.update_totals([self.pk])[self.pk]
+        for name, value in totals.items():
+            setattr(self, name, value)
+
+    @contextmanager
+    def deferred_totals(self):
+        # line items and payments of this (loaded) bill changed in the block
+        # don't each recompute the totals; they are recomputed once at the end.
+        self._totals_deferred = True
+        try:
+            yield
+        finally:
+            self._totals_deferred = False
+        self.update_totals()
+
     def non_refund_payments(self):
         return self.payments.filter(paid_amount__gt=0)
 
@@ -738,18 +853,20 @@ class Bill(models.Model):
         # items that go into the subtotal before calculating taxes and fees.
         # NOTE: will return an *ordered* list with the base resource fee first.
 
+        # filtered in python (here and below) so that prefetched line items
+        # are used.
+        line_items = self.line_items.all()
         # the base resource fee is not derived from a standing fee, and is not a custom fee
-        base_resource_fee = self.line_items.filter(fee__isnull=True).filter(
-            custom=False
-        )
+        base_resource_fee = [
+            item for item in line_items if item.fee_id is None and not item.custom
+        ]
         # all other line items that go into the subtotal are custom fees
-        addl_fees = self.line_items.filter(fee__isnull=True).filter(custom=True)
-        return list(base_resource_fee) + list(addl_fees)
+        addl_fees = [item for item in line_items if item.fee_id is None and item.custom]
+        return base_resource_fee + addl_fees
 
     def fees(self):
         # the taxes and fees on top of subtotal
-        bill_fees = self.line_items.filter(fee__isnull=False)
-        return list(bill_fees)
+        return [item for item in self.line_items.all() if item.fee_id is not None]
 
     def house_fees(self):
         # Pull the house fees from the generated bill line items
@@ -787,10 +904,13 @@ class Bill(models.Model):
     def ordered_line_items(self):
         # return bill line items orderer first with the resource item, then the
         # custom items, then the fees
-        resource_item = self.line_items.filter(custom=False).filter(fee=None)
-        custom_items = self.line_items.filter(custom=True)
-        fees = self.line_items.filter(fee__isnull=False)
-        return list(resource_item) + list(custom_items) + list(fees)
+        line_items = self.line_items.all()
+        resource_item = [
+            item for item in line_items if not item.custom and item.fee_id is None
+        ]
+        custom_items = [item for item in line_items if item.custom]
+        fees = [item for item in line_items if item.fee_id is not None]
+        return resource_item + custom_items + fees
 
     def is_booking_bill(self):
         return hasattr(self, "bookingbill")
@@ -927,6 +1047,206 @@ class Use(models.Model):
         except Exception:
             return False
 
+    def save(self, *args, **kwargs):
+        # keep the daily occupancy table in step with this use, in the same
+        # transaction as the change itself.
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = (
+                    Use.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values("resource_id", "arrive", "depart", "status")
+                    .first()
+                )
+            super().save(*args, **kwargs)
+            DailyOccupancy.objects.use_changed(
+                previous,
+                {
+                    "resource_id": self.resource_id,
+                    "arrive": self.arrive,
+                    "depart": self.depart,
+                    "status": self.status,
+                },
+            )
+
+
+class DailyOccupancyManager(models.Manager):
+    OCCUPYING_STATUSES = (Use.APPROVED, Use.CONFIRMED)
+
+    def _occupies(self, use):
+        return (
+            use is not None
+            and use["resource_id"] is not None
+            and use["status"] in self.OCCUPYING_STATUSES
+        )
+
+    def _add(self, resource_id, arrive, depart, quantity):
+        """Adds quantity to the beds used on each night from arrive up to
+        (but not including) depart."""
+        arrive, depart = as_date(arrive), as_date(depart)
+        if depart <= arrive:
+            return
+        # lock the resource so concurrent changes to its nights serialise.
+        Resource.objects.select_for_update().filter(pk=resource_id).exists()
+        AvailabilityVersion.objects.bump(
+            Resource.objects.filter(pk=resource_id).values("location")
+        )
+        nights = self.get_queryset().filter(
+            resource_id=resource_id, day__gte=arrive, day__lt=depart
+        )
+        existing = set(nights.values_list("day", flat=True))
+        nights.update(quantity=F("quantity") + quantity)
+        self.bulk_create(
+            [
+                DailyOccupancy(resource_id=resource_id, day=day, quantity=quantity)
+                for day in dates_within(arrive, depart - datetime.timedelta(1))
+                if day not in existing
+            ]
+        )
+        nights.filter(quantity=0).delete()
+
+    def use_changed(self, previous, current):
+        """Moves a use's beds from its previous state to its current one.
+        Either state is a dict of resource_id, arrive, depart and status, or
+        None if the use did not (or no longer does) exist."""
+        if previous == current:
+            return
+        if self._occupies(previous):
+            self._add(
+                previous["resource_id"], previous["arrive"], previous["depart"], -1
+            )
+        if self._occupies(current):
+            self._add(current["resource_id"], current["arrive"], current["depart"], 1)
+
+    def rebuild(self, resources=None):
+        """Recomputes the table from the uses of the given resources (or of
+        all resources). Returns the number of rows written."""
+        with transaction.atomic():
+            uses = Use.objects.filter(
+                status__in=self.OCCUPYING_STATUSES, resource__isnull=False
+            ).only("resource", "arrive", "depart")
+            rows = self.get_queryset()
+            if resources is not None:
+                uses = uses.filter(resource__in=resources)
+                rows = rows.filter(resource__in=resources)
+            rows.delete()
+
+            uses_by_resource = {}
+            for use in uses.order_by():
+                uses_by_resource.setdefault(use.resource_id, []).append(use)
+
+            occupancy = []
+            for resource_id, resource_uses in uses_by_resource.items():
+                start = min(use.arrive for use in resource_uses)
+                end = max(use.depart for use in resource_uses)
+                counts = daily_range_counts(resource_uses, start, end)
+                occupancy.extend(
+                    DailyOccupancy(resource_id=resource_id, day=day, quantity=count)
+                    for day, count in zip(dates_within(start, end), counts)
+                    if count
+                )
+            self.bulk_create(occupancy, batch_size=1000)
+            locations = Location.objects.all()
+            if resources is not None:
+                locations = Resource.objects.filter(pk__in=resources).values("location")
+            AvailabilityVersion.objects.bump(locations)
+            return len(occupancy)
+
+    def used_between(self, resources, start, end):
+        """Returns a dict of resource id: {day: beds used} for the days from
+        start to end inclusive. Days without any use are left out."""
+        result = {}
+        for resource_id, day, quantity in (
+            self.get_queryset()
+            .filter(resource__in=resources, day__gte=start, day__lte=end)
+            .values_list("resource_id", "day", "quantity")
+        ):
+            result.setdefault(resource_id, {})[day] = quantity
+        return result
+
+
+class DailyOccupancy(models.Model):
+    """the number of beds of a resource used by approved or confirmed uses on
+    a given night. maintained by Use.save and rebuilt with the
+    rebuild_occupancy management command."""
+
+    resource = models.ForeignKey(
+        Resource, related_name="daily_occupancy", on_delete=models.CASCADE
+    )
+    day = models.DateField()
+    quantity = models.IntegerField(default=0)
+    objects = DailyOccupancyManager()
+
+    class Meta:
+        unique_together = (
+            "resource",
+            "day",
+        )
+
+    def __str__(self):
+        return f"{self.resource_id} {self.day}: {self.quantity}"
+
+
+class AvailabilityVersionManager(models.Manager):
+    def bump(self, locations):
+        """Moves on the versions of the locations, given as ids or as a
+        queryset of them."""
+        self.get_queryset().filter(location__in=locations).update(
+            version=F("version") + 1
+        )
+
+    def current(self, versions):
+        """Returns the (location id, version) of the first of the versions
+        queryset, or None if there is none."""
+        return versions.values_list("location_id", "version").first()
+
+
+class AvailabilityVersion(models.Model):
+    """a counter for each location, moved on by every change that can change
+    the availability of its rooms: capacity changes, uses taking up or
+    freeing beds, and edits of the rooms or the location. lets clients that
+    poll availability be told cheaply that nothing has changed."""
+
+    location = models.OneToOneField(
+        Location,
+        primary_key=True,
+        related_name="availability_version",
+        on_delete=models.CASCADE,
+    )
+    version = models.PositiveIntegerField(default=0)
+    objects = AvailabilityVersionManager()
+
+    def __str__(self):
+        return f"{self.location_id}: {self.version}"
+
+
+@receiver(post_save, sender=Location)
+def location_availability_version(sender, instance, created, **kwargs):
+    if created:
+        AvailabilityVersion.objects.get_or_create(location=instance)
+    else:
+        AvailabilityVersion.objects.bump([instance.pk])
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+def resource_bump_availability_version(sender, instance, **kwargs):
+    AvailabilityVersion.objects.bump([instance.location_id])
+
+
+@receiver(post_delete, sender=Use)
+def use_delete_occupancy(sender, instance, **kwargs):
+    DailyOccupancy.objects.use_changed(
+        {
+            "resource_id": instance.resource_id,
+            "arrive": instance.arrive,
+            "depart": instance.depart,
+            "status": instance.status,
+        },
+        None,
+    )
+
 
 class Booking(models.Model):
     """a model to handle the payment details related to uses"""
@@ -1021,63 +1341,67 @@ class Booking(models.Model):
         if self.bill:
             booking_bill = self.bill
 
-        # impt! save the custom items first or they'll be blown away when the
-        # bill is regenerated.
-        custom_items = []
-        if booking_bill:
-            custom_items = list(booking_bill.line_items.filter(custom=True))
-            if delete_old_items:
-                for item in booking_bill.line_items.all():
-                    item.delete()
-
-        line_items = []
-
-        # The first line item is for the resource charge
-        resource_charge_desc = "%s (%d * $%s)" % (
-            self.use.resource.name,
-            self.use.total_nights(),
-            self.get_rate(),
-        )
-        resource_charge = self.base_value()
-        resource_line_item = BillLineItem(
-            bill=booking_bill,
-            description=resource_charge_desc,
-            amount=resource_charge,
-            paid_by_house=False,
-        )
-        line_items.append(resource_line_item)
-
-        # Incorporate any custom fees or discounts
-        effective_resource_charge = resource_charge
-        for item in custom_items:
-            line_items.append(item)
-            effective_resource_charge += item.amount  # may be negative
-
-        # A line item for every fee that applies to this location
-        if reset_suppressed:
-            self.suppressed_fees.clear()
-        for location_fee in LocationFee.objects.filter(location=self.use.location):
-            if location_fee.fee not in self.suppressed_fees.all():
-                desc = "%s (%s%c)" % (
-                    location_fee.fee.description,
-                    (location_fee.fee.percentage * 100),
-                    "%",
-                )
-                amount = float(effective_resource_charge) * location_fee.fee.percentage
-                fee_line_item = BillLineItem(
-                    bill=booking_bill,
-                    description=desc,
-                    amount=amount,
-                    paid_by_house=location_fee.fee.paid_by_house,
-                    fee=location_fee.fee,
-                )
-                line_items.append(fee_line_item)
-
-        # Optionally save the line items to the database
-        if save:
-            booking_bill.save()
-            for item in line_items:
-                item.save()
+        # the totals are recomputed once at the end, not for each line item
+        with booking_bill.deferred_totals() if booking_bill else nullcontext():
+            # impt! save the custom items first or they'll be blown away when the
+            # bill is regenerated.
+            custom_items = []
+            if booking_bill:
+                custom_items = list(booking_bill.line_items.filter(custom=True))
+                if delete_old_items:
+                    for item in booking_bill.line_items.all():
+                        item.delete()
+
+            line_items = []
+
+            # The first line item is for the resource charge
+            resource_charge_desc = "%s (%d * $%s)" % (
+                self.use.resource.name,
+                self.use.total_nights(),
+                self.get_rate(),
+            )
+            resource_charge = self.base_value()
+            resource_line_item = BillLineItem(
+                bill=booking_bill,
+                description=resource_charge_desc,
+                amount=resource_charge,
+                paid_by_house=False,
+            )
+            line_items.append(resource_line_item)
+
+            # Incorporate any custom fees or discounts
+            effective_resource_charge = resource_charge
+            for item in custom_items:
+                line_items.append(item)
+                effective_resource_charge += item.amount  # may be negative
+
+            # A line item for every fee that applies to this location
+            if reset_suppressed:
+                self.suppressed_fees.clear()
+            for location_fee in LocationFee.objects.filter(location=self.use.location):
+                if location_fee.fee not in self.suppressed_fees.all():
+                    desc = "%s (%s%c)" % (
+                        location_fee.fee.description,
+                        (location_fee.fee.percentage * 100),
+                        "%",
+                    )
+                    amount = (
+                        float(effective_resource_charge) * location_fee.fee.percentage
+                    )
+                    fee_line_item = BillLineItem(
+                        bill=booking_bill,
+                        description=desc,
+                        amount=amount,
+                        paid_by_house=location_fee.fee.paid_by_house,
+                        fee=location_fee.fee,
+                    )
+                    line_items.append(fee_line_item)
+
+            # Optionally save the line items to the database
+            if save:
+                booking_bill.save()
+                for item in line_items:
+                    item.save()
 
         return line_items
 
@@ -1236,7 +1560,7 @@ class Booking(models.Model):
         self.save()
 
     def is_paid(self):
-        return self.bill.total_owed() <= 0
+        return self.bill.cached_total_owed <= 0
 
     def is_comped(self):
         return self.rate == 0
@@ -1311,7 +1635,8 @@ class Payment(models.Model):
         return f"{str(self.payment_date)[:16]}: {self.user} - ${self.paid_amount}"
 
     def to_house(self):
-        return self.paid_amount - self.non_house_fees() - self.house_fees()
+        house_fees, non_house_fees = self.fee_allocation()
+        return self.paid_amount - non_house_fees - house_fees
 
     def is_refund(self):
         return self.paid_amount < 0
@@ -1340,59 +1665,73 @@ class Payment(models.Model):
         balance = self.net_paid()
         return not balance > 0
 
+    def fee_allocation(self):
+        """returns (house fees, non-house fees) carried by this payment."""
+        # set on payments loaded in bulk by allocate_payment_fees()
+        allocation = getattr(self, "_fee_allocation", None)
+        if allocation is None:
+            allocation = _allocate_payment(self, _bill_fee_basis(self.bill))
+        return allocation
+
     def non_house_fees(self):
         """returns the absolute amount of the user paid (non-house) fee(s)"""
-        # takes the appropriate bill line items and applies them proportionately to the payment.
-        fee_line_items_not_paid_by_house = self.bill.line_items.filter(
-            fee__isnull=False
-        ).filter(paid_by_house=False)
-        subtotal = self.bill.subtotal_amount()
-        non_house_fee_on_payment = Decimal(0.0)
-        # this payment may or may not represent the entire bill amount. we need
-        # to know what fraction of the total bill amount it was so that we can
-        # apply the fees proportionately to the payment amount. note: in many
-        # cases, the fraction will be 1.
-
-        if self.bill.amount() == 0:
-            fraction = 0
-        else:
-            fraction = self.paid_amount / self.bill.amount()
-
-        fractional_base_amount = subtotal * fraction
-        for line_item in fee_line_items_not_paid_by_house:
-            # JKS important! this assumes that the line item value accurately
-            # reflects the fee percentage. this should be true, but technically
-            # could be edited in the admin page to be anything. do we want to
-            # enforce this?
-            non_house_fee_on_payment += fractional_base_amount * Decimal(
-                line_item.fee.percentage
-            )
-
-        return non_house_fee_on_payment
+        return self.fee_allocation()[1]
 
     def house_fees(self):
-        # takes the appropriate bill line items and applies them proportionately to the payment.
-        fee_line_items_paid_by_house = self.bill.line_items.filter(paid_by_house=True)
-        subtotal = self.bill.subtotal_amount()
-        house_fee_on_payment = Decimal(0.0)
-        # this payment may or may not represent the entire bill amount. we need
-        # to know what fraction of the total bill amount it was so that we can
-        # apply the fees proportionately to the payment amount. note: in many
-        # cases, the fraction will be 1.
-        if self.bill.amount() == 0:
-            fraction = 0
-        else:
-            fraction = self.paid_amount / self.bill.amount()
-        fractional_base_amount = subtotal * fraction
-        for line_item in fee_line_items_paid_by_house:
-            # JKS important! this assumes that the line item value accurately
-            # reflects the fee percentage. this should be true, but technically
-            # could be edited in the admin page to be anything. do we want to
-            # enforce this?
-            house_fee_on_payment += fractional_base_amount * Decimal(
-                line_item.fee.percentage
-            )
-        return house_fee_on_payment
+        return self.fee_allocation()[0]
+
+
+def _bill_fee_basis(bill):
+    # the bill amount, its subtotal, and the percentages of its house and
+    # non-house fees.
+    # JKS important! this assumes that the line item value accurately
+    # reflects the fee percentage. this should be true, but technically
+    # could be edited in the admin page to be anything. do we want to
+    # enforce this?
+    line_items = bill.line_items.all()
+    house_rates = [
+        Decimal(item.fee.percentage) for item in line_items if item.paid_by_house
+    ]
+    non_house_rates = [
+        Decimal(item.fee.percentage)
+        for item in line_items
+        if item.fee_id is not None and not item.paid_by_house
+    ]
+    return bill.amount(), bill.subtotal_amount(), house_rates, non_house_rates
+
+
+def _allocate_payment(payment, basis):
+    amount, subtotal, house_rates, non_house_rates = basis
+    # this payment may or may not represent the entire bill amount. we need
+    # to know what fraction of the total bill amount it was so that we can
+    # apply the fees proportionately to the payment amount. note: in many
+    # cases, the fraction will be 1.
+    fraction = 0 if amount == 0 else payment.paid_amount / amount
+    fractional_base_amount = subtotal * fraction
+    house_fees = sum(
+        (fractional_base_amount * rate for rate in house_rates), Decimal(0)
+    )
+    non_house_fees = sum(
+        (fractional_base_amount * rate for rate in non_house_rates), Decimal(0)
+    )
+    return house_fees, non_house_fees
+
+
+def allocate_payment_fees(payments):
+    """Splits each payment into its house and non-house fees in one pass.
+
+    The bills' line items (and their fees) should be prefetched. Each bill's
+    amount, subtotal and fee percentages are worked out once however many
+    payments it has, and the split is kept on the payments so that
+    house_fees(), non_house_fees() and to_house() don't recompute it.
+    """
+    payments = list(payments)
+    bases = {}
+    for payment in payments:
+        if payment.bill_id not in bases:
+            bases[payment.bill_id] = _bill_fee_basis(payment.bill)
+        payment._fee_allocation = _allocate_payment(payment, bases[payment.bill_id])
+    return payments
 
 
 def profile_img_upload_to(instance, filename):
@@ -1606,6 +1945,8 @@ class LocationEmailTemplate(models.Model):
     html_body = models.TextField(
         blank=True, null=True, verbose_name="The html body of the email"
     )
+    # compiled templates are cached by this, so edits take effect at once
+    updated = models.DateTimeField(auto_now=True)
 
 
 class LocationFee(models.Model):
@@ -1635,6 +1976,53 @@ class BillLineItem(models.Model):
         return self.description
 
 
+@receiver(pre_save, sender=BillLineItem)
+@receiver(pre_save, sender=Payment)
+def bill_remember_previous(sender, instance, **kwargs):
+    # remember which bill this was on, so that moving it to another bill
+    # updates the totals of both.
+    instance._previous_bill_id = None
+    if instance.pk:
+        instance._previous_bill_id = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("bill_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=BillLineItem)
+@receiver(post_delete, sender=BillLineItem)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def bill_update_totals(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_bill_id", None)
+    if previous and previous != instance.bill_id:
+        Bill.objects.update_totals([previous])
+    if instance.bill_id:
+        # refresh a loaded bill in place so it doesn't show the old totals
+        if sender.bill.is_cached(instance):
+            if not getattr(instance.bill, "_totals_deferred", False):
+                instance.bill.update_totals()
+        else:
+            Bill.objects.update_totals([instance.bill_id])
+
+
+@receiver(pre_delete, sender=Fee)
+def fee_remember_bills(sender, instance, **kwargs):
+    # deleting a fee nulls the fee on its line items with a queryset update,
+    # which sends no signals but changes what counts as a house fee.
+    instance._bill_ids = list(
+        BillLineItem.objects.filter(fee=instance, bill__isnull=False)
+        .values_list("bill_id", flat=True)
+        .distinct()
+    )
+
+
+@receiver(post_delete, sender=Fee)
+def fee_update_bill_totals(sender, instance, **kwargs):
+    Bill.objects.update_totals(getattr(instance, "_bill_ids", []))
+
+
 class LocationMenu(models.Model):
     location = models.ForeignKey(Location, on_delete=models.CASCADE)
     name = models.CharField(
@@ -1715,15 +2103,115 @@ class UseNote(models.Model):
         return "%s - %d: %s" % (self.created.date(), self.booking.id, self.note)
 
 
+class CapacityTimeline:
+    """
+    The capacity changes of a single resource, sorted by start date, so that
+    the capacity on a day or over a range of days can be looked up by
+    bisection without going back to the database.
+    """
+
+    def __init__(self, changes):
+        changes = sorted(changes, key=lambda change: change.start_date)
+        self.start_dates = [change.start_date for change in changes]
+        self.quantities = [change.quantity for change in changes]
+        self.drfts = [change.accept_drft for change in changes]
+
+    def _index(self, day):
+        # index of the latest change starting on or before day, or -1.
+        return bisect_right(self.start_dates, as_date(day)) - 1
+
+    def quantity_on(self, day):
+        index = self._index(day)
+        return self.quantities[index] if index >= 0 else 0
+
+    def drft_on(self, day):
+        index = self._index(day)
+        return self.drfts[index] if index >= 0 else False
+
+    def quantity_between(self, start, end):
+        """Sum of the capacity on each day from start up to but excluding end."""
+        start, end = as_date(start), as_date(end)
+        total = 0
+        index = self._index(start)
+        day = start
+        while day < end:
+            if index + 1 < len(self.start_dates):
+                until = min(self.start_dates[index + 1], end)
+            else:
+                until = end
+            if index >= 0:
+                total += self.quantities[index] * (until - day).days
+            day = until
+            index += 1
+        return total
+
+    def drft_between(self, start, end):
+        """True if every day from start to end inclusive accepts DRFT."""
+        start, end = as_date(start), as_date(end)
+        if end < start:
+            return True
+        first, last = self._index(start), self._index(end)
+        return first >= 0 and all(self.drfts[first : last + 1])
+
+    def max_quantity_between(self, start, end):
+        first, last = self._index(start), self._index(end)
+        return max(self.quantities[max(first, 0) : last + 1], default=0)
+
+    def daily_quantities(self, start, end):
+        """Returns a list [(day, quantity), ...] from start to end inclusive."""
+        start, end = as_date(start), as_date(end)
+        index = self._index(start)
+        result = []
+        for day in dates_within(start, end):
+            while (
+                index + 1 < len(self.start_dates) and self.start_dates[index + 1] <= day
+            ):
+                index += 1
+            result.append((day, self.quantities[index] if index >= 0 else 0))
+        return result
+
+
+def _timeline_cache_key(resource_id):
+    return ("capacity_timeline", resource_id)
+
+
 class CapacityChangeManager(models.Manager):
-    def _latest_change(self, date, resource):
-        return (
-            self.get_queryset()
-            .filter(resource=resource)
-            .filter(start_date__lte=date)
-            .order_by("-start_date")
-            .first()
-        )
+    def timeline(self, resource):
+        """Returns the CapacityTimeline of a resource, built from prefetched
+        capacity changes if there are any, or else from a single query. The
+        timeline is reused for the rest of the request."""
+
+        def build():
+            prefetched = getattr(resource, "_prefetched_objects_cache", {})
+            if "capacity_changes" in prefetched:
+                return CapacityTimeline(prefetched["capacity_changes"])
+            return CapacityTimeline(self.get_queryset().filter(resource=resource))
+
+        return request_cache.get_cached(_timeline_cache_key(resource.pk), build)
+
+    def timelines(self, resources):
+        """Returns a dict of resource id: CapacityTimeline, loading every
+        timeline not already cached for this request in one query."""
+        resource_ids = [getattr(resource, "pk", resource) for resource in resources]
+        missing = [
+            resource_id
+            for resource_id in resource_ids
+            if not request_cache.is_cached(_timeline_cache_key(resource_id))
+        ]
+        changes = {resource_id: [] for resource_id in missing}
+        if missing:
+            for change in self.get_queryset().filter(resource__in=missing):
+                changes[change.resource_id].append(change)
+        result = {}
+        for resource_id in resource_ids:
+            key = _timeline_cache_key(resource_id)
+            if resource_id in changes:
+                result[resource_id] = request_cache.set_cached(
+                    key, CapacityTimeline(changes[resource_id])
+                )
+            else:
+                result[resource_id] = request_cache.get_cached(key, None)
+        return result
 
     def _next_capacity(self, capacity):
         return (
@@ -1743,22 +2231,94 @@ class CapacityChangeManager(models.Manager):
             .first()
         )
 
+    def set_many(self, changes):
+        """Sets the capacity from each (resource id, start date, quantity,
+        accept_drft) change in one database transaction, with a fixed number
+        of queries. As with a single change, a change that would repeat the
+        capacity before it is not kept, and neither is a following change
+        that repeats it.
+
+        Returns the (resource id, start date) of the requested changes that
+        were not kept, and of the following changes that were combined with
+        them."""
+        resource_ids = sorted({change[0] for change in changes})
+        unchanged, combined = [], []
+        with transaction.atomic():
+            # lock the resources so concurrent changes to them serialise.
+            list(
+                Resource.objects.select_for_update()
+                .filter(pk__in=resource_ids)
+                .order_by("pk")
+            )
+            existing = {
+                (change.resource_id, change.start_date): change
+                for change in self.get_queryset().filter(resource__in=resource_ids)
+            }
+            values = {key: (c.quantity, c.accept_drft) for key, c in existing.items()}
+            requested = set()
+            for resource_id, start_date, quantity, accept_drft in changes:
+                values[(resource_id, start_date)] = (quantity, accept_drft)
+                requested.add((resource_id, start_date))
+
+            keep = {}
+            previous = previous_requested = None
+            for key in sorted(values):
+                if previous is not None and key[0] != previous[0]:
+                    previous = previous_requested = None
+                value = values[key]
+                if previous and value == values[previous]:
+                    if key in requested:
+                        unchanged.append(key)
+                        # a following change that repeats it goes too
+                        previous_requested = True
+                        continue
+                    if previous_requested:
+                        combined.append(key)
+                        continue
+                keep[key] = value
+                previous, previous_requested = key, key in requested
+
+            self.filter(
+                pk__in=[c.pk for key, c in existing.items() if key not in keep]
+            ).delete()
+            updated = []
+            for key, (quantity, accept_drft) in keep.items():
+                change = existing.get(key)
+                if change and (change.quantity, change.accept_drft) != (
+                    quantity,
+                    accept_drft,
+                ):
+                    change.quantity, change.accept_drft = quantity, accept_drft
+                    updated.append(change)
+            self.bulk_update(updated, ["quantity", "accept_drft"])
+            self.bulk_create(
+                [
+                    CapacityChange(
+                        resource_id=key[0],
+                        start_date=key[1],
+                        quantity=quantity,
+                        accept_drft=accept_drft,
+                    )
+                    for key, (quantity, accept_drft) in keep.items()
+                    if key not in existing
+                ]
+            )
+            AvailabilityVersion.objects.bump(
+                Resource.objects.filter(pk__in=resource_ids).values("location")
+            )
+        # bulk writes don't send the signals that forget cached timelines
+        for resource_id in resource_ids:
+            request_cache.invalidate(_timeline_cache_key(resource_id))
+        return unchanged, combined
+
     def delete_next_quantity(self, capacity):
         self._next_capacity(capacity).delete()
 
     def drft_on(self, date, resource):
-        latest_change = self._latest_change(date, resource)
-        if latest_change:
-            return latest_change.accept_drft
-        else:
-            return False
+        return self.timeline(resource).drft_on(date)
 
     def quantity_on(self, date, resource):
-        latest_change = self._latest_change(date, resource)
-        if latest_change:
-            return latest_change.quantity
-        else:
-            return 0
+        return self.timeline(resource).quantity_on(date)
 
     def would_not_change_previous_quantity(self, capacity):
         previous_capacity = self._previous_capacity(capacity)
@@ -1796,10 +2356,47 @@ class CapacityChange(models.Model):
         )
 
 
+@receiver(post_save, sender=CapacityChange)
+@receiver(post_delete, sender=CapacityChange)
+def capacity_change_invalidate_timeline(sender, instance, **kwargs):
+    request_cache.invalidate(_timeline_cache_key(instance.resource_id))
+    AvailabilityVersion.objects.bump(
+        Resource.objects.filter(pk=instance.resource_id).values("location")
+    )
+
+
 class BackingManager(models.Manager):
     def by_user(self, user):
         return self.get_queryset().filter(money_account__owners=user)
 
+    def current(self, location=None, date=None):
+        """the backing of each resource (at location, if given) that is
+        current on date (today by default): its most recent backing to have
+        started, as long as it hasn't ended."""
+        if not date:
+            date = timezone.localtime(timezone.now()).date()
+        most_recent = (
+            self.get_queryset()
+            .filter(resource=OuterRef("resource"), start__lte=date)
+            .order_by("-start")
+            .values("pk")[:1]
+        )
+        current = (
+            self.get_queryset()
+            .filter(pk=Subquery(most_recent))
+            .filter(Q(end__isnull=True) | Q(end__gt=date))
+        )
+        if location:
+            current = current.filter(resource__location=location)
+        return current
+
+    def current_backers(self, location, date=None):
+        return (
+            User.objects.filter(backings__in=self.current(location, date))
+            .select_related("profile")
+            .order_by("backings__resource__name", "pk")
+        )
+
     def setup_new(self, resource, backers, start):
         b = Backing(resource=resource, start=start)
         assert b.comes_after_others()
@@ -1896,6 +2493,13 @@ class Backing(models.Model):
         self.drft_account = da
 
 
+@receiver(post_save, sender=Backing)
+@receiver(post_delete, sender=Backing)
+@receiver(m2m_changed, sender=Backing.users.through)
+def backing_invalidate_residents(sender, **kwargs):
+    request_cache.invalidate(RESIDENT_INDEXES_CACHE_KEY)
+
+
 class HouseAccount(models.Model):
     location = models.ForeignKey(Location, on_delete=models.CASCADE)
     account = models.ForeignKey(Account, on_delete=models.CASCADE)
@@ -1907,3 +2511,108 @@ class UseTransaction(models.Model):
 
     def __str__(self):
         return "Transaction %d <> Use %d" % (self.transaction.id, self.use.id)
+
+
+class OutboundEmailManager(models.Manager):
+    def queue(self, mailgun_data, idempotency_key=None):
+        """Adds a message to the outbox. A message with the same
+        idempotency_key as one already queued isn't queued again; the
+        existing one is returned instead."""
+        domain = parseaddr(mailgun_data.get("from", ""))[1].rpartition("@")[2]
+        fields = {"data": mailgun_data, "domain": domain.lower()}
+        if idempotency_key is None:
+            return self.create(**fields)
+        email, _ = self.get_or_create(idempotency_key=idempotency_key, defaults=fields)
+        return email
+
+    def claim(self, limit, lease=datetime.timedelta(minutes=10)):
+        """Returns up to limit messages that are due to be sent, and puts off
+        their next attempt by lease so that other workers skip them."""
+        now = timezone.now()
+        with transaction.atomic():
+            emails = list(
+                self.get_queryset()
+                .select_for_update(skip_locked=True)
+                .filter(status=OutboundEmail.PENDING, next_attempt__lte=now)
+                .order_by("next_attempt")[:limit]
+            )
+            self.get_queryset().filter(pk__in=[email.pk for email in emails]).update(
+                next_attempt=now + lease
+            )
+        return emails
+
+    def sent_per_domain(self, since):
+        """Returns a dict of domain: number of messages sent since."""
+        return dict(
+            self.get_queryset()
+            .filter(sent__gte=since)
+            .order_by()
+            .values_list("domain")
+            .annotate(count=models.Count("pk"))
+        )
+
+
+class OutboundEmail(models.Model):
+    """A message waiting in the outbox to be sent through mailgun by the
+    send_queued_email command, with its delivery attempts."""
+
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUSES = (
+        (PENDING, "Pending"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+    )
+    MAX_ATTEMPTS = 8
+    RETRY_DELAY = datetime.timedelta(minutes=1)
+    MAX_RETRY_DELAY = datetime.timedelta(hours=6)
+
+    created = models.DateTimeField(auto_now_add=True)
+    idempotency_key = models.CharField(
+        max_length=200, unique=True, blank=True, null=True
+    )
+    # the sending domain, which delivery is rate limited by
+    domain = models.CharField(max_length=200)
+    data = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUSES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now, db_index=True)
+    sent = models.DateTimeField(blank=True, null=True, db_index=True)
+    last_error = models.TextField(blank=True)
+
+    objects = OutboundEmailManager()
+
+    def __str__(self):
+        return f"{self.data.get('subject')} ({self.status})"
+
+    def send(self):
+        """Tries to send the message, and on failure schedules the next
+        attempt with exponential backoff. Returns whether it was sent."""
+        from core.emails.mailgun import mailgun_send
+
+        response = mailgun_send(dict(self.data))
+        if response.status_code == 200:
+            self.status = OutboundEmail.SENT
+            self.sent = timezone.now()
+        else:
+            self.attempts += 1
+            # mailgun_send describes connection errors and timeouts, which
+            # are retried like server errors
+            self.last_error = response.content.decode(errors="replace") or (
+                f"mailgun returned {response.status_code}"
+            )
+            # other client errors won't go away by trying again
+            retryable = response.status_code == 429 or response.status_code >= 500
+            if retryable and self.attempts < OutboundEmail.MAX_ATTEMPTS:
+                self.next_attempt = timezone.now() + self.retry_delay()
+            else:
+                self.status = OutboundEmail.FAILED
+        self.save()
+        return self.status == OutboundEmail.SENT
+
+    def retry_delay(self):
+        return min(
+            OutboundEmail.RETRY_DELAY * 2 ** (self.attempts - 1),
+            OutboundEmail.MAX_RETRY_DELAY,
+        )
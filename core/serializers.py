@@ -1,7 +1,7 @@
 import datetime as dt
 from datetime import timedelta
 
-import dateutil
+import dateutil.parser
 from rest_framework import serializers
 
 from core.models import CapacityChange, Fee, Location, Resource
@@ -25,32 +25,49 @@ class FeeSerializer(serializers.ModelSerializer):
         fields = ("id", "description", "percentage", "paid_by_house")
 
 
+def availability_window(request):
+    """Returns the (arrive, depart) dates a room listing reports availabilities
+    for, taken from the request's query string and defaulting to the next
+    two weeks."""
+    try:
+        params = request.query_params.dict()
+    except AttributeError:
+        # this is a django request and not a REST request
+        params = request.GET.dict()
+
+    try:
+        arrive = dateutil.parser.parse(params["arrive"]).date()
+        if "depart" in params:
+            depart = dateutil.parser.parse(params["depart"]).date()
+        else:
+            depart = arrive + timedelta(days=13)
+    except (KeyError, ValueError, OverflowError):
+        arrive = dt.date.today()
+        depart = arrive + timedelta(days=13)
+    return arrive, depart
+
+
 class ResourceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Resource
         exclude = ["location"]
 
     def to_representation(self, obj):
+        # avoid recursive import
+        from core.data_fetchers import LocationAvailability
+
         representation = super().to_representation(obj)
         request = self.context["request"]
-        try:
-            params = request.query_params.dict()
-        except AttributeError:
-            # this is a django request and not a REST request
-            params = request.GET.dict()
-
-        try:
-            arrive = params.get("arrive", dt.datetime.today())
-            arrive = dateutil.parser(arrive).date
-            depart = params.get("depart", arrive + timedelta(days=13))
-            depart = dateutil.parser(depart).date
-        except Exception:
-            arrive = dt.date.today()
-            depart = arrive + timedelta(days=13)
+        arrive, depart = availability_window(request)
 
+        # shared by every room serialized during this request, so the whole
+        # location's availability is loaded once rather than once per room.
+        location_availability = LocationAvailability.for_request(
+            request, obj.location, arrive, depart
+        )
         availabilities = [
             {"date": date, "quantity": quantity}
-            for (date, quantity) in obj.daily_availabilities_within(arrive, depart)
+            for (date, quantity) in location_availability.daily_availabilities(obj)
         ]
         representation["availabilities"] = availabilities
         representation["hasFutureDrftCapacity"] = obj.has_future_drft_capacity()
@@ -12,6 +12,7 @@ from core.emails.messages import (
     goodbye_email,
     guest_welcome,
     guests_residents_daily_update,
+    location_context,
 )
 from core.models import Location, Use
 
@@ -41,21 +42,34 @@ def send_guest_welcome():
     did_send_email = False
 
     for location in locations:
-        soon = datetime.date.today() + datetime.timedelta(
-            days=location.welcome_email_days_ahead
-        )
-        upcoming = (
-            Use.objects.filter(location=location)
-            .filter(arrive=soon)
-            .filter(status="confirmed")
-        )
-        for booking in upcoming:
-            guest_welcome(booking)
+        if guest_welcome_emails(location):
             did_send_email = True
 
     return did_send_email
 
 
+def guest_welcome_emails(location):
+    """welcomes the guests arriving at location in welcome_email_days_ahead
+    days. returns whether any emails were sent."""
+    soon = datetime.date.today() + datetime.timedelta(
+        days=location.welcome_email_days_ahead
+    )
+    upcoming = (
+        Use.objects.filter(location=location)
+        .filter(arrive=soon)
+        .filter(status="confirmed")
+    )
+    did_send_email = False
+    shared = location_context(location)
+    for booking in upcoming:
+        # once a day at most, even if the task is run again
+        guest_welcome(
+            booking, shared, idempotency_key=f"guest_welcome:{booking.pk}:{soon}"
+        )
+        did_send_email = True
+    return did_send_email
+
+
 def send_departure_email():
     logger.info("Running task: send_departure_email")
 
@@ -65,19 +79,29 @@ def send_departure_email():
     # get all bookings departing today
     locations = Location.objects.all()
     for location in locations:
-        today = datetime.date.today()
-        departing = (
-            Use.objects.filter(location=location)
-            .filter(depart=today)
-            .filter(status="confirmed")
-        )
-        for use in departing:
-            goodbye_email(use)
+        if departure_emails(location):
             did_send_email = True
 
     return did_send_email
 
 
+def departure_emails(location):
+    """says goodbye to the guests departing location today. returns whether
+    any emails were sent."""
+    today = datetime.date.today()
+    departing = (
+        Use.objects.filter(location=location)
+        .filter(depart=today)
+        .filter(status="confirmed")
+    )
+    did_send_email = False
+    shared = location_context(location)
+    for use in departing:
+        goodbye_email(use, shared, idempotency_key=f"goodbye_email:{use.pk}:{today}")
+        did_send_email = True
+    return did_send_email
+
+
 def _format_attachment(use, color):
     domain = "https://" + Site.objects.get_current().domain
     if use.user.profile.image:
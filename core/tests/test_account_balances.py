@@ -0,0 +1,223 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db.models import Sum
+from django.test import TestCase
+from django.urls import reverse
+
+from bank.models import (
+    Account,
+    Currency,
+    Entry,
+    PostingException,
+    SystemAccounts,
+    Transaction,
+)
+from bank.views import create_transaction
+from core.factories import UserFactory
+from core.libs.query_budget import assert_max_queries
+
+
+class BankTestCase(TestCase):
+    def setUp(self):
+        self.currency = Currency.objects.create(name="USD", symbol="$")
+        self.system = SystemAccounts.objects.get(currency=self.currency)
+        self.alice = Account.objects.create(currency=self.currency, name="alice")
+        self.bob = Account.objects.create(currency=self.currency, name="bob")
+
+    def transfer(self, amount, from_account, to_account):
+        (transaction,) = Transaction.objects.bulk_create([Transaction(reason="test")])
+        Entry.objects.create(
+            account=from_account, amount=-amount, transaction=transaction
+        )
+        Entry.objects.create(account=to_account, amount=amount, transaction=transaction)
+        return transaction
+
+    def balance(self, account):
+        return Account.objects.get(pk=account.pk).get_balance()
+
+    def assertBalancesMatch(self):
+        for account in Account.objects.all():
+            computed = account.entries.filter(valid=True).aggregate(
+                total=Sum("amount")
+            )["total"]
+            self.assertEqual(account.balance, computed or 0, account)
+
+
+class AccountBalanceTestCase(BankTestCase):
+    def test_balances_follow_valid_entries(self):
+        self.transfer(100, self.system.debit, self.alice)
+        self.transfer(30, self.alice, self.bob)
+        self.assertEqual(self.balance(self.alice), 70)
+        self.assertEqual(self.balance(self.bob), 30)
+        self.assertEqual(self.balance(self.system.debit), -100)
+        self.assertBalancesMatch()
+
+    def test_half_a_transaction_does_not_count(self):
+        self.transfer(100, self.system.debit, self.alice)
+        (transaction,) = Transaction.objects.bulk_create([Transaction(reason="test")])
+        Entry.objects.create(account=self.alice, amount=-40, transaction=transaction)
+        self.assertEqual(self.balance(self.alice), 100)
+        Entry.objects.create(account=self.bob, amount=40, transaction=transaction)
+        self.assertEqual(self.balance(self.alice), 60)
+        self.assertBalancesMatch()
+
+    def test_editing_and_deleting_transactions(self):
+        self.transfer(100, self.system.debit, self.alice)
+        transaction = self.transfer(30, self.alice, self.bob)
+        entry = transaction.entries.get(account=self.bob)
+        entry.amount = 20
+        # transactions can't be edited, and the failed edit is rolled back
+        with self.assertRaisesMessage(Exception, "must balance out"):
+            entry.save()
+        self.assertEqual(self.balance(self.alice), 70)
+        self.assertEqual(self.balance(self.bob), 30)
+
+        transaction.delete()
+        self.assertEqual(self.balance(self.alice), 100)
+        self.assertEqual(self.balance(self.bob), 0)
+        self.assertBalancesMatch()
+
+    def test_deleting_one_entry(self):
+        (transaction,) = Transaction.objects.bulk_create([Transaction(reason="test")])
+        # the first entry is still loaded as invalid once the second is made
+        first = Entry.objects.create(
+            account=self.system.debit, amount=-10, transaction=transaction
+        )
+        Entry.objects.create(account=self.alice, amount=10, transaction=transaction)
+        self.assertEqual(self.balance(self.system.debit), -10)
+        first.delete()
+        self.assertEqual(self.balance(self.system.debit), 0)
+        self.assertBalancesMatch()
+
+    def test_overdrawing_is_refused(self):
+        self.transfer(10, self.system.debit, self.alice)
+        with self.assertRaisesMessage(Exception, "insufficient balance"):
+            self.transfer(20, self.alice, self.bob)
+
+    def test_statement_pages(self):
+        self.transfer(100, self.system.debit, self.alice)
+        for amount in range(1, 11):
+            self.transfer(amount, self.alice, self.bob)
+        pages = []
+        cursor = None
+        for _ in range(3):
+            # the entries with their balances, then their counterparties
+            with assert_max_queries(2):
+                entries, cursor = self.bob.statement(before=cursor, limit=4)
+            pages.append(entries)
+        self.assertIsNone(cursor)
+        self.assertEqual([len(page) for page in pages], [4, 4, 2])
+        entries = [entry for page in pages for entry in page]
+        # bob received 1, 2, ... 10; the newest entry comes first
+        self.assertEqual(
+            [entry.balance_at() for entry in entries],
+            [sum(range(1, n + 1)) for n in range(10, 0, -1)],
+        )
+        self.assertEqual(
+            {entry.with_account() for entry in entries},
+            {Account.objects.get(pk=self.alice.pk)},
+        )
+
+    def test_verify_and_fix_command(self):
+        self.transfer(100, self.system.debit, self.alice)
+        call_command("account_balances", "--verify", stdout=StringIO())
+
+        Account.objects.filter(pk=self.alice.pk).update(balance=5)
+        with self.assertRaisesMessage(CommandError, "1 of 4 accounts"):
+            call_command("account_balances", "--verify", stdout=StringIO())
+
+        out = StringIO()
+        call_command("account_balances", stdout=out)
+        self.assertIn("Updated 1 of 4 accounts", out.getvalue())
+        self.assertEqual(self.balance(self.alice), 100)
+
+
+class PostingTestCase(BankTestCase):
+    def test_posting_many_transfers_takes_a_few_queries(self):
+        accounts = Account.objects.bulk_create(
+            [Account(currency=self.currency, name=f"a{n}") for n in range(50)]
+        )
+        debit = self.system.debit
+        with assert_max_queries(6):
+            transactions = Transaction.objects.post(
+                [("mint", 10, debit, account) for account in accounts]
+            )
+        self.assertEqual(len(transactions), 50)
+        self.assertTrue(all(t.valid for t in Transaction.objects.all()))
+        self.assertEqual(Entry.objects.filter(valid=True).count(), 100)
+        self.assertEqual(self.balance(self.system.debit), -500)
+        self.assertEqual(debit.balance, -500)
+        self.assertBalancesMatch()
+
+    def test_later_transfers_see_earlier_ones(self):
+        Transaction.objects.post(
+            [
+                ("mint", 100, self.system.debit, self.alice),
+                ("rent", 60, self.alice, self.bob),
+                ("rent", 40, self.alice, self.bob),
+            ]
+        )
+        self.assertEqual(self.balance(self.alice), 0)
+        self.assertEqual(self.balance(self.bob), 100)
+        self.assertEqual(
+            [entry.running_balance for entry in self.bob.statement()[0]], [100, 60]
+        )
+
+    def test_a_refused_transfer_posts_nothing(self):
+        other = Currency.objects.create(name="DRFT", symbol="D")
+        stranger = Account.objects.create(currency=other, name="stranger")
+        for transfer, message in [
+            (("rent", 60, self.alice, self.bob), "insufficient balance"),
+            (("rent", 0, self.alice, self.bob), "must be positive"),
+            (("rent", 10, self.alice, self.alice), "to itself"),
+            (("rent", 10, self.alice, stranger), "same currency"),
+        ]:
+            with self.assertRaisesMessage(PostingException, message):
+                Transaction.objects.post(
+                    [("mint", 50, self.system.debit, self.alice), transfer]
+                )
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(self.balance(self.alice), 0)
+        self.assertBalancesMatch()
+
+    def test_create_transaction(self):
+        Transaction.objects.post([("mint", 50, self.system.debit, self.alice)])
+        self.assertTrue(create_transaction("rent", 20, self.alice, self.bob))
+        self.assertFalse(create_transaction("rent", 40, self.alice, self.bob))
+        self.assertEqual(self.balance(self.alice), 30)
+
+
+class StatementViewTestCase(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = UserFactory()
+        self.bob.owners.add(self.user)
+        self.client.force_login(self.user)
+        Transaction.objects.post(
+            [("mint", 100, self.system.debit, self.alice)]
+            + [("rent", n, self.alice, self.bob) for n in range(1, 6)]
+        )
+
+    def test_json_pages(self):
+        url = reverse("account_statement", args=(self.bob.id,))
+        page = self.client.get(url, {"limit": 3}).json()
+        self.assertEqual(page["balance"], 15)
+        self.assertEqual([e["amount"] for e in page["entries"]], [5, 4, 3])
+        self.assertEqual([e["balance"] for e in page["entries"]], [15, 10, 6])
+        self.assertEqual(page["entries"][0]["with_account"]["name"], "alice")
+
+        page = self.client.get(url, {"limit": 3, "before": page["next"]}).json()
+        self.assertEqual([e["amount"] for e in page["entries"]], [2, 1])
+        self.assertIsNone(page["next"])
+
+        self.assertEqual(self.client.get(url, {"before": "yesterday"}).status_code, 400)
+        url = reverse("account_statement", args=(self.alice.id,))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_html_page(self):
+        response = self.client.get(reverse("account_detail", args=(self.bob.id,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["entries"]), 5)
+        self.assertIsNone(response.context["next_cursor"])
+        self.assertContains(response, "alice")
@@ -1,8 +1,9 @@
-from datetime import date
+from datetime import date, timedelta
 
 from django.test import TestCase
 
 from core.factories import ResourceFactory
+from core.libs.request_cache import request_cache_scope
 from core.models import CapacityChange
 
 
@@ -60,3 +61,59 @@ class CapacityQuantityOnTestCase(TestCase):
         self.assertEqual(
             CapacityChange.objects.quantity_on(date(4016, 1, 17), self.resource), 1
         )
+
+
+class CapacityTimelineTestCase(TestCase):
+    def setUp(self):
+        self.resource = ResourceFactory()
+        for start_date, quantity, accept_drft in [
+            (date(4016, 1, 14), 3, True),
+            (date(4016, 1, 16), 1, True),
+            (date(4016, 1, 20), 2, False),
+        ]:
+            CapacityChange.objects.create(
+                resource=self.resource,
+                start_date=start_date,
+                quantity=quantity,
+                accept_drft=accept_drft,
+            )
+
+    def test_quantity_between_matches_each_day(self):
+        start, end = date(4016, 1, 10), date(4016, 1, 25)
+        expected = 0
+        the_day = start
+        while the_day < end:
+            expected += CapacityChange.objects.quantity_on(the_day, self.resource)
+            the_day += timedelta(1)
+        self.assertEqual(self.resource.quantity_between(start, end), expected)
+        self.assertEqual(expected, 3 * 2 + 1 * 4 + 2 * 5)
+
+    def test_quantity_between_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.resource.quantity_between(date(4016, 1, 1), date(4016, 2, 1))
+
+    def test_drftable_between(self):
+        self.assertTrue(
+            self.resource.drftable_between(date(4016, 1, 14), date(4016, 1, 19))
+        )
+        self.assertFalse(
+            self.resource.drftable_between(date(4016, 1, 13), date(4016, 1, 19))
+        )
+        self.assertFalse(
+            self.resource.drftable_between(date(4016, 1, 15), date(4016, 1, 20))
+        )
+
+    def test_timeline_is_reused_within_a_request(self):
+        with request_cache_scope(), self.assertNumQueries(1):
+            for day in range(1, 31):
+                self.resource.capacity_on(date(4016, 1, day))
+
+    def test_saving_a_capacity_change_invalidates_the_timeline(self):
+        with request_cache_scope():
+            self.assertEqual(self.resource.capacity_on(date(4016, 1, 17)), 1)
+            CapacityChange.objects.create(
+                resource=self.resource, start_date=date(4016, 1, 17), quantity=5
+            )
+            self.assertEqual(self.resource.capacity_on(date(4016, 1, 17)), 5)
+            CapacityChange.objects.filter(start_date=date(4016, 1, 17)).get().delete()
+            self.assertEqual(self.resource.capacity_on(date(4016, 1, 17)), 1)
@@ -0,0 +1,85 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.models import Booking, Location, Payment
+from gather.models import Event
+
+
+class BenchmarkTest(TestCase):
+    def setUp(self):
+        # the factories write images, and the pages make thumbnails of them
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_images_can_go_to_another_media_root(self):
+        with tempfile.TemporaryDirectory() as directory:
+            call_command(
+                "generate_benchmark_data",
+                locations=1,
+                rooms=1,
+                years=1,
+                users=1,
+                events=0,
+                media_root=directory,
+                stdout=StringIO(),
+            )
+            location = Location.objects.get(slug="bench-0")
+            self.assertTrue(
+                os.path.exists(os.path.join(directory, location.image.name))
+            )
+
+    def test_generate_and_benchmark(self):
+        call_command(
+            "generate_benchmark_data",
+            locations=1,
+            rooms=2,
+            years=1,
+            users=5,
+            events=2,
+            stdout=StringIO(),
+        )
+        location = Location.objects.get(slug="bench-0")
+        self.assertEqual(location.resources.count(), 2)
+        self.assertGreater(Booking.objects.filter(use__location=location).count(), 40)
+        self.assertTrue(Payment.objects.filter(bill__bookingbill__isnull=False))
+        self.assertEqual(Event.objects.filter(location=location).count(), 3)
+        self.assertTrue(self.client.login(username="bench0", password="password"))
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+            call_command(
+                "benchmark",
+                location="bench-0",
+                repeat=1,
+                output=output,
+                stdout=StringIO(),
+                stderr=StringIO(),
+            )
+            with open(output) as f:
+                report = json.load(f)
+        self.assertEqual(report["location"], "bench-0")
+        self.assertEqual(
+            set(report["results"]),
+            {
+                "stay",
+                "room_api",
+                "calendar",
+                "occupancy",
+                "payments",
+                "booking_list",
+                "graphql",
+                "daily_tasks",
+            },
+        )
+        for result in report["results"].values():
+            self.assertGreater(result["queries"], 0)
+            self.assertLessEqual(result["min"], result["max"])
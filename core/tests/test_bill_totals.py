@@ -0,0 +1,131 @@
+import datetime
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from core.factories import LocationFactory, ResourceFactory, UserFactory
+from core.libs.query_budget import QueryRecorder
+from core.models import Bill, BillLineItem, Booking, Fee, LocationFee, Payment, Use
+
+
+class BillTotalsTestCase(TestCase):
+    def setUp(self):
+        self.location = LocationFactory()
+        self.guest = UserFactory()
+        for description, paid_by_house in [("tax", False), ("cut", True)]:
+            fee = Fee.objects.create(
+                description=description, percentage=0.1, paid_by_house=paid_by_house
+            )
+            LocationFee.objects.create(location=self.location, fee=fee)
+        use = Use.objects.create(
+            location=self.location,
+            resource=ResourceFactory(location=self.location),
+            user=self.guest,
+            arrive=datetime.date(2020, 3, 10),
+            depart=datetime.date(2020, 3, 12),
+            status="confirmed",
+        )
+        self.booking = Booking.objects.create(use=use, rate=50)
+        self.booking.generate_bill()
+
+    def bill(self):
+        return Bill.objects.get(pk=self.booking.bill.pk)
+
+    def assertTotalsMatch(self, bill):
+        self.assertEqual(bill.cached_amount, bill.amount())
+        self.assertEqual(bill.cached_subtotal, bill.subtotal_amount())
+        self.assertEqual(bill.cached_house_fees, bill.house_fees())
+        self.assertEqual(bill.cached_non_house_fees, bill.non_house_fees())
+        self.assertEqual(bill.cached_total_paid, bill.total_paid())
+        self.assertEqual(bill.cached_total_owed, bill.total_owed())
+
+    def test_generated_bill_has_totals(self):
+        bill = self.bill()
+        self.assertEqual(bill.cached_subtotal, 100)
+        self.assertEqual(bill.cached_amount, 110)
+        self.assertTotalsMatch(bill)
+
+    def test_generating_a_bill_recomputes_the_totals_once(self):
+        with QueryRecorder() as recorder:
+            self.booking.generate_bill()
+        totals = [sql for sql, _ in recorder.queries if 'SUM("core_payment"' in sql]
+        self.assertEqual(len(totals), 1)
+        self.assertTotalsMatch(self.bill())
+
+    def test_payments_update_the_total_owed(self):
+        payment = Payment.objects.create(
+            bill=self.booking.bill, user=self.guest, paid_amount=60
+        )
+        self.assertEqual(self.bill().cached_total_owed, 50)
+
+        Payment.objects.create(bill=self.booking.bill, user=self.guest, paid_amount=50)
+        self.assertEqual(self.bill().cached_total_owed, 0)
+
+        payment.delete()
+        self.assertTotalsMatch(self.bill())
+
+    def test_moving_a_payment_updates_both_bills(self):
+        other = Bill.objects.create()
+        payment = Payment.objects.create(
+            bill=self.booking.bill, user=self.guest, paid_amount=110
+        )
+        self.assertTrue(Booking.objects.get(pk=self.booking.pk).is_paid())
+
+        payment.bill = other
+        payment.save()
+        self.assertTotalsMatch(self.bill())
+        self.assertTotalsMatch(Bill.objects.get(pk=other.pk))
+        self.assertFalse(Booking.objects.get(pk=self.booking.pk).is_paid())
+
+    def test_moving_a_line_item_updates_both_bills(self):
+        other = Bill.objects.create()
+        item = BillLineItem.objects.get(bill=self.booking.bill, fee=None)
+        item.bill = other
+        item.save()
+        self.assertTotalsMatch(self.bill())
+        self.assertEqual(Bill.objects.get(pk=other.pk).cached_amount, 100)
+
+    def test_deleting_a_fee_updates_the_totals(self):
+        Fee.objects.get(description="cut").delete()
+        bill = self.bill()
+        self.assertEqual(bill.cached_house_fees, 0)
+        self.assertTotalsMatch(bill)
+
+    def test_loaded_bill_is_refreshed(self):
+        bill = self.booking.bill
+        Payment.objects.create(bill=bill, user=self.guest, paid_amount=110)
+        self.assertEqual(bill.cached_total_owed, 0)
+        self.assertTrue(self.booking.is_paid())
+
+    def test_confirmed_but_unpaid_reads_the_cached_total(self):
+        owing = Use.objects.confirmed_but_unpaid(self.location)
+        self.assertEqual([use.booking for use in owing], [self.booking])
+        self.assertEqual(owing[0].amount_owed, self.bill().total_owed())
+
+        Payment.objects.create(bill=self.booking.bill, user=self.guest, paid_amount=60)
+        self.assertEqual(
+            Use.objects.confirmed_but_unpaid(self.location)[0].amount_owed, 50
+        )
+
+        Payment.objects.create(bill=self.booking.bill, user=self.guest, paid_amount=50)
+        self.assertFalse(Use.objects.confirmed_but_unpaid(self.location).exists())
+
+    def test_verify_and_backfill(self):
+        Bill.objects.update(cached_total_owed=0)
+        with self.assertRaises(CommandError):
+            call_command("bill_totals", verify=True, stdout=StringIO())
+        call_command("bill_totals", stdout=StringIO())
+        call_command("bill_totals", verify=True, stdout=StringIO())
+        self.assertTotalsMatch(self.bill())
+
+    def test_owing_tab_is_paginated(self):
+        admin = UserFactory(username="admin")
+        self.location.house_admins.add(admin)
+        self.client.force_login(admin)
+        response = self.client.get(
+            f"/locations/{self.location.slug}/manage/bookings/?owing_page=99"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["owing"], [self.booking])
+        self.assertEqual(response.context["owing_page"].number, 1)
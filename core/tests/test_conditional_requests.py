@@ -0,0 +1,94 @@
+import datetime
+
+from django.shortcuts import reverse
+from django.test import TestCase
+
+from core.factories import LocationFactory, ResourceFactory, UserFactory
+from core.libs.query_budget import assert_max_queries
+from core.models import AvailabilityVersion, CapacityChange, Use
+
+
+class AvailabilityConditionalGetTest(TestCase):
+    def setUp(self):
+        self.location = LocationFactory()
+        self.room = ResourceFactory(location=self.location)
+        self.capacity = CapacityChange.objects.create(
+            resource=self.room,
+            start_date=datetime.date.today() - datetime.timedelta(days=10),
+            quantity=2,
+        )
+        self.urls = [
+            reverse("json_room_list", args=(self.location.slug,)),
+            reverse("json_room_detail", args=(self.location.slug, self.room.id)),
+            f"/api/capacity/{self.capacity.id}",
+        ]
+
+    def version(self):
+        return AvailabilityVersion.objects.get(location=self.location).version
+
+    def get(self, url, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def test_unchanged_availability_is_not_recomputed(self):
+        for url in self.urls:
+            response = self.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("Last-Modified", response)
+            with assert_max_queries(1):
+                response = self.get(url, response["ETag"])
+            self.assertEqual(response.status_code, 304, url)
+
+    def test_changes_move_the_version_on(self):
+        etag = self.get(self.urls[0])["ETag"]
+        version = self.version()
+
+        CapacityChange.objects.create(
+            resource=self.room,
+            start_date=datetime.date.today() + datetime.timedelta(days=5),
+            quantity=1,
+        )
+        self.assertEqual(self.version(), version + 1)
+        response = self.get(self.urls[0], etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        use = Use.objects.create(
+            location=self.location,
+            resource=self.room,
+            user=UserFactory(),
+            arrive=datetime.date.today() + datetime.timedelta(days=1),
+            depart=datetime.date.today() + datetime.timedelta(days=3),
+            status="pending",
+        )
+        # a pending use takes no beds
+        self.assertEqual(self.get(self.urls[0], etag).status_code, 304)
+        use.status = "confirmed"
+        use.save()
+        self.assertEqual(self.get(self.urls[0], etag).status_code, 200)
+
+    def test_bulk_capacity_changes_move_the_version_on(self):
+        etag = self.get(self.urls[0])["ETag"]
+        version = self.version()
+        CapacityChange.objects.set_many(
+            [
+                (
+                    self.room.id,
+                    datetime.date.today() + datetime.timedelta(days=5),
+                    1,
+                    False,
+                )
+            ]
+        )
+        self.assertEqual(self.version(), version + 1)
+        self.assertEqual(self.get(self.urls[0], etag).status_code, 200)
+
+    def test_other_locations_are_not_affected(self):
+        other = LocationFactory(slug="other")
+        etag = self.get(self.urls[0])["ETag"]
+        ResourceFactory(location=other)
+        self.assertEqual(self.get(self.urls[0], etag).status_code, 304)
+
+    def test_unknown_rooms_are_still_not_found(self):
+        url = reverse("json_room_detail", args=(self.location.slug, "nope"))
+        self.assertEqual(self.get(url).status_code, 404)
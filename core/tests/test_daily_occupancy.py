@@ -0,0 +1,78 @@
+from datetime import date
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.factories import ResourceFactory, UserFactory
+from core.models import DailyOccupancy, Use
+
+
+class DailyOccupancyTestCase(TestCase):
+    def setUp(self):
+        self.resource = ResourceFactory()
+        self.booker = UserFactory()
+
+    def use_on(self, arrive, depart, status="confirmed", resource=None):
+        return Use.objects.create(
+            location=self.resource.location,
+            resource=resource or self.resource,
+            arrive=arrive,
+            depart=depart,
+            status=status,
+            user=self.booker,
+        )
+
+    def occupancy(self, resource=None):
+        return dict(
+            DailyOccupancy.objects.filter(resource=resource or self.resource)
+            .order_by("day")
+            .values_list("day", "quantity")
+        )
+
+    def test_confirmed_uses_are_counted_per_night(self):
+        self.use_on(date(2016, 1, 10), date(2016, 1, 12))
+        self.use_on(date(2016, 1, 11), date(2016, 1, 13))
+        self.use_on(date(2016, 1, 10), date(2016, 1, 20), status="pending")
+        self.assertEqual(
+            self.occupancy(),
+            {date(2016, 1, 10): 1, date(2016, 1, 11): 2, date(2016, 1, 12): 1},
+        )
+
+    def test_status_changes_update_the_table(self):
+        use = self.use_on(date(2016, 1, 10), date(2016, 1, 12), status="pending")
+        self.assertEqual(self.occupancy(), {})
+        use.status = "approved"
+        use.save()
+        self.assertEqual(self.occupancy(), {date(2016, 1, 10): 1, date(2016, 1, 11): 1})
+        use.status = "canceled"
+        use.save()
+        self.assertEqual(self.occupancy(), {})
+
+    def test_date_and_resource_changes_update_the_table(self):
+        use = self.use_on(date(2016, 1, 10), date(2016, 1, 12))
+        use.depart = date(2016, 1, 11)
+        use.save()
+        self.assertEqual(self.occupancy(), {date(2016, 1, 10): 1})
+
+        other = ResourceFactory(location=self.resource.location)
+        use.resource = other
+        use.save()
+        self.assertEqual(self.occupancy(), {})
+        self.assertEqual(self.occupancy(other), {date(2016, 1, 10): 1})
+
+    def test_deleting_a_use_frees_its_nights(self):
+        use = self.use_on(date(2016, 1, 10), date(2016, 1, 12))
+        use.delete()
+        self.assertEqual(self.occupancy(), {})
+
+    def test_rebuild_matches_incremental_updates(self):
+        self.use_on(date(2016, 1, 10), date(2016, 1, 12))
+        use = self.use_on(date(2016, 1, 11), date(2016, 1, 15))
+        use.arrive = date(2016, 1, 9)
+        use.save()
+        expected = self.occupancy()
+
+        DailyOccupancy.objects.all().delete()
+        call_command("rebuild_occupancy", stdout=StringIO())
+        self.assertEqual(self.occupancy(), expected)
@@ -0,0 +1,51 @@
+from datetime import date
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+
+from core.libs.dates import (
+    count_range_objects_on_day,
+    daily_range_counts,
+    dates_within,
+    group_range_objects_by_day,
+)
+
+
+def stay(arrive, depart):
+    return SimpleNamespace(arrive=arrive, depart=depart)
+
+
+class DailyRangeCountsTestCase(SimpleTestCase):
+    def setUp(self):
+        self.start = date(2016, 1, 10)
+        self.end = date(2016, 1, 14)
+        self.stays = [
+            stay(date(2016, 1, 1), date(2016, 1, 11)),
+            stay(date(2016, 1, 10), date(2016, 1, 10)),
+            stay(date(2016, 1, 12), date(2016, 1, 13)),
+            stay(date(2016, 1, 12), date(2016, 2, 1)),
+            stay(date(2016, 1, 15), date(2016, 1, 20)),
+        ]
+
+    def test_it_matches_counting_each_day(self):
+        expected = [
+            count_range_objects_on_day(self.stays, day)
+            for day in dates_within(self.start, self.end)
+        ]
+        self.assertEqual(daily_range_counts(self.stays, self.start, self.end), expected)
+        self.assertEqual(expected, [1, 0, 2, 1, 1])
+
+    def test_it_returns_nothing_for_an_empty_window(self):
+        self.assertEqual(daily_range_counts(self.stays, self.end, self.start), [])
+
+    def test_group_by_day_keeps_objects_in_order(self):
+        grouped = group_range_objects_by_day(self.stays, self.start, self.end)
+        self.assertEqual(
+            grouped,
+            {
+                date(2016, 1, 10): [self.stays[0]],
+                date(2016, 1, 12): [self.stays[2], self.stays[3]],
+                date(2016, 1, 13): [self.stays[3]],
+                date(2016, 1, 14): [self.stays[3]],
+            },
+        )
@@ -7,6 +7,7 @@ from freezegun import freeze_time
 
 from core.emails.messages import (
     admin_daily_update,
+    guest_welcome,
     new_booking_notify,
     send_booking_receipt,
     updated_booking_notify,
@@ -15,6 +16,7 @@ from core.factories import ResourceFactory
 from core.models import (
     Booking,
     LocationEmailTemplate,
+    OutboundEmail,
     Payment,
     Use,
     UserProfile,
@@ -104,7 +106,7 @@ class EmailsTestCase(TestCase):
     # emails triggered by actions
     def test_new_booking_notify(self):
         resp = new_booking_notify(self.booking)
-        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.status_code, 202)
 
     def test_send_booking_receipt(self):
         pmt = Payment.objects.create(
@@ -116,11 +118,11 @@ class EmailsTestCase(TestCase):
         )
         pmt.save()
         resp = send_booking_receipt(self.booking)
-        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.status_code, 202)
 
     def test_updated_booking_notify(self):
         resp = updated_booking_notify(self.booking)
-        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.status_code, 202)
 
     # automated emails (called from tasks.py)
     def test_departure_email(self):
@@ -131,6 +133,16 @@ class EmailsTestCase(TestCase):
         # test the task, which calls guest_welcome() in emails.py
         self.assertTrue(send_guest_welcome())
 
+    def test_guest_welcome_is_only_queued_once_by_the_task(self):
+        self.assertTrue(send_guest_welcome())
+        self.assertTrue(send_guest_welcome())
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
+    def test_guest_welcome_can_be_resent(self):
+        guest_welcome(self.booking.use)
+        guest_welcome(self.booking.use)
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
     def test_guest_welcome_with_location_email_override(self):
         LocationEmailTemplate.objects.create(
             location=self.resource.location,
@@ -144,10 +156,22 @@ class EmailsTestCase(TestCase):
         # called here directly instead as the task, because we can get the
         # return value and check that all was copacetic
         resp = guests_residents_daily_update(self.resource.location)
-        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.status_code, 202)
 
     def test_admin_daily_update(self):
         # called here directly instead as the task, because we can get the
         # return value and check that all was copacetic
         resp = admin_daily_update(self.resource.location)
-        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.status_code, 202)
+
+    def test_admin_daily_update_lists_bookings_owing(self):
+        self.arriving_today.generate_bill()
+        admin_daily_update(self.resource.location)
+        text = OutboundEmail.objects.get().data["text"]
+        self.assertIn("Confirmed bookings with money still owing (1)", text)
+        self.assertIn(f"owes {self.arriving_today.bill.total_owed()}", text)
+
+    def test_daily_update_is_only_queued_once(self):
+        admin_daily_update(self.resource.location)
+        admin_daily_update(self.resource.location)
+        self.assertEqual(OutboundEmail.objects.count(), 1)
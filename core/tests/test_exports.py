@@ -0,0 +1,91 @@
+import csv
+import datetime
+import json
+
+from django.shortcuts import reverse
+from django.test import TestCase
+
+from bank.models import Account, Currency, Entry, SystemAccounts, Transaction
+from core.factories import LocationFactory, ResourceFactory, UserFactory
+from core.models import Booking, HouseAccount, Payment, Use
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        self.admin = UserFactory(username="admin")
+        self.location = LocationFactory()
+        self.location.house_admins.add(self.admin)
+        self.room = ResourceFactory(location=self.location)
+        self.client.force_login(self.admin)
+
+    def book(self, n, arrive):
+        guest = UserFactory(username=f"guest{n}")
+        use = Use.objects.create(
+            location=self.location,
+            resource=self.room,
+            user=guest,
+            arrive=arrive,
+            depart=arrive + datetime.timedelta(days=2),
+            status="confirmed",
+        )
+        booking = Booking.objects.create(use=use, rate=50)
+        booking.generate_bill()
+        Payment.objects.create(bill=booking.bill, user=guest, paid_amount=100)
+        return booking
+
+    def export(self, name, **params):
+        response = self.client.get(
+            reverse("location_export", args=(self.location.slug, name)), params
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_bookings_csv_only_has_bookings_in_range(self):
+        inside = self.book(1, datetime.date(2020, 3, 10))
+        self.book(2, datetime.date(2020, 5, 10))
+        rows = list(
+            csv.reader(
+                self.export(
+                    "bookings", start="2020-03-01", end="2020-03-31"
+                ).splitlines()
+            )
+        )
+        self.assertEqual(rows[0][:3], ["id", "created", "status"])
+        self.assertEqual([row[0] for row in rows[1:]], [str(inside.id)])
+
+    def test_payments_ndjson(self):
+        booking = self.book(1, datetime.date(2020, 3, 10))
+        today = datetime.date.today().isoformat()
+        lines = self.export(
+            "payments", start=today, end=today, format="ndjson"
+        ).splitlines()
+        self.assertEqual(len(lines), 1)
+        payment = json.loads(lines[0])
+        self.assertEqual(payment["booking"], booking.id)
+        self.assertEqual(payment["paid_amount"], "100.00")
+        self.assertEqual(payment["to_house"], "100.00")
+        self.assertEqual(payment["house_fees"], "0.00")
+
+    def test_entries_of_house_accounts(self):
+        currency = Currency.objects.create(name="USD", symbol="$")
+        house = Account.objects.create(currency=currency, name="house")
+        HouseAccount.objects.create(location=self.location, account=house)
+        (transaction,) = Transaction.objects.bulk_create([Transaction(reason="rent")])
+        Entry.objects.create(
+            account=SystemAccounts.objects.get(currency=currency).debit,
+            amount=-10,
+            transaction=transaction,
+        )
+        entry = Entry.objects.create(account=house, amount=10, transaction=transaction)
+        today = datetime.date.today().isoformat()
+        lines = self.export(
+            "entries", start=today, end=today, format="ndjson"
+        ).splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in lines], [entry.id])
+
+    def test_unknown_export(self):
+        response = self.client.get(
+            reverse("location_export", args=(self.location.slug, "nothing"))
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,62 @@
+from datetime import date
+
+from django.test import TestCase
+
+from core.factories import LocationFactory, ResourceFactory, UserFactory
+from core.models import CapacityChange, Use
+
+
+class LocationRoomsFreeTestCase(TestCase):
+    def setUp(self):
+        self.location = LocationFactory()
+        self.booker = UserFactory()
+        self.single = self.room_with(1)
+        self.double = self.room_with(2)
+        self.closed = self.room_with(0)
+
+    def room_with(self, quantity):
+        room = ResourceFactory(location=self.location)
+        CapacityChange.objects.create(
+            resource=room, start_date=date(2016, 1, 1), quantity=quantity
+        )
+        return room
+
+    def use_on(self, room, arrive, depart):
+        return Use.objects.create(
+            location=self.location,
+            resource=room,
+            arrive=arrive,
+            depart=depart,
+            status="confirmed",
+            user=self.booker,
+        )
+
+    def test_rooms_free_excludes_rooms_full_on_any_night(self):
+        self.use_on(self.single, date(2016, 2, 3), date(2016, 2, 4))
+        self.use_on(self.double, date(2016, 2, 1), date(2016, 2, 10))
+
+        free = self.location.rooms_free(date(2016, 2, 1), date(2016, 2, 5))
+        self.assertEqual(free, [self.double])
+        for room in [self.single, self.double, self.closed]:
+            self.assertEqual(
+                room in free,
+                room.available_between(date(2016, 2, 1), date(2016, 2, 4)),
+            )
+
+    def test_rooms_free_ignores_the_departure_night(self):
+        self.use_on(self.single, date(2016, 2, 5), date(2016, 2, 6))
+        free = self.location.rooms_free(date(2016, 2, 1), date(2016, 2, 5))
+        self.assertIn(self.single, free)
+
+    def test_rooms_free_query_count_does_not_grow_with_nights(self):
+        with self.assertNumQueries(3):
+            self.location.rooms_free(date(2016, 2, 1), date(2016, 4, 1))
+
+    def test_full_days(self):
+        self.use_on(self.single, date(2016, 2, 2), date(2016, 2, 4))
+        self.use_on(self.double, date(2016, 2, 3), date(2016, 2, 5))
+        self.use_on(self.double, date(2016, 2, 3), date(2016, 2, 4))
+        self.assertEqual(
+            self.location.full_days(date(2016, 2, 1), date(2016, 2, 5)),
+            {date(2016, 2, 3)},
+        )
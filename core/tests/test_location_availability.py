@@ -0,0 +1,70 @@
+from datetime import date
+
+from django.test import TestCase
+
+from core.data_fetchers import LocationAvailability
+from core.factories import LocationFactory, ResourceFactory, UserFactory
+from core.models import CapacityChange, Use
+
+
+class LocationAvailabilityTestCase(TestCase):
+    def setUp(self):
+        self.location = LocationFactory()
+        self.booker = UserFactory()
+        self.start = date(2016, 1, 10)
+        self.end = date(2016, 1, 14)
+
+    def resource_with(self, capacities, uses):
+        resource = ResourceFactory(location=self.location)
+        for start_date, quantity in capacities:
+            CapacityChange.objects.create(
+                resource=resource, start_date=start_date, quantity=quantity
+            )
+        for arrive, depart in uses:
+            Use.objects.create(
+                resource=resource,
+                arrive=arrive,
+                depart=depart,
+                status="confirmed",
+                user=self.booker,
+            )
+        return resource
+
+    def test_matrix_matches_each_resource(self):
+        first = self.resource_with(
+            [(date(2015, 1, 1), 2), (date(2016, 1, 12), 3)],
+            [
+                (date(2016, 1, 9), date(2016, 1, 11)),
+                (date(2016, 1, 13), date(2016, 1, 20)),
+            ],
+        )
+        second = self.resource_with([(date(2016, 1, 11), 1)], [])
+        availability = LocationAvailability(self.location, self.start, self.end)
+        self.assertEqual(
+            availability.daily_availabilities(first),
+            [
+                (date(2016, 1, 10), 1),
+                (date(2016, 1, 11), 2),
+                (date(2016, 1, 12), 3),
+                (date(2016, 1, 13), 2),
+                (date(2016, 1, 14), 2),
+            ],
+        )
+        self.assertEqual(
+            availability.daily_availabilities(second),
+            [
+                (date(2016, 1, 10), 0),
+                (date(2016, 1, 11), 1),
+                (date(2016, 1, 12), 1),
+                (date(2016, 1, 13), 1),
+                (date(2016, 1, 14), 1),
+            ],
+        )
+
+    def test_query_count_does_not_grow_with_resources(self):
+        for _ in range(5):
+            self.resource_with(
+                [(date(2016, 1, 1), 2)], [(date(2016, 1, 11), date(2016, 1, 13))]
+            )
+        with self.assertNumQueries(3):
+            LocationAvailability(self.location, self.start, self.end).as_matrix()
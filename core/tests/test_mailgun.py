@@ -0,0 +1,163 @@
+import json
+import socket
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs
+
+from django.core.mail import EmailMessage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.emails.mailgun import mailgun_send, mailgun_send_batch, mailgun_session
+from core.factories import LocationFactory, UserFactory
+from core.factory_apps.events import EventAdminGroupFactory, EventFactory
+from gather.models import Event
+from gather.tasks import weekly_upcoming_events
+from modernomad.backends import MailgunBackend
+
+
+class StubMailgunHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append(
+            {
+                "path": self.path,
+                "client": self.client_address,
+                "content_type": self.headers["Content-Type"],
+                "body": body,
+            }
+        )
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MailgunTestCase(TestCase):
+    """Runs a local HTTP server that stands in for the mailgun API."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubMailgunHandler)
+        cls.server.requests = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.settings_override = override_settings(
+            MAILGUN_API_URL=f"http://127.0.0.1:{cls.server.server_port}/v2",
+            MAILGUN_API_KEY="key-test",
+            MAILGUN_CAUTION_SEND_REAL_MAIL=False,
+            LIST_DOMAIN="lists.example.com",
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.requests.clear()
+
+    def form(self, request):
+        return parse_qs(request["body"].decode())
+
+    def connections(self):
+        return {request["client"] for request in self.server.requests}
+
+
+class MailgunSendTest(MailgunTestCase):
+    def message(self, n):
+        return {
+            "from": "stay@example.com",
+            "to": f"guest{n}@example.com",
+            "subject": "hi",
+        }
+
+    def test_session_reuses_one_connection(self):
+        with mailgun_session():
+            for n in range(3):
+                self.assertEqual(mailgun_send(self.message(n)).status_code, 200)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(self.connections()), 1)
+        self.assertEqual(
+            self.server.requests[0]["path"], "/v2/lists.example.com/messages"
+        )
+        self.assertEqual(self.form(self.server.requests[0])["o:testmode"], ["yes"])
+
+    def test_connection_errors_are_a_failed_response(self):
+        # a port that nothing listens on
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        with override_settings(MAILGUN_API_URL=f"http://127.0.0.1:{port}/v2"):
+            response = mailgun_send(self.message(0))
+        self.assertEqual(response.status_code, 500)
+        self.assertIn(b"ConnectError", response.content)
+
+    def test_batch_sends_recipient_variables(self):
+        recipients = {
+            f"guest{n}@example.com": {"first_name": f"Guest {n}"} for n in range(5)
+        }
+        with mock.patch("core.emails.mailgun.BATCH_SIZE", 2):
+            responses = mailgun_send_batch(
+                {"from": "stay@example.com", "subject": "hi %recipient.first_name%"},
+                recipients,
+            )
+        self.assertEqual([response.status_code for response in responses], [200] * 3)
+        self.assertEqual(len(self.connections()), 1)
+        first = self.form(self.server.requests[0])
+        self.assertEqual(first["to"], ["guest0@example.com", "guest1@example.com"])
+        self.assertEqual(
+            json.loads(first["recipient-variables"][0]),
+            {address: recipients[address] for address in first["to"]},
+        )
+
+    def test_backend_sends_messages_over_one_connection(self):
+        messages = [
+            EmailMessage("hi", "body", "stay@example.com", [f"guest{n}@example.com"])
+            for n in range(3)
+        ]
+        self.assertEqual(MailgunBackend().send_messages(messages), 3)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(self.connections()), 1)
+        self.assertEqual(
+            self.server.requests[0]["path"], "/v2/lists.example.com/messages.mime"
+        )
+
+
+class WeeklyUpcomingEventsTest(MailgunTestCase):
+    def test_one_call_per_location(self):
+        location = LocationFactory()
+        event = EventFactory(
+            slug="next-week",
+            location=location,
+            admin=EventAdminGroupFactory(location=location),
+            start=timezone.now() + timedelta(days=2),
+            end=timezone.now() + timedelta(days=2, hours=2),
+        )
+        # new events are always put up for review first
+        Event.objects.filter(pk=event.pk).update(status=Event.LIVE)
+        for n in range(3):
+            user = UserFactory(username=f"weekly{n}", email=f"weekly{n}@example.com")
+            user.event_notifications.location_weekly.add(location)
+
+        weekly_upcoming_events()
+
+        self.assertEqual(len(self.server.requests), 1)
+        form = self.form(self.server.requests[0])
+        self.assertEqual(len(form["to"]), 3)
+        self.assertIn("%recipient.profile_url%", form["text"][0])
+        variables = json.loads(form["recipient-variables"][0])
+        self.assertEqual(
+            variables["weekly0@example.com"]["profile_url"], "/people/weekly0/"
+        )
@@ -0,0 +1,140 @@
+import csv
+import datetime
+from decimal import Decimal
+
+from django.db import connection
+from django.shortcuts import reverse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.factories import LocationFactory, ResourceFactory, UserFactory
+from core.models import (
+    Booking,
+    CapacityChange,
+    Fee,
+    LocationFee,
+    Payment,
+    Use,
+    allocate_payment_fees,
+)
+
+
+class OccupancyTestCase(TestCase):
+    def setUp(self):
+        self.admin = UserFactory(username="admin")
+        self.location = LocationFactory()
+        self.location.house_admins.add(self.admin)
+        self.room = ResourceFactory(location=self.location)
+        CapacityChange.objects.create(
+            resource=self.room, start_date=datetime.date(2000, 1, 1), quantity=10
+        )
+        for description, paid_by_house in [("tax", False), ("cut", True)]:
+            fee = Fee.objects.create(
+                description=description, percentage=0.1, paid_by_house=paid_by_house
+            )
+            LocationFee.objects.create(location=self.location, fee=fee)
+        self.today = datetime.date.today()
+        self.url = reverse("location_occupancy", args=(self.location.slug,))
+        self.client.force_login(self.admin)
+
+    def book(self, n):
+        guest = UserFactory(username=f"guest{n}")
+        use = Use.objects.create(
+            location=self.location,
+            resource=self.room,
+            user=guest,
+            arrive=self.today.replace(day=1),
+            depart=self.today.replace(day=1) + datetime.timedelta(days=3),
+            status="confirmed",
+        )
+        booking = Booking.objects.create(use=use, rate=50)
+        booking.generate_bill()
+        Payment.objects.create(
+            bill=booking.bill, user=guest, paid_amount=booking.bill.amount() / 2
+        )
+
+
+class OccupancyReportTest(OccupancyTestCase):
+    def report_queries(self):
+        params = {"month": self.today.month, "year": self.today.year}
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_query_count_does_not_grow_with_bookings(self):
+        self.book(1)
+        few = self.report_queries()
+        for n in range(2, 8):
+            self.book(n)
+        self.assertEqual(self.report_queries(), few)
+
+
+class PaymentReportTest(OccupancyTestCase):
+    def report(self):
+        url = reverse(
+            "location_payments",
+            args=(self.location.slug, self.today.year, self.today.month),
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(context)
+
+    def test_fee_split_matches_each_payment(self):
+        self.book(1)
+        self.book(2)
+        payments = allocate_payment_fees(Payment.objects.all())
+        for payment in payments:
+            fresh = Payment.objects.get(pk=payment.pk)
+            self.assertEqual(payment.house_fees(), fresh.house_fees())
+            self.assertEqual(payment.non_house_fees(), fresh.non_house_fees())
+            self.assertEqual(payment.to_house(), fresh.to_house())
+        # half of a 150 bill with 10% of tax on top: 75 of subtotal
+        self.assertEqual(round(payments[0].non_house_fees(), 2), Decimal("7.50"))
+        self.assertEqual(round(payments[0].house_fees(), 2), Decimal("7.50"))
+
+    def test_query_count_does_not_grow_with_payments(self):
+        self.book(1)
+        response, few = self.report()
+        self.assertIn("Server-Timing", response)
+        for n in range(2, 8):
+            self.book(n)
+        response, many = self.report()
+        self.assertEqual(many, few)
+        self.assertEqual(response.context["booking_totals"]["count"], 7)
+
+
+class RoomOccupancyExportTest(OccupancyTestCase):
+    def export(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+            self.assertTrue(response.streaming)
+            content = b"".join(response.streaming_content).decode()
+        return list(csv.reader(content.splitlines())), len(context)
+
+    def test_room_export_has_a_row_per_month(self):
+        self.book(1)
+        self.book(2)
+        rows, _ = self.export(
+            reverse(
+                "room_occupancy",
+                args=(self.location.slug, self.room.id, self.today.year),
+            )
+        )
+        self.assertEqual(len(rows), 2 + 12)
+        this_month = rows[1 + self.today.month]
+        self.assertEqual(this_month[0], str(self.today.month))
+        self.assertEqual(this_month[4], "6")
+
+    def test_location_export_query_count_does_not_grow_with_bookings(self):
+        url = reverse(
+            "location_room_occupancy", args=(self.location.slug, self.today.year)
+        )
+        self.book(1)
+        rows, few = self.export(url)
+        self.assertEqual(len(rows), 1 + 12)
+        self.assertEqual(rows[self.today.month][0], self.room.name)
+        for n in range(2, 8):
+            self.book(n)
+        self.assertEqual(self.export(url)[1], few)
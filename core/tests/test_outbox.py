@@ -0,0 +1,120 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import httpx
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.emails.mailgun import mailgun_queue
+from core.models import OutboundEmail
+
+
+def message(sender="stay@example.com"):
+    return {
+        "from": f"Some Location <{sender}>",
+        "to": ["guest@example.org"],
+        "subject": "Welcome",
+        "text": "hi",
+    }
+
+
+class OutboundEmailTest(TestCase):
+    def test_queue_records_sending_domain(self):
+        resp = mailgun_queue(message("stay@Example.com"))
+        self.assertEqual(resp.status_code, 202)
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.domain, "example.com")
+        self.assertEqual(email.status, OutboundEmail.PENDING)
+
+    def test_queue_is_idempotent(self):
+        first = OutboundEmail.objects.queue(message(), idempotency_key="welcome:1")
+        second = OutboundEmail.objects.queue(message(), idempotency_key="welcome:1")
+        self.assertEqual(first.pk, second.pk)
+        OutboundEmail.objects.queue(message(), idempotency_key="welcome:2")
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    def test_claim_skips_messages_not_due(self):
+        due = OutboundEmail.objects.queue(message())
+        later = OutboundEmail.objects.queue(message())
+        later.next_attempt = timezone.now() + timedelta(minutes=5)
+        later.save()
+        self.assertEqual(OutboundEmail.objects.claim(10), [due])
+        # claimed messages are leased, so they aren't handed out twice
+        self.assertEqual(OutboundEmail.objects.claim(10), [])
+
+    @mock.patch(
+        "core.emails.mailgun.mailgun_send", return_value=HttpResponse(status=503)
+    )
+    def test_server_errors_back_off(self, mailgun_send):
+        email = OutboundEmail.objects.queue(message())
+        before = timezone.now()
+        self.assertFalse(email.send())
+        self.assertFalse(email.send())
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.PENDING)
+        self.assertEqual(email.attempts, 2)
+        self.assertGreaterEqual(email.next_attempt, before + timedelta(minutes=2))
+
+    @override_settings(MAILGUN_API_KEY="key-test", MAILGUN_CAUTION_SEND_REAL_MAIL=False)
+    @mock.patch("core.emails.mailgun._post", side_effect=httpx.ConnectError("refused"))
+    def test_connection_errors_are_retried(self, post):
+        email = OutboundEmail.objects.queue(message())
+        self.assertFalse(email.send())
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertIn("ConnectError: refused", email.last_error)
+        self.assertGreater(email.next_attempt, timezone.now())
+
+    @mock.patch(
+        "core.emails.mailgun.mailgun_send", return_value=HttpResponse(status=503)
+    )
+    def test_gives_up_after_max_attempts(self, mailgun_send):
+        email = OutboundEmail.objects.queue(message())
+        email.attempts = OutboundEmail.MAX_ATTEMPTS - 1
+        email.send()
+        self.assertEqual(email.status, OutboundEmail.FAILED)
+
+    @mock.patch(
+        "core.emails.mailgun.mailgun_send", return_value=HttpResponse(status=400)
+    )
+    def test_client_errors_are_not_retried(self, mailgun_send):
+        email = OutboundEmail.objects.queue(message())
+        email.send()
+        self.assertEqual(email.status, OutboundEmail.FAILED)
+        self.assertEqual(email.attempts, 1)
+
+
+@mock.patch("core.emails.mailgun.mailgun_send", return_value=HttpResponse())
+class SendQueuedEmailTest(TestCase):
+    def send_queued_email(self, *args):
+        out = StringIO()
+        call_command("send_queued_email", *args, stdout=out)
+        return out.getvalue()
+
+    def test_sends_pending_messages(self, mailgun_send):
+        for _ in range(3):
+            OutboundEmail.objects.queue(message())
+        out = self.send_queued_email("--batch-size", "2")
+        self.assertIn("Sent 3", out)
+        self.assertEqual(mailgun_send.call_count, 3)
+        self.assertEqual(
+            OutboundEmail.objects.filter(status=OutboundEmail.SENT).count(), 3
+        )
+
+    def test_rate_limits_each_sending_domain(self, mailgun_send):
+        for _ in range(3):
+            OutboundEmail.objects.queue(message("stay@busy.example.com"))
+        OutboundEmail.objects.queue(message("stay@quiet.example.com"))
+        out = self.send_queued_email("--rate", "2")
+        self.assertIn("Sent 3", out)
+        self.assertIn("1 deferred", out)
+        self.assertEqual(
+            OutboundEmail.objects.sent_per_domain(timezone.now() - timedelta(hours=1)),
+            {"busy.example.com": 2, "quiet.example.com": 1},
+        )
+        deferred = OutboundEmail.objects.get(status=OutboundEmail.PENDING)
+        self.assertGreater(deferred.next_attempt, timezone.now())
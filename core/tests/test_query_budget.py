@@ -0,0 +1,150 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+
+from core.factories import LocationFactory, ResourceFactory, UserFactory
+from core.libs.query_budget import (
+    UNRESOLVED,
+    EndpointStats,
+    QueryRecorder,
+    assert_max_queries,
+    normalize_sql,
+    worst_endpoints,
+)
+from core.models import Booking, CapacityChange, Use, UserProfile
+
+
+class QueryRecorderTest(TestCase):
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id = 12 AND name = 'o''brien'"),
+            "SELECT * FROM t WHERE id = ? AND name = ?",
+        )
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t2 WHERE id IN (%s, %s,\n %s)"),
+            normalize_sql("SELECT * FROM t2 WHERE id IN (%s)"),
+        )
+
+    def test_spots_repeated_queries(self):
+        users = [UserFactory(username=f"user{n}") for n in range(3)]
+        with QueryRecorder() as recorder:
+            for user in users:
+                User.objects.get(pk=user.pk)
+            User.objects.count()
+        self.assertEqual(recorder.count, 4)
+        [(shape, count)] = recorder.repeated(3)
+        self.assertEqual(count, 3)
+        self.assertIn('WHERE "auth_user"."id" = ?', shape)
+
+    def test_assert_max_queries(self):
+        with assert_max_queries(1):
+            User.objects.count()
+        with (
+            self.assertRaisesMessage(AssertionError, "at most 1 queries, got 2"),
+            assert_max_queries(1),
+        ):
+            User.objects.count()
+            User.objects.count()
+        with (
+            self.assertRaisesMessage(AssertionError, "2x SELECT COUNT(*)"),
+            assert_max_queries(10, repeat_threshold=2),
+        ):
+            User.objects.count()
+            User.objects.count()
+
+    def test_endpoint_stats_are_capped(self):
+        stats = EndpointStats(max_endpoints=2)
+        for endpoint, count in [("a", 3), ("b", 1), ("c", 2), ("d", 1)]:
+            recorder = QueryRecorder()
+            recorder.queries = [("SELECT 1", 0)] * count
+            stats.record(endpoint, recorder)
+        self.assertEqual([stat["endpoint"] for stat in stats.worst()], ["a", "c"])
+
+
+class ViewQueryBudgetTest(TestCase):
+    """Pins the number of queries of the busiest views, however many
+    bookings there are."""
+
+    def setUp(self):
+        self.admin = UserFactory(username="admin")
+        UserProfile.objects.create(user=self.admin)
+        self.location = LocationFactory()
+        self.location.house_admins.add(self.admin)
+        self.client.force_login(self.admin)
+        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+        for n in range(6):
+            room = ResourceFactory(location=self.location, name=f"room {n}")
+            CapacityChange.objects.create(
+                resource=room, start_date=datetime.date(2000, 1, 1), quantity=4
+            )
+            use = Use.objects.create(
+                location=self.location,
+                resource=room,
+                user=UserFactory(username=f"guest{n}"),
+                arrive=tomorrow,
+                depart=tomorrow + datetime.timedelta(days=3),
+                status="confirmed",
+            )
+            Booking.objects.create(use=use, rate=50).generate_bill()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_booking_manage_list(self):
+        with assert_max_queries(32):
+            self.get(reverse("booking_manage_list", args=(self.location.slug,)))
+
+    def test_occupancy(self):
+        with assert_max_queries(25):
+            self.get(reverse("location_occupancy", args=(self.location.slug,)))
+
+    def test_stay(self):
+        self.client.logout()
+        with assert_max_queries(17):
+            self.get(reverse("location_stay", args=(self.location.slug,)))
+
+    @override_settings(QUERY_BUDGET=5, QUERY_SERVER_TIMING=True)
+    def test_middleware_reports_queries(self):
+        worst_endpoints.clear()
+        self.client.logout()
+        url = reverse("location_stay", args=(self.location.slug,))
+        with self.assertLogs("core.middleware", "WARNING") as logs:
+            response = self.get(url)
+        self.assertIn("location_stay", logs.output[0])
+        self.assertRegex(response["Server-Timing"], r'db;dur=[\d.]+;desc="\d+ queries"')
+        [worst] = worst_endpoints.worst()
+        self.assertEqual(worst["endpoint"], "location_stay")
+        self.assertGreater(worst["queries"], 5)
+
+    def test_middleware_groups_unresolved_requests(self):
+        worst_endpoints.clear()
+        for n in range(3):
+            self.client.get(f"/no-such-page-{n}/")
+        self.assertEqual(
+            [stat["endpoint"] for stat in worst_endpoints.worst()], [UNRESOLVED]
+        )
+
+    @override_settings(QUERY_SERVER_TIMING=False)
+    def test_only_staff_see_query_timings(self):
+        url = reverse("location_detail", args=(self.location.slug,))
+        self.client.logout()
+        self.assertNotIn("Server-Timing", self.client.get(url))
+        self.admin.is_staff = True
+        self.admin.save()
+        self.client.force_login(self.admin)
+        self.assertIn("Server-Timing", self.client.get(url))
+
+    @override_settings(QUERY_REPORT_EVERY=2)
+    def test_middleware_logs_the_worst_endpoints(self):
+        worst_endpoints.clear()
+        self.client.logout()
+        url = reverse("location_stay", args=(self.location.slug,))
+        self.get(url)
+        with self.assertLogs("core.middleware", "INFO") as logs:
+            self.get(url)
+        self.assertIn("worst endpoints after 2 requests", logs.output[-1])
+        self.assertIn("location_stay", logs.output[-1])
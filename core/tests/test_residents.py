@@ -0,0 +1,44 @@
+import datetime
+
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase
+
+from core.factories import LocationFactory, ResourceFactory, UserFactory
+from core.libs.request_cache import request_cache_scope
+from core.models import Backing
+
+
+class ResidentIndexTest(TestCase):
+    def setUp(self):
+        self.location = LocationFactory()
+        self.today = datetime.date.today()
+        self.current = UserFactory(username="current")
+        self.former = UserFactory(username="former")
+        self.future = UserFactory(username="future")
+        room = ResourceFactory(location=self.location)
+        Backing.objects.setup_new(
+            room, [self.former], self.today - datetime.timedelta(days=30)
+        )
+        room.set_next_backing([self.current], self.today - datetime.timedelta(days=5))
+        other_room = ResourceFactory(location=self.location, name="Other Room")
+        Backing.objects.setup_new(
+            other_room, [self.future], self.today + datetime.timedelta(days=5)
+        )
+
+    def test_only_current_backers_are_residents(self):
+        self.assertEqual(self.location.residents(), [self.current])
+        self.assertTrue(self.location.is_resident(self.current))
+        self.assertFalse(self.location.is_resident(self.former))
+        self.assertFalse(self.location.is_resident(self.future))
+        self.assertFalse(self.location.is_resident(AnonymousUser()))
+
+    def test_residents_are_loaded_once_per_request(self):
+        with request_cache_scope():
+            with self.assertNumQueries(1):
+                self.location.residents()
+                for user in (self.current, self.former, self.future):
+                    self.location.is_resident(user)
+
+            room = ResourceFactory(location=self.location, name="New Room")
+            Backing.objects.setup_new(room, [self.former], self.today)
+            self.assertTrue(self.location.is_resident(self.former))
@@ -0,0 +1,65 @@
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+
+from core.factories import LocationFactory
+from core.libs.task_runner import TaskRunner, summarize
+
+
+class TaskRunnerTest(SimpleTestCase):
+    def test_failures_are_isolated(self):
+        def fail():
+            raise ValueError("boom")
+
+        ran = []
+        runner = TaskRunner(max_workers=4)
+        runner.add("first", ran.append, 1)
+        runner.add("broken", fail)
+        runner.add("last", ran.append, 2)
+        results = runner.run()
+
+        self.assertEqual(
+            [result.name for result in results], ["first", "broken", "last"]
+        )
+        self.assertEqual([result.ok for result in results], [True, False, True])
+        self.assertIsInstance(results[1].error, ValueError)
+        self.assertEqual(sorted(ran), [1, 2])
+        self.assertIn("3 tasks in 1.00s, 1 failed", summarize(results, 1))
+
+    def test_jobs_run_side_by_side(self):
+        barrier = threading.Barrier(3, timeout=5)
+        runner = TaskRunner(max_workers=3)
+        for n in range(3):
+            runner.add(f"wait {n}", barrier.wait)
+        start = time.perf_counter()
+        results = runner.run()
+        self.assertTrue(all(result.ok for result in results))
+        self.assertLess(time.perf_counter() - start, 5)
+
+
+class RunDailyTasksTest(TestCase):
+    def test_reports_failed_locations(self):
+        first = LocationFactory(slug="first")
+        second = LocationFactory(slug="second")
+        done = []
+
+        def task(location):
+            if location == first:
+                raise ValueError("boom")
+            done.append(location)
+
+        out = StringIO()
+        tasks = [("test_task", task)]
+        with (
+            mock.patch(
+                "core.management.commands.run_daily_tasks.LOCATION_TASKS", tasks
+            ),
+            self.assertRaises(CommandError),
+        ):
+            call_command("run_daily_tasks", workers=1, stdout=out)
+        self.assertEqual(done, [second])
+        self.assertIn("test_task first: FAILED", out.getvalue())
@@ -0,0 +1,50 @@
+from django.template import Context
+from django.test import TestCase
+
+from core.emails.messages import render_templates
+from core.factories import LocationFactory
+from core.libs.template_cache import TemplateCache, location_email_templates
+from core.models import LocationEmailTemplate
+
+
+class TemplateCacheTest(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = TemplateCache(maxsize=2)
+        first = cache.get("first", "one")
+        cache.get("second", "two")
+        # using first makes second the oldest
+        self.assertIs(cache.get("first", "one"), first)
+        cache.get("third", "three")
+        self.assertEqual(len(cache), 2)
+        self.assertIs(cache.get("first", "one"), first)
+        self.assertEqual(cache.get("second", "two").render(Context()), "two")
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+
+class RenderTemplatesTest(TestCase):
+    def setUp(self):
+        location_email_templates.clear()
+        self.location = LocationFactory()
+        self.override = LocationEmailTemplate.objects.create(
+            location=self.location,
+            key=LocationEmailTemplate.WELCOME,
+            text_body="hi {{ first_name }}",
+            html_body="<p>hi {{ first_name }}</p>",
+        )
+
+    def render(self, first_name):
+        return render_templates(
+            {"first_name": first_name}, self.location, LocationEmailTemplate.WELCOME
+        )
+
+    def test_override_is_compiled_once(self):
+        self.assertEqual(self.render("bilbo"), ("hi bilbo", "<p>hi bilbo</p>"))
+        self.assertEqual(self.render("frodo"), ("hi frodo", "<p>hi frodo</p>"))
+        self.assertEqual(location_email_templates.misses, 2)
+        self.assertEqual(location_email_templates.hits, 2)
+
+    def test_editing_override_takes_effect(self):
+        self.render("bilbo")
+        self.override.text_body = "hello {{ first_name }}"
+        self.override.save()
+        self.assertEqual(self.render("bilbo")[0], "hello bilbo")
@@ -16,6 +16,11 @@ per_location_patterns = [
         occupancy.room_occupancy,
         name="room_occupancy",
     ),
+    re_path(
+        r"^occupancy/rooms/(?P<year>\d+)/$",
+        occupancy.location_room_occupancy,
+        name="location_room_occupancy",
+    ),
     re_path(r"^calendar/$", occupancy.calendar, name="location_calendar"),
     re_path(r"^thanks/$", occupancy.thanks, name="location_thanks"),
     re_path(r"^today/$", occupancy.today, name="location_today"),
@@ -1,6 +1,6 @@
 from django.urls import re_path
 
-from core.views import billing, booking_management, occupancy
+from core.views import billing, booking_management, exports, occupancy
 
 # custom management patterns
 urlpatterns = [
@@ -11,6 +11,7 @@ urlpatterns = [
         name="location_payments",
     ),
     re_path(r"^today/$", occupancy.manage_today, name="manage_today"),
+    re_path(r"^export/(?P<name>\w+)/$", exports.export, name="location_export"),
     re_path(
         r"bookings/$", booking_management.BookingManageList, name="booking_manage_list"
     ),
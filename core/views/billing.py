@@ -18,6 +18,7 @@ from django.views.decorators.http import require_POST
 from stripe.error import CardError
 
 from core import payment_gateway
+from core.data_fetchers import PaymentReportData
 from core.decorators import house_admin_required, resident_or_admin_required
 from core.emails.messages import (
     send_booking_receipt,
@@ -29,7 +30,6 @@ from core.models import (
     BillLineItem,
     Booking,
     Location,
-    LocationFee,
     Payment,
 )
 from core.tasks import guest_welcome
@@ -565,8 +565,7 @@ def submit_payment(request, booking_uuid, location_slug):
 
 @resident_or_admin_required
 def payments(request, location_slug, year, month):
-    t0 = time.time()
-    logger.debug("payments: timing begun:")
+    t0 = time.perf_counter()
     location = get_object_or_404(Location, slug=location_slug)
     start, end, next_month, prev_month, month, year = occupancy.get_calendar_dates(
         month, year
@@ -601,19 +600,16 @@ def payments(request, location_slug, year, month):
     # TODO: we're essentially equating non house fees with hotel taxes. we
     # should make this explicit in some way.
 
-    booking_payments_this_month = (
-        Payment.objects.booking_payments_by_location(location)
-        .filter(payment_date__gte=start, payment_date__lte=end)
-        .order_by("payment_date")
-        .reverse()
-    )
+    report = PaymentReportData(location, start, end)
+    booking_payments_this_month = report.payments()
+    t1 = time.perf_counter()
     for p in booking_payments_this_month:
-        # pull out the values we call multiple times to make this faster
-        p_to_house = p.to_house()
-        p_bill_non_house_fees = p.bill.non_house_fees()
-        p_house_fees = p.house_fees()
-        p_non_house_fees = p.non_house_fees()
+        # the fee split was worked out for all the payments when they were
+        # loaded
+        p_house_fees, p_non_house_fees = p.fee_allocation()
         p_paid_amount = p.paid_amount
+        p_to_house = p_paid_amount - p_non_house_fees - p_house_fees
+        p_bill_non_house_fees = p.bill.non_house_fees()
 
         summary_totals["gross_rent"] += p_to_house
         if p_bill_non_house_fees > 0:
@@ -635,11 +631,7 @@ def payments(request, location_slug, year, month):
             summary_totals["res_external_txs_paid"] += p_paid_amount
             summary_totals["res_external_txs_fees"] += p_house_fees
 
-    not_paid_by_house = LocationFee.objects.filter(location=location).filter(
-        fee__paid_by_house=False
-    )
-    for loc_fee in not_paid_by_house:
-        summary_totals["hotel_tax_percent"] += loc_fee.fee.percentage * 100
+    summary_totals["hotel_tax_percent"] += report.non_house_fee_percent()
 
     ##############################
 
@@ -655,11 +647,17 @@ def payments(request, location_slug, year, month):
         summary_totals["gross_rent_transient"] + summary_totals["net_rent_resident"]
     )
 
-    t1 = time.time()
-    dt = t1 - t0
-    logger.debug("payments: timing ended. time taken:")
-    logger.debug(dt)
-    return render(
+    t2 = time.perf_counter()
+    logger.info(
+        "payments: %s %s-%02d: %d payments, loaded in %.3fs, totalled in %.3fs",
+        location.slug,
+        year,
+        month,
+        len(booking_payments_this_month),
+        t1 - t0,
+        t2 - t1,
+    )
+    response = render(
         request,
         "payments.html",
         {
@@ -672,3 +670,7 @@ def payments(request, location_slug, year, month):
             "next_date": next_month,
         },
     )
+    response["Server-Timing"] = (
+        f"load;dur={(t1 - t0) * 1000:.1f}, totals;dur={(t2 - t1) * 1000:.1f}"
+    )
+    return response
@@ -3,7 +3,6 @@ import json
 import logging
 from json import JSONEncoder
 
-import dateutil
 import stripe
 from django.conf import settings
 from django.contrib import messages
@@ -20,6 +19,7 @@ from django.views.generic import TemplateView
 from rest_framework import generics, mixins
 
 from core import models, payment_gateway
+from core.data_fetchers import LocationAvailability
 from core.emails.messages import (
     guest_welcome,
     new_booking_notify,
@@ -27,7 +27,7 @@ from core.emails.messages import (
     updated_booking_notify,
 )
 from core.forms import BookingUseForm
-from core.serializers import FeeSerializer, ResourceSerializer
+from core.serializers import FeeSerializer, ResourceSerializer, availability_window
 from core.shortcuts import get_qs_or_404
 from core.views import view_helpers
 
@@ -43,30 +43,42 @@ class DateEncoder(JSONEncoder):
             return super().default(o)
 
 
+def location_availability_versions(request, location_slug, **kwargs):
+    return models.AvailabilityVersion.objects.filter(location__slug=location_slug)
+
+
+def room_availability_versions(request, room_id, **kwargs):
+    return models.AvailabilityVersion.objects.filter(location__resources=room_id)
+
+
 class RoomApiList(mixins.ListModelMixin, generics.GenericAPIView):
-    queryset = models.Resource.objects.all()
+    queryset = (
+        models.Resource.objects.all()
+        .select_related("location")
+        .prefetch_related("capacity_changes")
+    )
     serializer_class = ResourceSerializer
     lookup_field = "location_slug"
 
     def filter_queryset(self, queryset):
-        # TODO make sure that capacity_change and uses are prefetched somehow
-        # ideally a method on Resource manager
-
-        def room_available_during_period(room, arrive, depart):
-            availabilities = room.daily_availabilities_within(arrive, depart)
+        def room_available_during_period(availabilities):
             zero_quantity_dates = [avail for avail in availabilities if avail[1] == 0]
             return not zero_quantity_dates
 
         qs = queryset.filter(location__slug=self.kwargs["location_slug"])
         params = self.request.query_params.dict()
         if params:
-            arrive = dateutil.parser(params["arrive"]).date
-            depart = dateutil.parser(params["depart"]).date
-
+            arrive, depart = availability_window(self.request)
+            location = get_object_or_404(
+                models.Location, slug=self.kwargs["location_slug"]
+            )
+            availability = LocationAvailability.for_request(
+                self.request, location, arrive, depart
+            )
             room_ids = [
-                room.pk
-                for room in qs
-                if room_available_during_period(room, arrive, depart)
+                room_id
+                for room_id, availabilities in availability.as_matrix().items()
+                if room_available_during_period(availabilities)
             ]
             qs = qs.filter(id__in=room_ids)
         return qs
@@ -74,15 +86,19 @@ class RoomApiList(mixins.ListModelMixin, generics.GenericAPIView):
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    @method_decorator(
+        view_helpers.availability_condition(location_availability_versions)
+    )
     def get(self, request, *args, **kwargs):
         return self.list(request, *args, **kwargs)
 
 
 class RoomApiDetail(mixins.RetrieveModelMixin, generics.GenericAPIView):
-    queryset = models.Resource.objects.all()
+    queryset = models.Resource.objects.all().select_related("location")
     serializer_class = ResourceSerializer
     lookup_url_kwarg = "room_id"
 
+    @method_decorator(view_helpers.availability_condition(room_availability_versions))
     def get(self, request, *args, **kwargs):
         return self.retrieve(request, *args, **kwargs)
 
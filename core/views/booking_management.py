@@ -5,6 +5,7 @@ from decimal import Decimal
 from django.contrib import messages
 from django.contrib.auth.models import User
 from django.contrib.sites.models import Site
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.db.models import Q
 from django.http import HttpResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, render
@@ -12,7 +13,7 @@ from django.urls import reverse
 from django.utils import timezone
 from stripe.error import CardError
 
-from bank.models import Entry, Transaction
+from bank.models import PostingException, Transaction
 from core import payment_gateway
 from core.decorators import house_admin_required
 from core.emails.messages import (
@@ -61,9 +62,8 @@ def BookingManageList(request, location_slug):
     bookings = (
         Booking.objects.filter(use__location=location)
         .order_by("-id")
+        # is_paid() and the bill amount read the bill's cached totals
         .select_related("use", "use__resource", "use__user", "bill")
-        # this makes is is_paid() efficient
-        .prefetch_related("bill__line_items", "bill__line_items__fee", "bill__payments")
     )
 
     pending = bookings.filter(use__status="pending")
@@ -79,7 +79,17 @@ def BookingManageList(request, location_slug):
         today = timezone.localtime(timezone.now())
         confirmed = confirmed.filter(use__depart__gt=today)
         canceled = canceled.filter(use__depart__gt=today)
-    owing = Use.objects.confirmed_but_unpaid(location=location)
+    # the amount owed is worked out in the database, so only the page being
+    # shown is loaded
+    paged_owing = Paginator(Use.objects.confirmed_but_unpaid(location=location), 50)
+    page = request.GET.get("owing_page")
+    try:
+        owing_page = paged_owing.page(page)
+    except PageNotAnInteger:
+        owing_page = paged_owing.page(1)
+    except EmptyPage:
+        owing_page = paged_owing.page(paged_owing.num_pages)
+    owing = [use.booking for use in owing_page]
 
     return render(
         request,
@@ -90,6 +100,7 @@ def BookingManageList(request, location_slug):
             "confirmed": confirmed,
             "canceled": canceled,
             "owing": owing,
+            "owing_page": owing_page,
             "location": location,
         },
     )
@@ -287,18 +298,23 @@ def BookingManagePayWithDrft(request, location_slug, booking_id):
             request, messages.INFO, "This room appears to be full or unavailable"
         )
     else:
-        t = Transaction.objects.create(
-            reason="use %d" % booking.use.id,
-            approver=request.user,
-        )
-        Entry.objects.create(
-            account=user_drft_account, amount=-requested_nights, transaction=t
-        )
-        Entry.objects.create(
-            account=room_drft_account, amount=requested_nights, transaction=t
-        )
+        try:
+            (t,) = Transaction.objects.post(
+                [
+                    (
+                        "use %d" % booking.use.id,
+                        requested_nights,
+                        user_drft_account,
+                        room_drft_account,
+                    )
+                ],
+                approver=request.user,
+            )
+        except PostingException:
+            logger.error("DRFT payment for use %d was refused" % booking.use.id)
+            t = None
 
-        if t.valid:
+        if t is not None:
             # this is a hack because ideally we don't even WANT a booking
             # object for DRFT uses. we'll get there...
             booking.comp()
@@ -0,0 +1,52 @@
+import datetime
+
+import dateutil.parser
+from django.http import Http404, HttpResponseBadRequest
+from django.shortcuts import get_object_or_404
+
+from core.decorators import house_admin_required
+from core.exports import EXPORTS
+from core.libs.streaming import streaming_csv_response, streaming_ndjson_response
+from core.models import Location
+
+
+@house_admin_required
+def export(request, location_slug, name):
+    """streams one of the location's exports for the date range given by the
+    start and end query parameters (default: the current month so far), as
+    csv or, with format=ndjson, newline-delimited JSON."""
+    location = get_object_or_404(Location, slug=location_slug)
+    if name not in EXPORTS:
+        raise Http404(f"No export named {name}")
+    dataset = EXPORTS[name]
+
+    today = datetime.date.today()
+    try:
+        start = dateutil.parser.parse(request.GET["start"]).date()
+    except KeyError:
+        start = today.replace(day=1)
+    except (ValueError, OverflowError):
+        return HttpResponseBadRequest("Invalid start date")
+    try:
+        end = dateutil.parser.parse(request.GET["end"]).date()
+    except KeyError:
+        end = today
+    except (ValueError, OverflowError):
+        return HttpResponseBadRequest("Invalid end date")
+
+    output_format = request.GET.get("format", "csv")
+    filename = f"{location.slug}-{name}-{start}-{end}.{output_format}"
+    rows = dataset.rows(location, start, end)
+    if output_format == "ndjson":
+        headers = dataset.headers()
+        return streaming_ndjson_response(
+            (dict(zip(headers, row)) for row in rows), filename
+        )
+    elif output_format == "csv":
+
+        def csv_rows():
+            yield dataset.headers()
+            yield from rows
+
+        return streaming_csv_response(csv_rows(), filename)
+    return HttpResponseBadRequest("Format must be csv or ndjson")
@@ -1,4 +1,3 @@
-import csv
 import datetime
 import logging
 from decimal import Decimal
@@ -6,18 +5,19 @@ from decimal import Decimal
 import dateutil
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q
-from django.http import HttpResponse, JsonResponse
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, render
 from django.utils import timezone
 from django.utils.safestring import mark_safe
 from django.views.decorators.csrf import csrf_exempt
 
 from core.booking_calendar import GuestCalendar
+from core.data_fetchers import OccupancyReportData, RoomOccupancyData
 from core.decorators import resident_or_admin_required
+from core.libs.streaming import streaming_csv_response
 from core.models import (
     Booking,
     Location,
-    Payment,
     Resource,
     Use,
 )
@@ -78,24 +78,20 @@ def today(request, location_slug):
     )
 
 
-def room_occupancy_month(room, month, year):
+def room_occupancy_month(room, month, year, data=None):
+    """returns the occupancy report row for a room and month. data is the
+    RoomOccupancyData the figures come from; if not given, the room's data for
+    the year is loaded."""
     logger.debug(room, month, year)
     start, end, next_month, prev_month, month, year = get_calendar_dates(month, year)
+    if data is None:
+        data = RoomOccupancyData([room], year)
 
     # note the day parameter is meaningless
-    uses = (
-        Use.objects.filter(resource=room)
-        .filter(status="confirmed")
-        .exclude(depart__lt=start)
-        .exclude(arrive__gt=end)
-    )
+    uses = data.uses(room, start, end)
 
     # payments *received* this month for this room
-    payments_for_room = (
-        Payment.objects.booking_payments_by_resource(room)
-        .filter(payment_date__gte=start)
-        .filter(payment_date__lte=end)
-    )
+    payments_for_room = data.payments(room, start, end)
     payments_cash = 0
     for p in payments_for_room:
         payments_cash += p.paid_amount
@@ -180,46 +176,70 @@ def room_occupancy_month(room, month, year):
     return params
 
 
+ROOM_OCCUPANCY_HEADER = [
+    "Month",
+    "Year",
+    "Payments Cash",
+    "Payments Accrual",
+    "Nights Occupied",
+    "Nights Available",
+    "Partial Paid Bookings",
+    "Comped Nights",
+    "Outstanding Value",
+    "Total User Value",
+    "Net Value to House",
+    "Externalized Fees",
+    "Internal Fees",
+    "Comped Value",
+]
+
+
+def room_occupancy_year(rooms, year):
+    """yields (room, row) for every month of the year for each room, from a
+    single load of the rooms' uses and payments for the year."""
+    data = RoomOccupancyData(rooms, year)
+    for room in data.rooms:
+        for month in range(1, 13):
+            yield room, room_occupancy_month(room, month, year, data)
+
+
+def _reportable_year(year):
+    # we don't have data before 2012 or in the future
+    return 2012 <= year <= datetime.date.today().year
+
+
 @resident_or_admin_required
 def room_occupancy(request, location_slug, room_id, year):
     room = get_object_or_404(Resource, id=room_id)
     year = int(year)
-    response = HttpResponse(content_type="text/csv")
     output_filename = "%s Occupancy Report %d.csv" % (room.name, year)
-    response["Content-Disposition"] = f"attachment; filename={output_filename}"
-    writer = csv.writer(response)
     if room.location.slug != location_slug:
-        writer.writerow(["invalid room"])
-        return response
-
-    writer.writerow([str(year) + " Report for " + room.name])
-    writer.writerow(
-        [
-            "Month",
-            "Year",
-            "Payments Cash",
-            "Payments Accrual",
-            "Nights Occupied",
-            "Nights Available",
-            "Partial Paid Bookings",
-            "Comped Nights",
-            "Outstanding Value",
-            "Total User Value",
-            "Net Value to House",
-            "Externalized Fees",
-            "Internal Fees",
-            "Comped Value",
-        ]
-    )
-    # we don't have data before 2012 or in the future
-    if (year < 2012) or (year > datetime.date.today().year):
-        return response
+        return streaming_csv_response([["invalid room"]], output_filename)
+
+    def rows():
+        yield [str(year) + " Report for " + room.name]
+        yield ROOM_OCCUPANCY_HEADER
+        if _reportable_year(year):
+            for _, row in room_occupancy_year([room], year):
+                yield row
+
+    return streaming_csv_response(rows(), output_filename)
 
-    for month in range(1, 13):
-        params = room_occupancy_month(room, month, year)
-        writer.writerow(params)
 
-    return response
+@resident_or_admin_required
+def location_room_occupancy(request, location_slug, year):
+    location = get_object_or_404(Location, slug=location_slug)
+    year = int(year)
+    output_filename = "%s Occupancy Report %d.csv" % (location.name, year)
+
+    def rows():
+        yield ["Room"] + ROOM_OCCUPANCY_HEADER
+        if _reportable_year(year):
+            rooms = Resource.objects.filter(location=location)
+            for room, row in room_occupancy_year(rooms, year):
+                yield [room.name] + row
+
+    return streaming_csv_response(rows(), output_filename)
 
 
 def monthly_occupant_report(location_slug, year, month):
@@ -295,12 +315,10 @@ def occupancy(request, location_slug):
 
     # note the day parameter is meaningless
     report_date = datetime.date(year, month, 1)
-    uses = (
-        Use.objects.filter(location=location)
-        .filter(status="confirmed")
-        .exclude(depart__lt=start)
-        .exclude(arrive__gt=end)
-    )
+    # bookings, bills, line items and payments are all loaded up front so the
+    # money figures below are computed without further queries.
+    report_data = OccupancyReportData(location, start, end)
+    uses = report_data.uses()
 
     person_nights_data = []
     total_occupied_person_nights = 0
@@ -329,11 +347,7 @@ def occupancy(request, location_slug):
     # appended to, partial refunds, etc. so, it's kind of fuzzy. if you try and
     # work on it, don't say i didn't warn you :).
 
-    payments_this_month = (
-        Payment.objects.booking_payments_by_location(location)
-        .filter(payment_date__gte=start)
-        .filter(payment_date__lte=end)
-    )
+    payments_this_month = report_data.payments()
     for p in payments_this_month:
         u = p.bill.bookingbill.booking.use
         nights_before_this_month = datetime.timedelta(0)
@@ -458,7 +472,7 @@ def occupancy(request, location_slug):
         )
         total_occupied_person_nights += nights_this_month
 
-    location_rooms = location.resources.all()
+    location_rooms = report_data.rooms()
     total_reservable_days = 0
     reservable_days_per_room = {}
     for room in location_rooms:
@@ -577,9 +591,12 @@ def calendar(request, location_slug):
         .exclude(depart__lt=start)
         .exclude(arrive__gt=end)
         .order_by("arrive")
+        .select_related("booking", "user", "resource")
     )
 
-    rooms = Resource.objects.filter(location=location)
+    rooms = Resource.objects.filter(location=location).prefetch_related(
+        "capacity_changes"
+    )
     uses_by_room = []
     empty_rooms = 0
 
@@ -1,6 +1,9 @@
+import datetime
+
 from django.contrib import messages
 from django.contrib.auth.models import User
 from django.http import HttpResponseRedirect
+from django.views.decorators.http import condition
 
 from core import models
 
@@ -28,3 +31,38 @@ def has_active_membership(user):
     """
     membership_list = models.Membership.objects.filter(user=user)
     return any(membership.is_active() for membership in membership_list)
+
+
+def availability_condition(versions_for):
+    """
+    Returns a decorator for a view of the availability of a location that
+    answers conditional GETs (If-None-Match) with a 304 before the view runs,
+    as long as the location's AvailabilityVersion has not moved on, and gives
+    its responses an ETag. there is no Last-Modified, since a change made in
+    the same second as a response would not move it on.
+    versions_for(request, **kwargs) returns the location's versions queryset.
+    """
+
+    def current(request, *args, **kwargs):
+        if not hasattr(request, "_availability_version"):
+            try:
+                request._availability_version = (
+                    models.AvailabilityVersion.objects.current(
+                        versions_for(request, **kwargs)
+                    )
+                )
+            except ValueError:
+                # not an id; the view will say it is not found
+                request._availability_version = None
+        return request._availability_version
+
+    def etag(request, *args, **kwargs):
+        version = current(request, *args, **kwargs)
+        if version is None:
+            return None
+        location_id, number = version
+        # availabilities are from today unless asked otherwise, so they
+        # change at midnight too
+        return f'"{location_id}-{number}-{datetime.date.today().isoformat()}"'
+
+    return condition(etag_func=etag)
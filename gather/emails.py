@@ -147,7 +147,7 @@ def event_published_notification(event, location):
             )
             return
         if (event.visibility == Event.PUBLIC) or (
-            event.visibility == Event.COMMUNITY and u in location.residents()
+            event.visibility == Event.COMMUNITY and location.is_resident(u)
         ):
             mailgun_data = {
                 "from": from_address,
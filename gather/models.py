@@ -5,10 +5,11 @@ import uuid
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models import Q
 from django.db.models.signals import post_save
 from django.utils import timezone
 
-from core.models import Location
+from core.models import Backing, Location
 
 logger = logging.getLogger(__name__)
 
@@ -55,27 +56,51 @@ def event_img_upload_to(instance, filename):
 
 
 class EventManager(models.Manager):
+    def viewable_by(self, user):
+        """a Q matching the events user can view. see Event.is_viewable(),
+        which this mirrors."""
+        viewable = Q(status=Event.LIVE, visibility=Event.PUBLIC)
+        if not user or not user.is_authenticated:
+            return viewable
+        resident_of = Backing.objects.current().filter(users=user)
+        return (
+            viewable
+            | Q(admin__users=user)
+            | Q(creator=user)
+            | Q(organizers=user)
+            | Q(attendees=user)
+            | (
+                Q(location__in=resident_of.values("resource__location"))
+                & ~Q(visibility=Event.PRIVATE)
+            )
+        )
+
+    def viewable(self, user):
+        """the events user can view."""
+        # the joins in viewable_by() can match an event more than once, so
+        # they go in a subquery
+        qs = super().get_queryset()
+        return qs.filter(pk__in=qs.filter(self.viewable_by(user)).values("pk"))
+
     def upcoming(self, upto=None, current_user=None, location=None):
-        # return the events happening today or in the future, returning up to
-        # the number of events specified in the 'upto' argument.
+        # return the events happening today or in the future that the user can
+        # view, returning up to the number of events specified in the 'upto'
+        # argument.
         today = timezone.now()
-        logger.debug(today)
-        qs = super().get_queryset()
         upcoming = (
-            qs.filter(end__gte=today).exclude(status=Event.CANCELED).order_by("start")
+            self.viewable(current_user)
+            .filter(end__gte=today)
+            .exclude(status=Event.CANCELED)
+            .select_related("location")
+            .order_by("start")
         )
 
         if location:
             upcoming = upcoming.filter(location=location)
 
-        viewable_upcoming = []
-        for event in upcoming:
-            if event.is_viewable(current_user):
-                viewable_upcoming.append(event)
-                if upto and len(viewable_upcoming) == upto:
-                    break
-        logger.debug(viewable_upcoming)
-        return viewable_upcoming
+        if upto:
+            upcoming = upcoming[:upto]
+        return upcoming
 
     class Meta:
         app_label = "gather"
@@ -197,7 +222,7 @@ class Event(models.Model):
         else:
             is_event_admin = False
 
-        if current_user and current_user in self.location.residents():
+        if current_user and self.location.is_resident(current_user):
             is_community_member = True
         else:
             is_community_member = False
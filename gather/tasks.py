@@ -3,12 +3,13 @@ import logging
 from itertools import chain
 
 from django.contrib.sites.models import Site
+from django.db.models import prefetch_related_objects
 from django.template.loader import get_template
 from django.urls import reverse
 from django.utils import timezone
 from zoneinfo import ZoneInfo
 
-from core.emails.mailgun import mailgun_send
+from core.emails.mailgun import mailgun_send_batch
 from core.models import Location
 from gather.models import Event, EventNotifications
 
@@ -25,9 +26,21 @@ weekday_number_to_name = {
 }
 
 
-def send_events_list(user, event_list, location):
-    profile_url = reverse("user_detail", args=(user.username,))
-    footer = f"You are receiving this email because your preferences for event reminders are on. To turn them off, visit {profile_url}"
+def _recipient_variables(users):
+    # the values substituted for %recipient.<key>% in batch emails
+    return {
+        user.email: {
+            "first_name": user.first_name,
+            "profile_url": reverse("user_detail", args=(user.username,)),
+        }
+        for user in users
+        if user.email
+    }
+
+
+def send_events_list(users, event_list, location):
+    # one email to everyone going to the same events today
+    footer = "You are receiving this email because your preferences for event reminders are on. To turn them off, visit %recipient.profile_url%"
     sender = location.from_email()
     subject = (
         "[" + location.email_subject_prefix + "]" + " Reminder of your events today"
@@ -38,7 +51,6 @@ def send_events_list(user, event_list, location):
     plaintext = get_template("emails/events_today.txt")
     domain = Site.objects.get_current().domain
     c = {
-        "user": user,
         "events": event_list,
         "location_name": location.name,
         "location": location,
@@ -49,21 +61,19 @@ def send_events_list(user, event_list, location):
     text_content = plaintext.render(c)
     mailgun_data = {
         "from": sender,
-        "to": user.email,
         "subject": subject,
         "text": text_content,
     }
-    return mailgun_send(mailgun_data)
+    return mailgun_send_batch(mailgun_data, _recipient_variables(users))
 
 
-def weekly_reminder_email(user, event_list, location):
-    profile_url = reverse("user_detail", args=(user.username,))
+def weekly_reminder_email(users, event_list, location):
     location_name = location.name
     current_tz = timezone.get_current_timezone()
     today_local = timezone.now().astimezone(current_tz).date()
     tomorrow_local = today_local + datetime.timedelta(days=1)
     week_name = tomorrow_local.strftime("%B %d, %Y")
-    footer = f"You are receiving this email because you requested weekly updates of upcoming events from {location_name}. To turn them off, visit {profile_url}"
+    footer = f"You are receiving this email because you requested weekly updates of upcoming events from {location_name}. To turn them off, visit %recipient.profile_url%"
     sender = location.from_email()
     subject = (
         "["
@@ -71,25 +81,11 @@ def weekly_reminder_email(user, event_list, location):
         + "]"
         + f" Upcoming events for the week of {week_name}"
     )
-    current_tz = timezone.get_current_timezone()
-    today_local = timezone.now().astimezone(current_tz).date()
     plaintext = get_template("emails/events_this_week.txt")
     htmltext = get_template("emails/events_this_week.html")
     domain = Site.objects.get_current().domain
 
-    c_text = {
-        "user": user,
-        "events": event_list,
-        "location_name": location_name,
-        "location": location,
-        "domain": domain,
-        "footer": footer,
-        "week_name": week_name,
-    }
-    text_content = plaintext.render(c_text)
-
-    c_html = {
-        "user": user,
+    c = {
         "events": event_list,
         "location_name": location_name,
         "location": location,
@@ -97,16 +93,16 @@ def weekly_reminder_email(user, event_list, location):
         "footer": footer,
         "week_name": week_name,
     }
-    html_content = htmltext.render(c_html)
+    text_content = plaintext.render(c)
+    html_content = htmltext.render(c)
 
     mailgun_data = {
         "from": sender,
-        "to": user.email,
         "subject": subject,
         "text": text_content,
         "html": html_content,
     }
-    return mailgun_send(mailgun_data)
+    return mailgun_send_batch(mailgun_data, _recipient_variables(users))
 
 
 def events_pending(location):
@@ -133,7 +129,7 @@ def published_events_this_week_local(location):
     today_local = timezone.now().astimezone(current_tz).date()
     tomorrow_local = today_local + datetime.timedelta(days=1)
     seven_days_from_now_local = today_local + datetime.timedelta(days=7)
-    utc_tz = timezone("UTC")
+    utc_tz = ZoneInfo("UTC")
     week_local_start_time = datetime.datetime(
         tomorrow_local.year, tomorrow_local.month, tomorrow_local.day, 0, 0
     )
@@ -147,8 +143,8 @@ def published_events_this_week_local(location):
     )
     week_local_start_aware = timezone.make_aware(week_local_start_time, current_tz)
     week_local_end_aware = timezone.make_aware(week_local_end_time, current_tz)
-    week_local_start_utc = utc_tz.normalize(week_local_start_aware.astimezone(utc_tz))
-    week_local_end_utc = utc_tz.normalize(week_local_end_aware.astimezone(utc_tz))
+    week_local_start_utc = week_local_start_aware.astimezone(utc_tz)
+    week_local_end_utc = week_local_end_aware.astimezone(utc_tz)
 
     # get events happening today that are live
     starts_this_week_local = (
@@ -227,28 +223,39 @@ def events_today_reminder():
     logger.info("Running task: events_today_reminder")
     locations = Location.objects.all()
     for location in locations:
-        events_today_local = published_events_today_local(location)
-        if len(events_today_local) == 0:
-            continue
-        # for each event,
-        #    for each attendee or organizer
-        #        if they want reminders, append this event to a list of reminders for today, for that person.
-        reminders_per_person = {}
-        for event in events_today_local:
-            distinct_event_people = list(
-                set(list(event.attendees.all()) + list(event.organizers.all()))
-            )
-            for user in distinct_event_people:
-                if (
-                    user.event_notifications.reminders
-                    and user not in reminders_per_person
-                ):
-                    reminders_this_person = reminders_per_person.get(user, [])
-                    reminders_this_person.append(event)
-                    reminders_per_person[user] = reminders_this_person
-
-        for user, events_today in reminders_per_person.iteritems():
-            send_events_list(user, events_today, location)
+        location_events_today_reminder(location)
+
+
+def location_events_today_reminder(location):
+    events_today_local = published_events_today_local(location)
+    if len(events_today_local) == 0:
+        return
+    # for each event,
+    #    for each attendee or organizer
+    #        if they want reminders, append this event to a list of reminders for today, for that person.
+    prefetch_related_objects(events_today_local, "attendees", "organizers")
+    people_per_event = {
+        event: set(event.attendees.all()) | set(event.organizers.all())
+        for event in events_today_local
+    }
+    # reminders are on unless turned off
+    no_reminders = set(
+        EventNotifications.objects.filter(
+            user__in=set().union(*people_per_event.values()), reminders=False
+        ).values_list("user_id", flat=True)
+    )
+    reminders_per_person = {}
+    for event, distinct_event_people in people_per_event.items():
+        for user in distinct_event_people:
+            if user.pk not in no_reminders:
+                reminders_per_person.setdefault(user, []).append(event)
+
+    # everyone with the same events today gets the same email
+    people_per_reminders = {}
+    for user, events_today in reminders_per_person.items():
+        people_per_reminders.setdefault(tuple(events_today), []).append(user)
+    for events_today, users in people_per_reminders.items():
+        send_events_list(users, list(events_today), location)
 
 
 def weekly_upcoming_events():
@@ -256,19 +263,21 @@ def weekly_upcoming_events():
     # gets a list of events to send reminders about *for all locations* one by one.
     locations = Location.objects.all()
     for location in locations:
-        events_this_week_at_location = published_events_this_week_local(location)
-        if len(events_this_week_at_location) == 0:
-            logger.debug(
-                f"no events this week at {location.name}; skipping email notification"
-            )
-            continue
-        # for each event,
-        #    for each attendee or organizer
-        #        if they want reminders, append this event to a list of reminders for today, for that person.
-        weekly_notifications_on = EventNotifications.objects.filter(
-            location_weekly=location
+        location_weekly_upcoming_events(location)
+
+
+def location_weekly_upcoming_events(location):
+    events_this_week_at_location = published_events_this_week_local(location)
+    if len(events_this_week_at_location) == 0:
+        logger.debug(
+            f"no events this week at {location.name}; skipping email notification"
         )
-        remindees_for_location = [notify.user for notify in weekly_notifications_on]
+        return
+    weekly_notifications_on = EventNotifications.objects.filter(
+        location_weekly=location
+    ).select_related("user")
+    remindees_for_location = [notify.user for notify in weekly_notifications_on]
 
-        for user in remindees_for_location:
-            weekly_reminder_email(user, events_this_week_at_location, location)
+    weekly_reminder_email(
+        remindees_for_location, events_this_week_at_location, location
+    )
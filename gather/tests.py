@@ -5,8 +5,16 @@ when you run "manage.py test".
 Replace this with more appropriate tests for your application.
 """
 
+import datetime
+
+from django.contrib.auth.models import AnonymousUser
 from django.test import TestCase
 
+from core.factories import LocationFactory, ResourceFactory, UserFactory
+from core.factory_apps.events import EventAdminGroupFactory, EventFactory
+from core.models import Backing
+from gather.models import Event
+
 
 class SimpleTest(TestCase):
     def test_basic_addition(self):
@@ -14,3 +22,57 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class EventVisibilityTest(TestCase):
+    def setUp(self):
+        self.location = LocationFactory()
+        self.event_admin = UserFactory(username="eventadmin")
+        self.creator = UserFactory(username="creator")
+        self.organizer = UserFactory(username="organizer")
+        self.attendee = UserFactory(username="attendee")
+        self.resident = UserFactory(username="resident")
+        self.stranger = UserFactory(username="stranger")
+        Backing.objects.setup_new(
+            ResourceFactory(location=self.location),
+            [self.resident],
+            datetime.date.today() - datetime.timedelta(days=1),
+        )
+        admin_group = EventAdminGroupFactory(
+            location=self.location, users=[self.event_admin]
+        )
+        self.events = [
+            EventFactory(
+                slug=f"event-{status}-{visibility}".replace(" ", "-"),
+                location=self.location,
+                admin=admin_group,
+                creator=self.creator,
+                organizers=[self.organizer],
+                attendees=[self.attendee],
+                status=status,
+                visibility=visibility,
+            )
+            for status in (Event.PENDING, Event.LIVE)
+            for visibility in (Event.PUBLIC, Event.PRIVATE, Event.COMMUNITY)
+        ]
+
+    def test_query_matches_is_viewable(self):
+        users = [
+            self.event_admin,
+            self.creator,
+            self.organizer,
+            self.attendee,
+            self.resident,
+            self.stranger,
+            AnonymousUser(),
+            None,
+        ]
+        for user in users:
+            expected = {event.pk for event in self.events if event.is_viewable(user)}
+            viewable = set(Event.objects.viewable(user).values_list("pk", flat=True))
+            self.assertEqual(viewable, expected, user)
+
+    def test_upcoming_is_one_query(self):
+        with self.assertNumQueries(1):
+            upcoming = list(Event.objects.upcoming(upto=5, current_user=self.resident))
+        self.assertEqual(len(upcoming), 4)
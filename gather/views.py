@@ -298,13 +298,9 @@ def upcoming_events_all_locations(request):
     current_user = request.user if request.user.is_authenticated else None
     datetime.datetime.today()
     all_upcoming = Event.objects.upcoming(current_user=request.user)
-    culled_upcoming = []
-    for event in all_upcoming:
-        if event.is_viewable(current_user):
-            culled_upcoming.append(event)
 
     # show 10 events per page
-    paged_upcoming = Paginator(culled_upcoming, 10)
+    paged_upcoming = Paginator(all_upcoming, 10)
     page = request.GET.get("page")
     try:
         events = paged_upcoming.page(page)
@@ -333,13 +329,9 @@ def upcoming_events(request, location_slug=None):
     datetime.datetime.today()
     location = get_object_or_404(Location, slug=location_slug)
     all_upcoming = Event.objects.upcoming(current_user=request.user, location=location)
-    culled_upcoming = []
-    for event in all_upcoming:
-        if event.is_viewable(current_user):
-            culled_upcoming.append(event)
 
     # show 10 events per page
-    paged_upcoming = Paginator(culled_upcoming, 10)
+    paged_upcoming = Paginator(all_upcoming, 10)
     page = request.GET.get("page")
     try:
         events = paged_upcoming.page(page)
@@ -430,16 +422,13 @@ def past_events(request, location_slug=None):
     today = datetime.datetime.today()
     # most recent first
     all_past = (
-        Event.objects.filter(start__lt=today)
+        Event.objects.viewable(current_user)
+        .filter(start__lt=today)
         .order_by("-start")
         .filter(location=location)
     )
-    culled_past = []
-    for event in all_past:
-        if event.is_viewable(current_user):
-            culled_past.append(event)
     # show 10 events per page
-    paged_past = Paginator(culled_past, 10)
+    paged_past = Paginator(all_past, 10)
     page = request.GET.get("page")
     try:
         events = paged_past.page(page)
@@ -0,0 +1,97 @@
+"""
+DataLoader-style batching for the graph API, so that resolving a field on
+every node of a list costs a fixed number of queries instead of one (or
+more) per node.
+
+Whatever returns a list of nodes queues them with queue_nodes(). The first
+time a batched field is resolved on any of them, its loader loads the field
+for every queued node of that model at once and keeps the results for the
+rest of the request. A node that was never queued, such as one fetched by
+id, is simply loaded on its own.
+"""
+
+from graphene_django.filter.fields import DjangoFilterConnectionField
+
+
+def _state(context):
+    # unwrap REST framework requests, like LocationAvailability.for_request
+    request = getattr(context, "_request", context)
+    if not hasattr(request, "_graphql_batches"):
+        request._graphql_batches = {"nodes": {}, "loaders": {}}
+    return request._graphql_batches
+
+
+def queue_nodes(info, nodes):
+    """Queues nodes to be loaded along with the first of them that is."""
+    queued = _state(info.context)["nodes"]
+    for node in nodes:
+        queued.setdefault(type(node), {})[node.pk] = node
+    return nodes
+
+
+class Loader:
+    def __init__(self, batch_load, default=None):
+        self.batch_load = batch_load
+        self.default = default
+        self.values = {}
+
+    def load(self, info, node):
+        if node.pk not in self.values:
+            queued = _state(info.context)["nodes"].get(type(node), {})
+            pending = {pk: n for pk, n in queued.items() if pk not in self.values}
+            pending[node.pk] = node
+            loaded = self.batch_load(list(pending.values()))
+            for pk in pending:
+                self.values[pk] = loaded.get(pk, self.default)
+        return self.values[node.pk]
+
+
+def load(info, key, node, batch_load, default=None):
+    """Returns the value of node loaded by batch_load(nodes), which returns
+    a dict of node pk: value for a list of nodes. key names the loader in
+    the request, and should include any arguments batch_load depends on."""
+    loaders = _state(info.context)["loaders"]
+    if key not in loaders:
+        loaders[key] = Loader(batch_load, default)
+    return loaders[key].load(info, node)
+
+
+def loaded(info, key):
+    """Returns the values loaded so far by the loader named key, by node pk."""
+    loader = _state(info.context)["loaders"].get(key)
+    return loader.values if loader else {}
+
+
+class BatchedConnectionMixin:
+    """Queues the nodes of each page of the connection for batching."""
+
+    @classmethod
+    def connection_resolver(
+        cls,
+        resolver,
+        connection,
+        default_manager,
+        queryset_resolver,
+        max_limit,
+        enforce_first_or_last,
+        root,
+        info,
+        **args,
+    ):
+        connection = super().connection_resolver(
+            resolver,
+            connection,
+            default_manager,
+            queryset_resolver,
+            max_limit,
+            enforce_first_or_last,
+            root,
+            info,
+            **args,
+        )
+        queue_nodes(info, [edge.node for edge in connection.edges])
+        return connection
+
+
+class BatchedFilterConnectionField(BatchedConnectionMixin, DjangoFilterConnectionField):
+    pass
@@ -13,6 +13,11 @@ class EventNode(DjangoObjectType):
         model = Event
         filter_fields = ["slug", "title"]
 
+    @classmethod
+    def get_queryset(cls, queryset, info):
+        # for the url
+        return queryset.select_related("location")
+
     def resolve_url(self, info, **kwargs):
         return (
             "/locations/"
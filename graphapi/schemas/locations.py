@@ -1,8 +1,9 @@
+from django.db.models import F
 from graphene import Boolean, List, Node, ObjectType
-from graphene_django.filter.fields import DjangoFilterConnectionField
 from graphene_django.types import DjangoObjectType
 
-from core.models import Fee, Location
+from core.models import Fee, Location, Resource
+from graphapi.loaders import BatchedFilterConnectionField, load, loaded, queue_nodes
 
 from .resources import ResourceNode
 
@@ -13,6 +14,43 @@ class FeeNode(DjangoObjectType):
         interfaces = (Node,)
 
 
+def _load_fees(paid_by_house):
+    def batch_load(locations):
+        fees = Fee.objects.filter(locationfee__location__in=locations).annotate(
+            location_id=F("locationfee__location")
+        )
+        if paid_by_house is not None:
+            fees = fees.filter(paid_by_house=paid_by_house)
+        result = {}
+        for fee in fees:
+            result.setdefault(fee.location_id, []).append(fee)
+        return result
+
+    return batch_load
+
+
+def _load_resources(has_future_capacity, has_future_drft_capacity):
+    def batch_load(locations):
+        result = {}
+        for resource in (
+            Resource.objects.filter(location__in=locations)
+            .select_related("location")
+            .prefetch_related("capacity_changes")
+        ):
+            # the same tests as rooms_with_future_capacity and
+            # rooms_with_future_drft_capacity
+            if has_future_capacity and not resource.has_future_capacity():
+                continue
+            if has_future_drft_capacity and not (
+                resource.has_future_capacity() and resource.has_future_drft_capacity()
+            ):
+                continue
+            result.setdefault(resource.location_id, []).append(resource)
+        return result
+
+    return batch_load
+
+
 class LocationNode(DjangoObjectType):
     fees = List(lambda: FeeNode, paid_by_house=Boolean())
     resources = List(
@@ -26,21 +64,36 @@ class LocationNode(DjangoObjectType):
         interfaces = (Node,)
         filter_fields = ["slug"]
 
-    def resolve_fees(self, info, **kwargs):
-        query = Fee.objects.filter(locationfee__location=self)
-        query = query.filter(**kwargs)
-
-        return query
+    def resolve_fees(self, info, paid_by_house=None):
+        return load(
+            info,
+            ("fees", paid_by_house),
+            self,
+            _load_fees(paid_by_house),
+            default=[],
+        )
 
     def resolve_resources(self, info, **kwargs):
-        if kwargs.get("has_future_capacity", False):
-            resources = self.rooms_with_future_capacity()
-        elif kwargs.get("has_future_drft_capacity", False):
-            resources = self.rooms_with_future_drft_capacity()
-        else:
-            resources = self.resources.all()
+        has_future_capacity = kwargs.get("has_future_capacity", False)
+        # like rooms_with_future_capacity, only check drft capacity if future
+        # capacity wasn't asked for
+        has_future_drft_capacity = not has_future_capacity and kwargs.get(
+            "has_future_drft_capacity", False
+        )
+        key = ("resources", has_future_capacity, has_future_drft_capacity)
+        resources = load(
+            info,
+            key,
+            self,
+            _load_resources(has_future_capacity, has_future_drft_capacity),
+            default=[],
+        )
+        # queue the resources of every location loaded along with this one, so
+        # that their fields are batched across locations too
+        for location_resources in loaded(info, key).values():
+            queue_nodes(info, location_resources)
         return resources
 
 
 class Query(ObjectType):
-    all_locations = DjangoFilterConnectionField(LocationNode)
+    all_locations = BatchedFilterConnectionField(LocationNode)
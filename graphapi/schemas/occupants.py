@@ -1,15 +1,82 @@
+import datetime
+
 import graphene
+from django.db.models import Q
 from django.utils import timezone
 from graphene import Node, ObjectType
-from graphene_django.filter.fields import DjangoFilterConnectionField
 from graphene_django.types import DjangoObjectType
 
 from core.models import Use
 from gather.models import Event
+from graphapi.loaders import BatchedFilterConnectionField, load, queue_nodes
 
 from .events import EventNode
 
 
+def _load_occupants_during(uses):
+    overlapping = Q(pk__in=[])
+    for use in uses:
+        overlapping |= Q(
+            location_id=use.location_id,
+            arrive__lte=use.depart,
+            depart__gte=use.arrive,
+        )
+    others = (
+        Use.objects.filter(overlapping, status="confirmed")
+        .select_related("location", "user")
+        .order_by("user__last_name", "user__first_name", "pk")
+    )
+    result = {use.pk: [] for use in uses}
+    names = {use.pk: set() for use in uses}
+    for other in others:
+        name = (other.user.last_name, other.user.first_name)
+        for use in uses:
+            if (
+                other.location_id == use.location_id
+                and other.user_id != use.user_id
+                and other.arrive <= use.depart
+                and other.depart >= use.arrive
+                and name not in names[use.pk]
+            ):
+                # one stay per name, like distinct on the names
+                names[use.pk].add(name)
+                result[use.pk].append(other)
+    return result
+
+
+def _midnight(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time()))
+
+
+def _load_upcoming_events_during(uses):
+    today = timezone.now()
+    stays = {use.pk: (_midnight(use.arrive), _midnight(use.depart)) for use in uses}
+    overlapping = Q(pk__in=[])
+    for use in uses:
+        arrive, depart = stays[use.pk]
+        overlapping |= Q(
+            location_id=use.location_id, start__lte=depart, end__gte=arrive
+        )
+    events = (
+        Event.objects.filter(overlapping, status="live", visibility="public")
+        .filter(start__gte=today)
+        .select_related("location")
+        .order_by("start")
+    )
+    result = {use.pk: [] for use in uses}
+    for event in events:
+        for use in uses:
+            arrive, depart = stays[use.pk]
+            if (
+                event.location_id == use.location_id
+                and event.start <= depart
+                and event.end >= arrive
+                and len(result[use.pk]) < 3
+            ):
+                result[use.pk].append(event)
+    return result
+
+
 class OccupantNode(DjangoObjectType):
     occupants_during = graphene.List(lambda: OccupantNode)
     upcoming_events_during = graphene.List(lambda: EventNode)
@@ -20,38 +87,32 @@ class OccupantNode(DjangoObjectType):
         interfaces = (Node,)
         filter_fields = ["arrive", "location"]
 
+    @classmethod
+    def get_queryset(cls, queryset, info):
+        return queryset.select_related("location", "user")
+
     def resolve_occupants_during(self, info):
-        query = (
-            Use.objects.filter(location=self.location, status="confirmed")
-            .exclude(user=self.user)
-            .filter(arrive__lte=self.depart)
-            .filter(depart__gte=self.arrive)
-            .order_by("user__last_name", "user__first_name")
-            .distinct("user__last_name", "user__first_name")
+        occupants = load(
+            info, "occupants_during", self, _load_occupants_during, default=[]
         )
-        return query.all()
+        return queue_nodes(info, occupants)
 
     def resolve_upcoming_events_during(self, info):
-        today = timezone.now()
-
-        query = (
-            Event.objects.filter(
-                location=self.location, status="live", visibility="public"
-            )
-            .filter(start__lte=self.depart)
-            .filter(end__gte=self.arrive)
-            .filter(start__gte=today)
-            .order_by("start")
+        return load(
+            info,
+            "upcoming_events_during",
+            self,
+            _load_upcoming_events_during,
+            default=[],
         )
-        return query.all()[:3]
 
     def resolve_type(self, info):
         return "guest"
 
 
 class Query(ObjectType):
-    my_occupancies = DjangoFilterConnectionField(OccupantNode)
-    my_current_occupancies = DjangoFilterConnectionField(OccupantNode)
+    my_occupancies = BatchedFilterConnectionField(OccupantNode)
+    my_current_occupancies = BatchedFilterConnectionField(OccupantNode)
 
     def resolve_my_occupancies(self, info):
         if not info.context.user.is_authenticated:
@@ -1,15 +1,14 @@
-import logging
 from datetime import timedelta
 
 import graphene
+from django.db.models import prefetch_related_objects
 from graphene import Node, ObjectType
 from graphene.types.datetime import DateTime
-from graphene_django.filter.fields import DjangoFilterConnectionField
 from graphene_django.types import DjangoObjectType
 
-from core.models import Backing, Resource
-
-logger = logging.getLogger(__name__)
+from core.data_fetchers import LocationAvailability
+from core.models import Backing, CapacityChange, Resource
+from graphapi.loaders import BatchedFilterConnectionField, load
 
 
 class AvailabilityNode(graphene.ObjectType):
@@ -23,6 +22,33 @@ class BackingNode(DjangoObjectType):
         interfaces = (Node,)
 
 
+def _load_capacity_changes(resources):
+    prefetch_related_objects(resources, "capacity_changes")
+    return {resource.pk: resource for resource in resources}
+
+
+def _load_availabilities(start_date, end_date):
+    def batch_load(resources):
+        # one LocationAvailability over every location in the batch
+        location_availability = LocationAvailability(
+            None, start_date, end_date, resources=resources
+        )
+        return location_availability.as_matrix()
+
+    return batch_load
+
+
+def _load_drftable(start_date, end_date):
+    def batch_load(resources):
+        timelines = CapacityChange.objects.timelines(resources)
+        return {
+            resource.pk: timelines[resource.pk].drft_between(start_date, end_date)
+            for resource in resources
+        }
+
+    return batch_load
+
+
 class ResourceNode(DjangoObjectType):
     rid = graphene.Int()
     availabilities = graphene.List(
@@ -40,8 +66,15 @@ class ResourceNode(DjangoObjectType):
             "location__slug": ["exact"],
         }
 
+    @classmethod
+    def get_queryset(cls, queryset, info):
+        return queryset.select_related("location")
+
     def resolve_has_future_drft_capacity(self, info):
-        return self.has_future_drft_capacity()
+        # the capacity changes of every resource in the list are fetched
+        # together, and has_future_drft_capacity uses them
+        resource = load(info, "capacity_changes", self, _load_capacity_changes)
+        return resource.has_future_drft_capacity()
 
     def resolve_rid(self, info):
         return self.id
@@ -50,22 +83,33 @@ class ResourceNode(DjangoObjectType):
         start_date = arrive.date()
         end_date = depart.date() - timedelta(days=1)
 
-        logger.debug(f"{self.name} drftable between? ")
-        logger.debug(self.drftable_between(start_date, end_date))
-        return self.drftable_between(start_date, end_date)
+        return load(
+            info,
+            ("drftable", start_date, end_date),
+            self,
+            _load_drftable(start_date, end_date),
+        )
 
     def resolve_availabilities(self, info, arrive, depart):
         start_date = arrive.date()
         end_date = depart.date() - timedelta(days=1)
 
-        availabilities = self.daily_availabilities_within(start_date, end_date)
+        # the availabilities of every queued resource, at every location, are
+        # computed together in a couple of queries.
+        availabilities = load(
+            info,
+            ("availabilities", start_date, end_date),
+            self,
+            _load_availabilities(start_date, end_date),
+            default=[],
+        )
 
         return [AvailabilityNode(*availability) for availability in availabilities]
 
 
 class Query(ObjectType):
-    all_resources = DjangoFilterConnectionField(ResourceNode)
-    all_drft_resources = DjangoFilterConnectionField(ResourceNode)
+    all_resources = BatchedFilterConnectionField(ResourceNode)
+    all_drft_resources = BatchedFilterConnectionField(ResourceNode)
 
     def resolve_all_drft_resources(self, info):
         return Resource.objects.filter(hasFutureDrftCapacity=True)
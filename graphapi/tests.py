@@ -0,0 +1,200 @@
+import datetime
+import json
+
+from django.test import TestCase
+from django.utils import timezone
+from graphql import parse, validate
+
+from core.factories import LocationFactory, ResourceFactory, UserFactory
+from core.factory_apps.events import EventAdminGroupFactory, EventFactory
+from core.libs.query_budget import QueryRecorder
+from core.models import CapacityChange, Fee, LocationFee, Use
+from gather.models import Event
+from graphapi.schema import schema
+from graphapi.validation import cost_limit_validator
+
+RESOURCES_QUERY = """
+query ($arrive: DateTime!, $depart: DateTime!) {
+  allLocations {
+    edges {
+      node {
+        slug
+        fees { description }
+        resources(hasFutureCapacity: true) {
+          name
+          hasFutureDrftCapacity
+          acceptDrftTheseDates(arrive: $arrive, depart: $depart)
+          availabilities(arrive: $arrive, depart: $depart) { date quantity }
+        }
+      }
+    }
+  }
+}
+"""
+
+OCCUPANCIES_QUERY = """
+{
+  myOccupancies {
+    edges {
+      node {
+        arrive
+        occupantsDuring { user { username } }
+        upcomingEventsDuring { title url }
+      }
+    }
+  }
+}
+"""
+
+
+class GraphQLTestCase(TestCase):
+    def setUp(self):
+        self.today = datetime.date.today()
+        self.variables = {
+            "arrive": f"{self.today + datetime.timedelta(days=1)}T00:00:00",
+            "depart": f"{self.today + datetime.timedelta(days=4)}T00:00:00",
+        }
+
+    def query(self, query, variables=None):
+        with QueryRecorder() as recorder:
+            response = self.client.post(
+                "/graphql",
+                json.dumps({"query": query, "variables": variables or {}}),
+                content_type="application/json",
+            )
+        return response.json(), recorder.count
+
+    def add_location(self, n, rooms=2):
+        location = LocationFactory(slug=f"loc{n}")
+        fee = Fee.objects.create(description=f"tax {n}", percentage=0.1)
+        LocationFee.objects.create(location=location, fee=fee)
+        for r in range(rooms):
+            room = ResourceFactory(location=location, name=f"room {n}.{r}")
+            CapacityChange.objects.create(
+                resource=room,
+                start_date=self.today - datetime.timedelta(days=10),
+                quantity=2,
+                accept_drft=True,
+            )
+        return location
+
+
+class ResourceBatchingTest(GraphQLTestCase):
+    def test_query_count_does_not_grow_with_resources(self):
+        self.add_location(1)
+        result, few = self.query(RESOURCES_QUERY, self.variables)
+        self.assertNotIn("errors", result)
+        [location] = result["data"]["allLocations"]["edges"]
+        self.assertEqual(location["node"]["fees"], [{"description": "tax 1"}])
+        [room, _] = location["node"]["resources"]
+        self.assertTrue(room["hasFutureDrftCapacity"])
+        self.assertTrue(room["acceptDrftTheseDates"])
+        self.assertEqual([day["quantity"] for day in room["availabilities"]], [2] * 3)
+
+        self.add_location(2, rooms=4)
+        self.add_location(3, rooms=3)
+        result, many = self.query(RESOURCES_QUERY, self.variables)
+        self.assertNotIn("errors", result)
+        self.assertEqual(len(result["data"]["allLocations"]["edges"]), 3)
+        # the same queries for three locations as for one: the count and page
+        # of locations, fees, resources, their capacity changes, the capacity
+        # timelines and the daily occupancy
+        self.assertEqual(many, few)
+        self.assertEqual(many, 7)
+
+
+class OccupantBatchingTest(GraphQLTestCase):
+    def setUp(self):
+        super().setUp()
+        self.guest = UserFactory(username="guest")
+        self.client.force_login(self.guest)
+        self.now = timezone.now()
+
+    def stay(self, location, user, arrive, nights=3):
+        return Use.objects.create(
+            location=location,
+            resource=location.resources.first(),
+            user=user,
+            arrive=arrive,
+            depart=arrive + datetime.timedelta(days=nights),
+            status="confirmed",
+        )
+
+    def add_stays(self, n):
+        location = self.add_location(n)
+        arrive = self.today + datetime.timedelta(days=10 * n)
+        self.stay(location, self.guest, arrive)
+        self.stay(location, UserFactory(username=f"other{n}"), arrive)
+        # not at the same time
+        self.stay(
+            location,
+            UserFactory(username=f"later{n}"),
+            arrive + datetime.timedelta(days=5),
+        )
+        event = EventFactory(
+            location=location,
+            admin=EventAdminGroupFactory(location=location),
+            title=f"party {n}",
+            start=timezone.make_aware(
+                datetime.datetime.combine(
+                    arrive + datetime.timedelta(days=1), datetime.time(18)
+                )
+            ),
+            end=timezone.make_aware(
+                datetime.datetime.combine(
+                    arrive + datetime.timedelta(days=1), datetime.time(20)
+                )
+            ),
+        )
+        Event.objects.filter(pk=event.pk).update(status=Event.LIVE)
+
+    def test_query_count_does_not_grow_with_occupancies(self):
+        self.add_stays(1)
+        result, few = self.query(OCCUPANCIES_QUERY)
+        self.assertNotIn("errors", result)
+        [stay] = result["data"]["myOccupancies"]["edges"]
+        self.assertEqual(
+            stay["node"]["occupantsDuring"], [{"user": {"username": "other1"}}]
+        )
+        [event] = stay["node"]["upcomingEventsDuring"]
+        self.assertEqual(event["title"], "party 1")
+
+        for n in range(2, 6):
+            self.add_stays(n)
+        result, many = self.query(OCCUPANCIES_QUERY)
+        self.assertNotIn("errors", result)
+        self.assertEqual(len(result["data"]["myOccupancies"]["edges"]), 5)
+        self.assertEqual(many, few)
+
+
+class QueryLimitsTest(GraphQLTestCase):
+    def errors(self, query):
+        result, queries = self.query(query)
+        self.assertEqual(queries, 0)
+        return " ".join(error["message"] for error in result["errors"])
+
+    def test_deep_queries_are_rejected(self):
+        nested = "occupantsDuring { " * 8 + "arrive" + " }" * 8
+        query = f"{{ myOccupancies {{ edges {{ node {{ {nested} }} }} }} }}"
+        self.assertIn("exceeds maximum operation depth", self.errors(query))
+
+    def test_costly_queries_are_rejected(self):
+        nested = "occupantsDuring { " * 3 + "arrive" + " }" * 3
+        query = f"{{ myOccupancies(first: 100) {{ edges {{ node {{ {nested} }} }} }} }}"
+        self.assertIn("Query cost", self.errors(query))
+
+    def test_cost(self):
+        def cost_errors(query, max_cost):
+            return validate(
+                schema.graphql_schema, parse(query), [cost_limit_validator(max_cost)]
+            )
+
+        # 1 for allLocations, then 10 each for edges, node and slug, and
+        # 10 * LIST_SIZE for name
+        query = """
+        query { allLocations(first: 10) { edges { node { ...L } } } }
+        fragment L on LocationNode { slug resources { name } }
+        """
+        self.assertEqual(cost_errors(query, 141), [])
+        [error] = cost_errors(query, 140)
+        self.assertIn("Query cost 141", error.message)
@@ -1,12 +1,16 @@
+from django.conf import settings
 from django.urls import re_path
 from django.views.decorators.csrf import csrf_exempt
 from graphene_django.views import GraphQLView
 
 from graphapi.schema import schema
+from graphapi.validation import query_limits
 
 
 class AuthGraphQLView(GraphQLView):
-    pass
+    validation_rules = query_limits(
+        max_depth=settings.GRAPHQL_MAX_DEPTH, max_cost=settings.GRAPHQL_MAX_COST
+    )
 
 
 urlpatterns = [
@@ -0,0 +1,108 @@
+"""
+Limits on how much work a single graph API query can ask for, checked
+before it runs: how deeply it nests, and its estimated cost.
+
+The cost of a query is the number of fields it could resolve. Every field
+inside a list counts once per item, so nested lists multiply: a connection
+counts for as many nodes as its `first` or `last` argument asks for (or the
+connection limit), and a plain list for LIST_SIZE items.
+"""
+
+from graphene.validation import depth_limit_validator
+from graphene_django.settings import graphene_settings
+from graphql import GraphQLError, ValidationRule
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+from graphql.type import (
+    get_named_type,
+    get_nullable_type,
+    is_interface_type,
+    is_list_type,
+    is_object_type,
+)
+
+# how many items a plain list field is assumed to have
+LIST_SIZE = 10
+
+
+def _page_size(node):
+    for argument in node.arguments:
+        if argument.name.value in ("first", "last"):
+            value = getattr(argument.value, "value", None)
+            if value is not None:
+                return int(value)
+    return graphene_settings.RELAY_CONNECTION_MAX_LIMIT or 100
+
+
+def cost_limit_validator(max_cost):
+    class CostLimitValidator(ValidationRule):
+        def enter_operation_definition(self, node, *_args):
+            root_type = self.context.schema.get_root_type(node.operation)
+            cost = self.cost(node.selection_set, root_type, 1, set())
+            if cost > max_cost:
+                self.report_error(
+                    GraphQLError(
+                        f"Query cost {cost} is over the limit of {max_cost}; "
+                        "ask for fewer items or fields.",
+                        node,
+                    )
+                )
+
+        def cost(self, selection_set, parent_type, multiplier, fragments):
+            if selection_set is None or not (
+                is_object_type(parent_type) or is_interface_type(parent_type)
+            ):
+                return 0
+            total = 0
+            for selection in selection_set.selections:
+                if isinstance(selection, FieldNode):
+                    field = parent_type.fields.get(selection.name.value)
+                    if field is None:
+                        # __typename, or a field other rules will reject
+                        continue
+                    total += multiplier
+                    field_type = get_nullable_type(field.type)
+                    named_type = get_named_type(field_type)
+                    if parent_type.name.endswith("Connection"):
+                        # the connection itself counted its edges
+                        items = multiplier
+                    elif is_list_type(field_type):
+                        items = multiplier * LIST_SIZE
+                    elif named_type.name.endswith("Connection"):
+                        items = multiplier * _page_size(selection)
+                    else:
+                        items = multiplier
+                    total += self.cost(
+                        selection.selection_set, named_type, items, fragments
+                    )
+                elif isinstance(selection, InlineFragmentNode):
+                    fragment_type = parent_type
+                    if selection.type_condition:
+                        fragment_type = self.context.schema.get_type(
+                            selection.type_condition.name.value
+                        )
+                    total += self.cost(
+                        selection.selection_set, fragment_type, multiplier, fragments
+                    )
+                elif isinstance(selection, FragmentSpreadNode):
+                    name = selection.name.value
+                    fragment = self.context.get_fragment(name)
+                    # a fragment that spreads itself is rejected by other rules
+                    if fragment is None or name in fragments:
+                        continue
+                    fragment_type = self.context.schema.get_type(
+                        fragment.type_condition.name.value
+                    )
+                    total += self.cost(
+                        fragment.selection_set,
+                        fragment_type,
+                        multiplier,
+                        fragments | {name},
+                    )
+            return total
+
+    return CostLimitValidator
+
+
+def query_limits(max_depth, max_cost):
+    """Returns the validation rules that enforce both limits."""
+    return [depth_limit_validator(max_depth=max_depth), cost_limit_validator(max_cost)]
@@ -1,7 +1,6 @@
 import logging
-from io import StringIO
 
-import requests
+import httpx
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.exceptions import MultipleObjectsReturned
@@ -37,16 +36,26 @@ class MailgunBackend(BaseEmailBackend):
             else:
                 raise
 
-        self._api_url = f"https://api.mailgun.net/v2/{self._server_name}/"
+        self._api_url = f"{settings.MAILGUN_API_URL}/{self._server_name}/"
         logger.debug(f"Mailgun URL: {self._api_url}")
+        self._client = None
 
     def open(self):
-        """Stub for open connection, all sends are done over HTTP POSTs"""
-        pass
+        """Opens a pooled HTTP client to the API server, reused for every
+        message until close(). Returns True if a new client was opened."""
+        if self._client is not None:
+            return False
+        self._client = httpx.Client(auth=("api", self._access_key))
+        return True
 
     def close(self):
         """Close any open HTTP connections to the API server."""
-        pass
+        if self._client is None:
+            return
+        try:
+            self._client.close()
+        finally:
+            self._client = None
 
     def _send(self, email_message):
         """A helper method that does the actual sending."""
@@ -59,15 +68,14 @@ class MailgunBackend(BaseEmailBackend):
         ]
 
         try:
-            r = requests.post(
+            r = self._client.post(
                 self._api_url + "messages.mime",
-                auth=("api", self._access_key),
                 data={
                     "to": ", ".join(recipients),
                     "from": from_email,
                 },
                 files={
-                    "message": StringIO(email_message.message().as_string()),
+                    "message": email_message.message().as_bytes(),
                 },
             )
         except Exception:
@@ -91,10 +99,15 @@ class MailgunBackend(BaseEmailBackend):
         if not email_messages:
             return
 
+        new_client = self.open()
         num_sent = 0
-        for message in email_messages:
-            if self._send(message):
-                num_sent += 1
+        try:
+            for message in email_messages:
+                if self._send(message):
+                    num_sent += 1
+        finally:
+            if new_client:
+                self.close()
 
         return num_sent
 
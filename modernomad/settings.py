@@ -95,6 +95,7 @@ AUTHENTICATION_BACKENDS = (
 )
 
 MAILGUN_API_KEY = os.getenv("MAILGUN_API_KEY")
+MAILGUN_API_URL = os.getenv("MAILGUN_API_URL", "https://api.mailgun.net/v2")
 if MAILGUN_API_KEY:
     EMAIL_BACKEND = "modernomad.backends.MailgunBackend"
     # This should only ever be true in the production environment. Defaults to False.
@@ -135,6 +136,7 @@ TEMPLATES = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.QueryBudgetMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -142,11 +144,27 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.contrib.flatpages.middleware.FlatpageFallbackMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.middleware.RequestCacheMiddleware",
 ]
 if not LOCALDEV:
     # We need whitenoise right after the security middleware.
     MIDDLEWARE.insert(1, "whitenoise.middleware.WhiteNoiseMiddleware")
 
+# requests making more queries than this, or running the same query shape
+# this many times, are logged as a warning by QueryBudgetMiddleware
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "100"))
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "20"))
+# each process logs its worst endpoints every this many requests (0: never)
+QUERY_REPORT_EVERY = int(os.getenv("QUERY_REPORT_EVERY", "1000"))
+# send query counts and timings to everyone in a Server-Timing header, not
+# just to staff
+QUERY_SERVER_TIMING = os.getenv("QUERY_SERVER_TIMING") == "1"
+
+# graph API queries nested deeper than this, or that could resolve more
+# fields than this (see graphapi.validation), are rejected before running
+GRAPHQL_MAX_DEPTH = int(os.getenv("GRAPHQL_MAX_DEPTH", "10"))
+GRAPHQL_MAX_COST = int(os.getenv("GRAPHQL_MAX_COST", "50000"))
+
 ROOT_URLCONF = "modernomad.urls.main"
 
 # Python dotted path to the WSGI application used by Django's runserver.